@@ -0,0 +1,142 @@
+# the spatial index with 100k objects, 1% of them moving every frame.
+# times:
+# - building the tree
+# - moving the dynamic 1% every frame (most moves stay inside the fat box of the leaf)
+# - sphere, box, frustum and ray queries against scanning all the boxes
+#   one by one (what finding objects in the flat list of the scene costs)
+# query results are checked against the scan.
+#
+# run from the repository root with
+# python -m benchmarks.aabb_tree
+
+import time
+
+import numpy as np
+import pyrr
+
+from engine.aabb_tree import AABBTree
+
+NR_OBJECTS = 100000
+WORLD_SIZE = 500.0
+MOVING = 0.01
+NR_FRAMES = 60
+NR_QUERIES = 20
+# scanning is slow, fewer runs are enough
+NR_SCANS = 3
+
+def scan(boxes, test):
+    return {i for i, box in enumerate(boxes) if test(box)}
+
+def sphere_test(center, radius):
+    def test(box):
+        dx = max(box[0] - center[0], 0.0, center[0] - box[3])
+        dy = max(box[1] - center[1], 0.0, center[1] - box[4])
+        dz = max(box[2] - center[2], 0.0, center[2] - box[5])
+        return dx * dx + dy * dy + dz * dz <= radius * radius
+    return test
+
+def box_test(aabb_min, aabb_max):
+    def test(box):
+        return (box[0] <= aabb_max[0] and box[3] >= aabb_min[0]
+            and box[1] <= aabb_max[1] and box[4] >= aabb_min[1]
+            and box[2] <= aabb_max[2] and box[5] >= aabb_min[2])
+    return test
+
+def frustum_test(planes):
+    def test(box):
+        for a, b, c, d in planes:
+            x = box[3] if a >= 0 else box[0]
+            y = box[4] if b >= 0 else box[1]
+            z = box[5] if c >= 0 else box[2]
+            if a * x + b * y + c * z + d < 0:
+                return False
+        return True
+    return test
+
+# slab test (none of the directions is 0)
+def ray_test(origin, direction):
+    def test(box):
+        t_near = 0.0
+        t_far = float("inf")
+        for axis in range(3):
+            t1 = (box[axis] - origin[axis]) / direction[axis]
+            t2 = (box[axis + 3] - origin[axis]) / direction[axis]
+            t_near = max(t_near, min(t1, t2))
+            t_far = min(t_far, max(t1, t2))
+        return t_near <= t_far
+    return test
+
+# same planes as Camera.frustum_planes
+def frustum_planes(eye, target):
+    view = pyrr.matrix44.create_look_at(eye, target, [0.0, 1.0, 0.0])
+    projection = pyrr.matrix44.create_perspective_projection(60.0, 16.0 / 9.0, 0.1, 200.0)
+    columns = np.asarray(pyrr.matrix44.multiply(view, projection), dtype=np.float64).T
+    planes = np.array([
+        columns[3] + columns[0],
+        columns[3] - columns[0],
+        columns[3] + columns[1],
+        columns[3] - columns[1],
+        columns[3] + columns[2],
+        columns[3] - columns[2],
+    ])
+    return planes / np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+
+def compare(name, tree_query, scan_query):
+    start = time.perf_counter()
+    tree_results = [tree_query() for i in range(NR_QUERIES)]
+    tree_time = (time.perf_counter() - start) / NR_QUERIES * 1000
+    start = time.perf_counter()
+    scan_results = [scan_query() for i in range(NR_SCANS)]
+    scan_time = (time.perf_counter() - start) / NR_SCANS * 1000
+    if set(tree_results[0]) != scan_results[0]:
+        raise Exception("{} query doesn't match the scan".format(name))
+    print("{:<10}{:>12.3f}{:>12.2f}{:>10}".format(name, tree_time, scan_time, len(scan_results[0])))
+
+def main():
+    rng = np.random.default_rng(11)
+    centers = rng.uniform(0, WORLD_SIZE, (NR_OBJECTS, 3))
+    extents = rng.uniform(0.5, 2.0, (NR_OBJECTS, 3))
+    # units per second (about walking speed)
+    velocities = rng.uniform(-2.0, 2.0, (NR_OBJECTS, 3))
+    data = list(range(NR_OBJECTS))
+
+    tree = AABBTree()
+    start = time.perf_counter()
+    proxies = tree.create_proxies(centers - extents, centers + extents, data)
+    print("{} objects, built in {:.0f} ms, height {}".format(NR_OBJECTS, (time.perf_counter() - start) * 1000, tree.height))
+
+    nr_moving = int(NR_OBJECTS * MOVING)
+    moving = rng.choice(NR_OBJECTS, nr_moving, replace=False)
+    move_time = 0.0
+    for frame in range(NR_FRAMES):
+        # 60 frames per second
+        centers[moving] += velocities[moving] / 60.0
+        aabbs_min = (centers[moving] - extents[moving]).tolist()
+        aabbs_max = (centers[moving] + extents[moving]).tolist()
+        start = time.perf_counter()
+        for i, aabb_min, aabb_max in zip(moving, aabbs_min, aabbs_max):
+            tree.move_proxy(proxies[i], aabb_min, aabb_max)
+        move_time += time.perf_counter() - start
+    print("moving {} objects: {:.2f} ms/frame, {} reinserts in {} frames".format(
+        nr_moving, move_time / NR_FRAMES * 1000, tree.nr_reinserts, NR_FRAMES))
+
+    # data are the indices, so results can be compared with the scan directly
+    boxes = np.concatenate((centers - extents, centers + extents), axis=1).tolist()
+    center = [WORLD_SIZE / 2] * 3
+    eye = np.array([WORLD_SIZE / 2, WORLD_SIZE / 2, -10.0])
+    planes = frustum_planes(eye, eye + [0.0, 0.0, 1.0])
+    # along the diagonal of the world
+    origin = [0.0, 0.0, 0.0]
+    direction = [1.0, 1.0, 1.0]
+
+    print()
+    print("ms per query")
+    print("{:<10}{:>12}{:>12}{:>10}".format("", "tree", "scan", "results"))
+    compare("sphere", lambda: tree.query_sphere(center, 20.0), lambda: scan(boxes, sphere_test(center, 20.0)))
+    compare("box", lambda: tree.query_box([400, 400, 400], [450, 450, 450]), lambda: scan(boxes, box_test([400, 400, 400], [450, 450, 450])))
+    compare("frustum", lambda: tree.query_frustum(planes), lambda: scan(boxes, frustum_test(planes.tolist())))
+    # a ray along the diagonal of the world, only the objects it hits
+    compare("ray", lambda: [hit[1] for hit in tree.ray_cast(origin, direction)], lambda: scan(boxes, ray_test(origin, direction)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# memory and time of loading a 100k object scene file with and without the editor guis.
+# every object has a MeshRenderer (a shared cube) and objects are grouped under a parent every 10.
+# the scene is saved once and then loaded in a new process for each mode:
+# - no editor: engine.editor.enabled = False, no gui is ever created
+# - lazy: editor on, guis are only created when an inspector gets opened (nothing is opened here)
+# - eager: what loading did when the guis were created up front,
+#   an inspector gui per game object and the gui of every component
+# memory is what tracemalloc sees allocated by the load. tracing slows everything down,
+# so the time comes from another process loading without it.
+#
+# run from the repository root with
+# python -m benchmarks.editor_guis
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pyrr
+
+from benchmarks import headless
+
+NR_OBJECTS = 100000
+MODES = ("no editor", "lazy", "eager")
+
+def save(path):
+    headless.init()
+    from engine import scene_file, material_manager
+    from engine.base_mesh import Cube
+    from engine.scene import Scene
+    from engine.game_object import GameObject
+    from engine.components import MeshRenderer
+
+    rng = np.random.default_rng(22)
+    cube = Cube()
+    materials = [material_manager.get_from_name("phong_color"), material_manager.get_from_name("red_diffuse")]
+    scene = Scene()
+    game_objects = []
+    for i in range(NR_OBJECTS):
+        game_object = GameObject("object {}".format(i))
+        if i % 10 != 0:
+            game_object.transform.parent = game_objects[i - i % 10].transform
+        game_object.transform.local_position = pyrr.Vector3(rng.uniform(-100, 100, 3))
+        game_object.add_component(MeshRenderer, cube, materials[i % 2])
+        game_objects.append(game_object)
+    scene.add_game_objects(game_objects)
+    scene_file.save_scene(scene, path)
+
+# prints the seconds or the MB it took
+def load(path, mode, measure):
+    headless.init(editor = mode != "no editor")
+    from engine import scene_file
+
+    if measure == "memory":
+        tracemalloc.start()
+    start = time.perf_counter()
+    scene = scene_file.load_scene(path)
+    if mode == "eager":
+        for game_object in scene.game_objects:
+            scene.open_inspector(game_object)
+            # created closed, like they were
+            scene.guis[game_object.id].opened = False
+            for component in game_object.components:
+                component.gui
+    elapsed = time.perf_counter() - start
+    if measure == "memory":
+        memory, peak = tracemalloc.get_traced_memory()
+        print("{:>12.1f}{:>12.1f}".format(memory / 1e6, peak / 1e6))
+    else:
+        print("{:<12}{:>10.2f}".format(mode, elapsed), end="")
+
+def main():
+    if len(sys.argv) == 4:
+        load(sys.argv[1], sys.argv[2], sys.argv[3])
+        return
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "editor_guis.kscn")
+        save(path)
+        print("{} objects".format(NR_OBJECTS))
+        print("{:<12}{:>10}{:>12}{:>12}".format("", "load s", "memory MB", "peak MB"))
+        sys.stdout.flush()
+        # a new process per mode so they don't share caches
+        for mode in MODES:
+            for measure in ("time", "memory"):
+                subprocess.run([sys.executable, "-m", "benchmarks.editor_guis", path, mode, measure], check=True)
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# runs the engine without a window.
+# there is no gl context here, so every gl function is replaced by a no-op returning 0
+# and shaders are not compiled. everything the engine does on the cpu side still runs
+# (components, transforms, culling, scene files, ...), so this is good for timing that,
+# but not for anything that needs results back from the gpu.
+# (shaders report no uniforms, so materials will print the uniforms they can't find)
+#
+# call init() once before creating scenes.
+
+import OpenGL.GL as gl
+
+import engine.editor
+import engine.shader
+from engine import shader_manager, texture_manager, material_manager
+
+_initialized = False
+
+def _no_op(*args, **kwargs):
+    return 0
+
+def stub_gl():
+    for name in dir(gl):
+        if name.startswith("gl") and callable(getattr(gl, name)):
+            setattr(gl, name, _no_op)
+    # shader.py imported these by name
+    engine.shader.compileShader = _no_op
+    engine.shader.compileProgram = _no_op
+
+def init(editor = False):
+    global _initialized
+    # without a window there is no gui to draw
+    engine.editor.enabled = editor
+    if _initialized:
+        return
+    stub_gl()
+    # same order as Window
+    shader_manager.init()   # before material manager
+    texture_manager.init()  # before material manager
+    material_manager.init()
+    _initialized = True
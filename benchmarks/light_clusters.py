@@ -0,0 +1,54 @@
+# cpu cost of binning point lights into clusters, from 1 to 1024 lights.
+# lights are spread in front of a camera with the default projection of Camera
+# and binned into the default cluster grid, like LightClusters.update does every view.
+#
+# run from the repository root with
+# python -m benchmarks.light_clusters
+
+import time
+
+import numpy as np
+
+from engine.light_clusters import CLUSTER_GRID, bin_lights, cluster_bounds
+
+LIGHT_COUNTS = (1, 4, 16, 64, 256, 1024)
+NR_RUNS = 20
+
+VFOV = 60.0
+ASPECT_RATIO = 16.0 / 9.0
+NEAR = 0.1
+FAR = 100.0
+
+def random_lights(rng, count, tan_half_vfov):
+    # view space, inside the frustum (cameras look along -z)
+    depths = rng.uniform(2.0, FAR * 0.8, count)
+    centers = np.empty((count, 3))
+    centers[:, 0] = rng.uniform(-1.0, 1.0, count) * depths * tan_half_vfov * ASPECT_RATIO
+    centers[:, 1] = rng.uniform(-1.0, 1.0, count) * depths * tan_half_vfov
+    centers[:, 2] = -depths
+    radii = rng.uniform(1.0, 5.0, count)
+    return centers, radii
+
+def main():
+    rng = np.random.default_rng(14)
+    tan_half_vfov = np.tan(np.radians(VFOV) / 2)
+    # LightClusters caches the bounds until the projection changes
+    bounds = cluster_bounds(tan_half_vfov, ASPECT_RATIO, NEAR, FAR, CLUSTER_GRID)
+
+    print("{} clusters, best of {} runs".format(np.prod(CLUSTER_GRID), NR_RUNS))
+    print("{:>8}{:>12}{:>14}{:>14}".format("lights", "ms", "references", "max/cluster"))
+    for count in LIGHT_COUNTS:
+        centers, radii = random_lights(rng, count, tan_half_vfov)
+        best = None
+        for i in range(NR_RUNS):
+            start = time.perf_counter()
+            cluster_ranges, light_indices = bin_lights(
+                centers, radii, tan_half_vfov, ASPECT_RATIO, NEAR, FAR, CLUSTER_GRID, bounds=bounds
+            )
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print("{:>8}{:>12.2f}{:>14}{:>14}".format(
+            count, best * 1000, len(light_indices), int(cluster_ranges[:, 1].max())))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# micro benchmarks for engine.math.
+# compares, for 10k random rotations:
+# - the scalar helpers Transform had before engine.math (copied below as they were)
+# - the engine.math single quaternion versions, called once per rotation
+# - the engine.math batched versions, called once for all of them
+# plus nlerp/slerp (single vs batched).
+# results are checked against each other before timing them.
+#
+# run from the repository root with
+# python -m benchmarks.quaternion_math
+
+import math
+import time
+
+import numpy as np
+
+import engine.math
+
+COUNT = 10000
+REPEATS = 3
+
+################################################################################
+# previous Transform helpers (before engine.math)
+################################################################################
+
+def previous_versor_from_angle_axis(angle, axis):
+    half_angle = angle/2.0
+    sin_half_angle = np.sin(half_angle)
+    q0 = np.cos(half_angle)
+    q1 = sin_half_angle * axis[0]
+    q2 = sin_half_angle * axis[1]
+    q3 = sin_half_angle * axis[2]
+    return (q0, q1, q2, q3)
+
+def previous_quaternion_multiply(q, r):
+    t = [0, 0, 0, 0]
+    t[0] = r[0] * q[0] - r[1] * q[1] - r[2] * q[2] - r[3] * q[3]
+    t[1] = r[0] * q[1] + r[1] * q[0] - r[2] * q[3] + r[3] * q[2]
+    t[2] = r[0] * q[2] + r[1] * q[3] + r[2] * q[0] - r[3] * q[1]
+    t[3] = r[0] * q[3] - r[1] * q[2] + r[2] * q[1] + r[3] * q[0]
+    return t
+
+def previous_quaternion_from_euler(euler):
+    quaternion_x = previous_versor_from_angle_axis(math.radians(euler[0]), [1, 0, 0])
+    quaternion_y = previous_versor_from_angle_axis(math.radians(euler[1]), [0, 1, 0])
+    quaternion_z = previous_versor_from_angle_axis(math.radians(euler[2]), [0, 0, 1])
+    return previous_quaternion_multiply(
+        quaternion_x,
+        previous_quaternion_multiply(quaternion_y, quaternion_z)
+    )
+
+def previous_matrix_from_quaternion(q):
+    w = q[0]
+    x = q[1]
+    y = q[2]
+    z = q[3]
+    m = np.identity(4)
+    m[0] = [(1 - 2*y*y - 2*z*z), (2*x*y - 2*w*z), (2*x*z + 2*w*y), 0]
+    m[1] = [(2*x*y + 2*w*z), (1 - 2*x*x - 2*z*z), (2*y*z - 2*w*x), 0]
+    m[2] = [(2*x*z - 2*w*y), (2*y*z + 2*w*x), (1 - 2*x*x - 2*y*y), 0]
+    m[3] = [0, 0, 0, 1]
+    return m.T
+
+################################################################################
+
+# best of a few runs, in ms
+def timed(function):
+    best = None
+    for i in range(REPEATS):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best * 1000
+
+def report(name, timings):
+    print("{:<24}".format(name) + "".join("{:>12.2f}".format(t) for t in timings))
+
+def main():
+    rng = np.random.default_rng(3)
+    euler = rng.uniform(-180, 180, (COUNT, 3))
+    euler_list = euler.tolist()
+    q = engine.math.quaternion_from_euler(euler)
+    r = engine.math.quaternion_from_euler(rng.uniform(-180, 180, (COUNT, 3)))
+    q_list = q.tolist()
+    r_list = r.tolist()
+    t = rng.uniform(0, 1, COUNT)
+    t_list = t.tolist()
+    matrix_out = np.empty((4, 4))
+
+    print("{} rotations, best of {} runs, ms".format(COUNT, REPEATS))
+    print("{:<24}{:>12}{:>12}{:>12}".format("", "previous", "single", "batched"))
+
+    previous, previous_time = timed(lambda: [previous_quaternion_from_euler(e) for e in euler_list])
+    single, single_time = timed(lambda: [engine.math.quaternion_from_euler_single(e) for e in euler_list])
+    batched, batched_time = timed(lambda: engine.math.quaternion_from_euler(euler))
+    np.testing.assert_allclose(previous, batched, atol=1e-9)
+    np.testing.assert_allclose(single, batched, atol=1e-9)
+    report("quaternion_from_euler", (previous_time, single_time, batched_time))
+
+    previous, previous_time = timed(lambda: [previous_quaternion_multiply(a, b) for a, b in zip(q_list, r_list)])
+    single, single_time = timed(lambda: [engine.math.quaternion_multiply_single(a, b) for a, b in zip(q_list, r_list)])
+    batched, batched_time = timed(lambda: engine.math.quaternion_multiply(q, r))
+    np.testing.assert_allclose(previous, batched, atol=1e-9)
+    np.testing.assert_allclose(single, batched, atol=1e-9)
+    report("quaternion_multiply", (previous_time, single_time, batched_time))
+
+    previous, previous_time = timed(lambda: [previous_matrix_from_quaternion(a) for a in q_list])
+    # the single version writes into the same matrix every time, so compare one of them
+    single, single_time = timed(lambda: [engine.math.matrix_from_quaternion_single(a, out=matrix_out) for a in q_list])
+    batched, batched_time = timed(lambda: engine.math.matrix_from_quaternion(q))
+    np.testing.assert_allclose(previous, batched, atol=1e-9)
+    np.testing.assert_allclose(matrix_out, batched[-1], atol=1e-9)
+    report("matrix_from_quaternion", (previous_time, single_time, batched_time))
+
+    # what the Rotate component does every frame: rotate the current rotation by some euler angles
+    def previous_rotate():
+        return [previous_quaternion_multiply(a, previous_quaternion_from_euler(e)) for a, e in zip(q_list, euler_list)]
+    def single_rotate():
+        rotations = [list(a) for a in q_list]
+        for rotation, e in zip(rotations, euler_list):
+            engine.math.quaternion_multiply_single(rotation, engine.math.quaternion_from_euler_single(e), out=rotation)
+        return rotations
+    previous, previous_time = timed(previous_rotate)
+    single, single_time = timed(single_rotate)
+    batched, batched_time = timed(lambda: engine.math.quaternion_multiply(q, engine.math.quaternion_from_euler(euler)))
+    np.testing.assert_allclose(previous, batched, atol=1e-9)
+    np.testing.assert_allclose(single, batched, atol=1e-9)
+    report("rotate", (previous_time, single_time, batched_time))
+
+    # there was no interpolation before
+    single, single_time = timed(lambda: [engine.math.nlerp_single(a, b, c) for a, b, c in zip(q_list, r_list, t_list)])
+    batched, batched_time = timed(lambda: engine.math.nlerp(q, r, t))
+    np.testing.assert_allclose(single, batched, atol=1e-9)
+    print("{:<24}{:>12}{:>12.2f}{:>12.2f}".format("nlerp", "-", single_time, batched_time))
+
+    single, single_time = timed(lambda: [engine.math.slerp_single(a, b, c) for a, b, c in zip(q_list, r_list, t_list)])
+    batched, batched_time = timed(lambda: engine.math.slerp(q, r, t))
+    np.testing.assert_allclose(single, batched, atol=1e-9)
+    print("{:<24}{:>12}{:>12.2f}{:>12.2f}".format("slerp", "-", single_time, batched_time))
+
+if __name__ == "__main__":
+    main()
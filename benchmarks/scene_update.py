@@ -0,0 +1,61 @@
+# cost of Scene.update with many components.
+# 5k game objects, each with a Rotate (has update) and a plain Component (no update),
+# so 10k components. compares the update lists of the scene against the loop
+# it replaced, which asked inspect.getmembers for an update method of every component every frame
+# (copied below as it was).
+#
+# run from the repository root with
+# python -m benchmarks.scene_update
+
+import inspect
+import time
+
+from benchmarks import headless
+
+NR_GAME_OBJECTS = 5000
+NR_FRAMES = 10
+
+# the previous Scene.update
+def previous_update(scene):
+    for game_obj in scene.game_objects:
+        for component in game_obj.components:
+            if component.enabled:
+                for name, value in inspect.getmembers(component):
+                    if name == "update":
+                        component.update()
+
+def timed(update, scene):
+    start = time.perf_counter()
+    for i in range(NR_FRAMES):
+        update(scene)
+    return (time.perf_counter() - start) / NR_FRAMES * 1000
+
+def main():
+    headless.init()
+    from engine.scene import Scene
+    from engine.game_object import GameObject
+    from engine.components import Rotate
+    from engine.components.component import Component
+
+    scene = Scene()
+    game_objects = []
+    for i in range(NR_GAME_OBJECTS):
+        game_object = GameObject("object {}".format(i))
+        game_object.add_component(Rotate)
+        game_object.add_component(Component)
+        game_objects.append(game_object)
+    scene.add_game_objects(game_objects)
+    nr_components = sum(len(game_object.components) for game_object in game_objects)
+
+    # first frame outside of the timings
+    scene.update()
+    update_lists_time = timed(Scene.update, scene)
+    previous_time = timed(previous_update, scene)
+
+    print("{} components, {} frames".format(nr_components, NR_FRAMES))
+    print("{:<24}{:>12.2f} ms/frame".format("inspect.getmembers", previous_time))
+    print("{:<24}{:>12.2f} ms/frame".format("update lists", update_lists_time))
+    print("{:<24}{:>12.1f}x".format("speedup", previous_time / update_lists_time))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# frame cost of deep transform hierarchies.
+# builds 10k transforms as chains of the given depth, then every frame:
+# - moves the roots (all of them, or none for a static scene)
+# - reads model_dirty, view_dirty and model_mat of every transform, like draw_scene and the gizmos do
+# when everything moves rebuilding the matrices is most of the cost.
+# in static frames only the dirty checks are left: when they walk the parents
+# the time grows with the depth, with the version counters it should stay about the same for every depth.
+# it only uses transform api that was already there before the version counters,
+# so it can also be run on older commits to compare.
+#
+# run from the repository root with
+# python -m benchmarks.transform_hierarchy
+
+import sys
+import time
+
+import pyrr
+
+from engine.transform import Transform
+
+NR_TRANSFORMS = 10000
+DEPTHS = (1, 10, 25, 50)
+NR_FRAMES = 5
+
+def build_chains(depth):
+    roots = []
+    transforms = []
+    for i in range(NR_TRANSFORMS // depth):
+        parent = None
+        for d in range(depth):
+            transform = Transform(pos=pyrr.Vector3([0.0, 1.0, 0.0]))
+            if parent is None:
+                roots.append(transform)
+            else:
+                transform.parent = parent
+            transforms.append(transform)
+            parent = transform
+    return roots, transforms
+
+# returns the time spent moving the roots and the time spent reading the transforms
+def frame(frame_index, roots, transforms, move):
+    start = time.perf_counter()
+    if move:
+        for root in roots:
+            root.local_position = pyrr.Vector3([frame_index, 0.0, 0.0])
+    moved = time.perf_counter()
+    for transform in transforms:
+        if transform.model_dirty or transform.view_dirty:
+            pass
+        transform.model_mat
+    return moved - start, time.perf_counter() - moved
+
+def run(depth, move):
+    roots, transforms = build_chains(depth)
+    # first frame builds every matrix once
+    frame(0, roots, transforms, True)
+    edits = 0.0
+    reads = 0.0
+    for i in range(1, NR_FRAMES + 1):
+        edit_time, read_time = frame(i, roots, transforms, move)
+        edits += edit_time
+        reads += read_time
+    return edits / NR_FRAMES, reads / NR_FRAMES
+
+def main():
+    print("{} transforms, {} frames per depth".format(NR_TRANSFORMS, NR_FRAMES))
+    for move in (True, False):
+        print()
+        print("roots moving every frame" if move else "static")
+        print("{:>6} {:>12} {:>12}".format("depth", "edits ms", "reads ms"))
+        for depth in DEPTHS:
+            edit_time, read_time = run(depth, move)
+            print("{:>6} {:>12.2f} {:>12.2f}".format(depth, edit_time * 1000, read_time * 1000))
+            sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
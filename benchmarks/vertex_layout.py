@@ -0,0 +1,156 @@
+# gpu time of drawing a big mesh with planar and with interleaved vertex buffers.
+# needs a gl context: a hidden glfw window is opened (no editor).
+# the mesh is a generated grid of 1M vertices (2M triangles) with positions, uvs and normals,
+# drawn a few times per frame far enough from the camera to be bound by the vertex work.
+# the grid is drawn twice: with its vertices in order and shuffled
+# (meshes from scans have their vertices all over the buffer, which is where the layout matters most).
+# a mesh file can be given instead (.pkl imported meshes or anything assimp reads):
+# python -m benchmarks.vertex_layout models/dragon.pkl
+#
+# also times set_layout, the cpu side repack of the vertex buffer.
+#
+# run from the repository root with
+# python -m benchmarks.vertex_layout
+
+import statistics
+import sys
+import time
+
+import glfw
+import numpy as np
+import OpenGL.GL as gl
+import pyrr
+
+import engine.editor
+from engine import shader_manager, texture_manager, material_manager
+from engine import vertex_layout
+from engine.base_mesh import BaseMesh
+from engine.gpu_timer import GpuTimer
+
+GRID_SIZE = 1000
+NR_COPIES = 4
+NR_WARMUP_FRAMES = 10
+NR_FRAMES = 100
+
+def grid_mesh(shuffled, rng):
+    coords = np.linspace(-1.0, 1.0, GRID_SIZE, dtype=np.float32)
+    x, y = np.meshgrid(coords, coords)
+    # a wavy surface so the normals are not all the same
+    z = 0.05 * np.sin(x * 20.0) * np.cos(y * 20.0)
+    positions = np.stack([x, y, z], axis=-1).reshape(-1, 3)
+    uvs = ((positions[:, :2] + 1.0) / 2.0).astype(np.float32)
+    normals = np.stack([
+        -np.cos(x * 20.0) * np.cos(y * 20.0),
+        np.sin(x * 20.0) * np.sin(y * 20.0),
+        np.full_like(x, 1.0),
+    ], axis=-1).reshape(-1, 3)
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+
+    rows, columns = np.meshgrid(np.arange(GRID_SIZE - 1), np.arange(GRID_SIZE - 1), indexing="ij")
+    corner = (rows * GRID_SIZE + columns).ravel()
+    indices = np.stack([
+        corner, corner + 1, corner + GRID_SIZE,
+        corner + 1, corner + GRID_SIZE + 1, corner + GRID_SIZE,
+    ], axis=-1).reshape(-1).astype(np.uint32)
+
+    if shuffled:
+        order = rng.permutation(len(positions))
+        # new position of every old vertex
+        remap = np.empty_like(order)
+        remap[order] = np.arange(len(order))
+        positions, uvs, normals = positions[order], uvs[order], normals[order]
+        indices = remap[indices].astype(np.uint32)
+    return BaseMesh(positions, uvs=uvs, normals=normals, indices=indices)
+
+def load_mesh(path):
+    if path.endswith(".pkl"):
+        return BaseMesh.from_imported_file(path)
+    return BaseMesh.from_file(path)
+
+def open_context():
+    if not glfw.init():
+        raise Exception("glfw could not be initialized")
+    glfw.window_hint(glfw.VISIBLE, False)
+    context = glfw.create_window(640, 360, "vertex layout benchmark", None, None)
+    if not context:
+        glfw.terminate()
+        raise Exception("glfw could not open a window")
+    glfw.make_context_current(context)
+    # no waiting for vsync between frames
+    glfw.swap_interval(0)
+    gl.glEnable(gl.GL_DEPTH_TEST)
+    return context
+
+def build_scene(mesh):
+    from engine.scene import Scene
+    from engine.game_object import GameObject
+    from engine.components import Camera, MeshRenderer
+
+    scene = Scene()
+    material = material_manager.get_from_name("phong_color")
+    game_objects = []
+    for i in range(NR_COPIES):
+        game_object = GameObject("mesh {}".format(i))
+        # side by side, small on screen
+        game_object.transform.local_position = pyrr.Vector3([(i - (NR_COPIES - 1) / 2) * 2.5, 0.0, 0.0])
+        game_object.add_component(MeshRenderer, mesh, material)
+        game_objects.append(game_object)
+    camera_object = GameObject("camera")
+    camera_object.transform.local_position = pyrr.Vector3([0.0, 0.0, 25.0])
+    camera = camera_object.add_component(Camera, 640 / 360)
+    game_objects.append(camera_object)
+    scene.add_game_objects(game_objects)
+    return scene, camera
+
+# median gpu ms per frame of drawing the scene
+def gpu_time(context, scene, camera, timer):
+    times = []
+    for frame in range(NR_WARMUP_FRAMES + NR_FRAMES):
+        scene.update()
+        scene.prepare_frame()
+        gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
+        timer.begin()
+        scene.draw_scene(camera, False)
+        timer.end()
+        glfw.swap_buffers(context)
+        # results come a few frames late, wait for them so every frame gets measured
+        gl.glFinish()
+        if frame >= NR_WARMUP_FRAMES:
+            times.append(timer.milliseconds)
+    return statistics.median(times)
+
+def run(name, context, mesh, timer):
+    scene, camera = build_scene(mesh)
+    # meshes are planar when created, interleaved first so both get repacked
+    for mode in (vertex_layout.INTERLEAVED, vertex_layout.PLANAR):
+        start = time.perf_counter()
+        scene.set_vertex_layout(mode)
+        repack_time = (time.perf_counter() - start) * 1000
+        milliseconds = gpu_time(context, scene, camera, timer)
+        print("{:<12}{:<14}{:>12.2f}{:>14.2f}".format(name, mode, milliseconds, repack_time))
+        sys.stdout.flush()
+    scene.close()
+
+def main():
+    engine.editor.enabled = False
+    context = open_context()
+    # same order as Window
+    shader_manager.init()   # before material manager
+    texture_manager.init()  # before material manager
+    material_manager.init()
+    timer = GpuTimer()
+
+    print("{} copies per frame, median of {} frames".format(NR_COPIES, NR_FRAMES))
+    print("{:<12}{:<14}{:>12}{:>14}".format("mesh", "layout", "gpu ms", "set_layout ms"))
+    if len(sys.argv) > 1:
+        run(sys.argv[1], context, load_mesh(sys.argv[1]), timer)
+    else:
+        rng = np.random.default_rng(24)
+        run("grid", context, grid_mesh(False, rng), timer)
+        run("shuffled", context, grid_mesh(True, rng), timer)
+
+    timer.release()
+    glfw.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -33,6 +33,8 @@ vertex_attrib_loc = {
     "uv" : 1,
     "normal" : 2,
     "color" : 3,
+    # compressed normals (see vertex_layout.py). 4 to 7 are taken by the instance matrix
+    "normal_oct" : 8,
 }
 
 # should i include all classes at this directory here?
@@ -46,7 +48,10 @@ from .texture import Texture
 from .framebuffer import Framebuffer
 from .free_fly_camera import FreeFlyCamera
 from .transform import Transform
+from .transform_store import TransformStore
+from .ecs import World
 from .game_object import GameObject
 from .fps_counter import FPSCounter
+from .scene_file import load_scene, save_scene
 
 
@@ -0,0 +1,515 @@
+import math
+
+import numpy as np
+
+# dynamic bounding volume hierarchy (based on box2d's b2DynamicTree but in 3d).
+# leaves are the objects we insert (proxies), each with an axis aligned bounding box.
+# internal nodes have the box enclosing their two children.
+# queries only go down the branches whose boxes pass the test, so they are
+# logarithmic in the number of objects rather than linear.
+#
+# objects move all the time, so leaves store a 'fat' box (the real box grown by a margin).
+# as long as the new box of the object is still inside its fat box,
+# moving it is just storing the new box. only when it leaves the fat box
+# the leaf gets removed and inserted again.
+# the tree is kept balanced with rotations (like an avl tree) while inserting/removing.
+#
+# boxes are plain lists [min_x, min_y, min_z, max_x, max_y, max_z].
+
+_NULL = -1
+
+class AABBTree:
+
+    def __init__(self, margin = 0.1):
+        # how much leaves' boxes are grown on each side
+        self.margin = margin
+        self.root = _NULL
+
+        # node data. a node is an index into these lists
+        self._bounds = []   # fat boxes for leaves
+        self._tight = []    # real boxes (leaves only)
+        self._data = []     # what the user inserted (leaves only)
+        self._parent = []
+        self._child1 = []
+        self._child2 = []
+        self._height = []   # 0 for leaves, -1 for free nodes
+        self._free_nodes = []
+
+        self.nr_proxies = 0
+        # nr of times a moved proxy left its fat box and was inserted again
+        self.nr_reinserts = 0
+
+    ############################################################################
+    # public api
+    ############################################################################
+
+    def create_proxy(self, aabb_min, aabb_max, data):
+        """ insert an object with the given box. returns the proxy id to move/destroy it later """
+        proxy = self._allocate_node()
+        tight = AABBTree._box(aabb_min, aabb_max)
+        self._tight[proxy] = tight
+        self._bounds[proxy] = self._fatten(tight)
+        self._data[proxy] = data
+        self._height[proxy] = 0
+        self._insert_leaf(proxy)
+        self.nr_proxies = self.nr_proxies + 1
+        return proxy
+
+    def create_proxies(self, aabbs_min, aabbs_max, data):
+        """
+        insert many objects at once (boxes as (N,3) arrays). returns their proxy ids.
+        inserting them one by one goes down the tree every time. instead, they are sorted
+        along a morton curve (so neighbours end up next to each other) and their subtree
+        is built bottom up pairing consecutive nodes, a whole level at a time
+        """
+        count = len(data)
+        if count == 0:
+            return []
+        margin = self.margin
+        tight = np.concatenate([aabbs_min, aabbs_max], axis=1).astype(np.float64)
+        fat = tight + np.array([-margin, -margin, -margin, margin, margin, margin])
+
+        # leaves first and then the internal nodes (count - 1 of them)
+        first = len(self._bounds)
+        total = 2 * count - 1
+        boxes = np.empty((total, 6))
+        boxes[:count] = fat
+        heights = np.zeros(total, dtype=np.int64)
+        parents = np.full(total, _NULL, dtype=np.int64)
+        children1 = np.full(total, _NULL, dtype=np.int64)
+        children2 = np.full(total, _NULL, dtype=np.int64)
+
+        level = np.argsort(_morton_codes((tight[:, :3] + tight[:, 3:]) / 2), kind="stable")
+        next_node = count
+        while len(level) > 1:
+            nr_pairs = len(level) // 2
+            left = level[0:2 * nr_pairs:2]
+            right = level[1:2 * nr_pairs:2]
+            new_nodes = np.arange(next_node, next_node + nr_pairs)
+            next_node = next_node + nr_pairs
+            boxes[new_nodes, :3] = np.minimum(boxes[left, :3], boxes[right, :3])
+            boxes[new_nodes, 3:] = np.maximum(boxes[left, 3:], boxes[right, 3:])
+            heights[new_nodes] = 1 + np.maximum(heights[left], heights[right])
+            children1[new_nodes] = left + first
+            children2[new_nodes] = right + first
+            parents[left] = new_nodes + first
+            parents[right] = new_nodes + first
+            # an odd node out goes up to the next level as it is
+            level = np.concatenate([new_nodes, level[2 * nr_pairs:]])
+        subtree_root = int(level[0]) + first
+
+        self._bounds.extend(boxes.tolist())
+        self._tight.extend(tight.tolist())
+        self._tight.extend([None] * (count - 1))
+        self._data.extend(data)
+        self._data.extend([None] * (count - 1))
+        self._parent.extend(parents.tolist())
+        self._child1.extend(children1.tolist())
+        self._child2.extend(children2.tolist())
+        self._height.extend(heights.tolist())
+        self.nr_proxies = self.nr_proxies + count
+
+        # the new subtree and what was already there become siblings
+        if self.root == _NULL:
+            self.root = subtree_root
+        else:
+            old_root = self.root
+            new_root = self._allocate_node()
+            self._child1[new_root] = old_root
+            self._child2[new_root] = subtree_root
+            self._parent[old_root] = new_root
+            self._parent[subtree_root] = new_root
+            self._height[new_root] = 1 + max(self._height[old_root], self._height[subtree_root])
+            self._bounds[new_root] = AABBTree._union(self._bounds[old_root], self._bounds[subtree_root])
+            self.root = new_root
+        return list(range(first, first + count))
+
+    def destroy_proxy(self, proxy):
+        self._remove_leaf(proxy)
+        self._free_node(proxy)
+        self.nr_proxies = self.nr_proxies - 1
+
+    def move_proxy(self, proxy, aabb_min, aabb_max):
+        """ returns True if the proxy had to be inserted again in the tree """
+        tight = AABBTree._box(aabb_min, aabb_max)
+        self._tight[proxy] = tight
+        if AABBTree._contains(self._bounds[proxy], tight):
+            return False
+
+        self._remove_leaf(proxy)
+        self._bounds[proxy] = self._fatten(tight)
+        self._insert_leaf(proxy)
+        self.nr_reinserts = self.nr_reinserts + 1
+        return True
+
+    def get_data(self, proxy):
+        return self._data[proxy]
+
+    def get_bounds(self, proxy):
+        """ the real (not fattened) box of the proxy """
+        return self._tight[proxy]
+
+    @property
+    def height(self):
+        return 0 if self.root == _NULL else self._height[self.root]
+
+    def query_box(self, aabb_min, aabb_max):
+        """ data of the proxies whose box overlaps the given one """
+        box = AABBTree._box(aabb_min, aabb_max)
+        return self._query(lambda node_box: AABBTree._overlap(node_box, box))
+
+    def query_sphere(self, center, radius):
+        """ data of the proxies whose box overlaps the given sphere """
+        cx, cy, cz = float(center[0]), float(center[1]), float(center[2])
+        squared_radius = radius * radius
+        def test(node_box):
+            # squared distance from the center to the closest point of the box
+            dx = max(node_box[0] - cx, 0.0, cx - node_box[3])
+            dy = max(node_box[1] - cy, 0.0, cy - node_box[4])
+            dz = max(node_box[2] - cz, 0.0, cz - node_box[5])
+            return dx * dx + dy * dy + dz * dz <= squared_radius
+        return self._query(test)
+
+    def query_frustum(self, planes):
+        """
+        data of the proxies whose box is not completely outside any of the planes.
+        planes are rows (a, b, c, d) with normals pointing inside (see Camera.frustum_planes)
+        """
+        planes = [[float(value) for value in plane] for plane in planes]
+        def test(node_box):
+            for a, b, c, d in planes:
+                # corner of the box that is the furthest along the normal
+                x = node_box[3] if a >= 0 else node_box[0]
+                y = node_box[4] if b >= 0 else node_box[1]
+                z = node_box[5] if c >= 0 else node_box[2]
+                if a * x + b * y + c * z + d < 0:
+                    return False
+            return True
+        return self._query(test)
+
+    def ray_cast(self, origin, direction, max_distance = math.inf):
+        """
+        list of (distance, data) of the proxies whose box is hit by the ray,
+        sorted from the closest one. distance is in units of the direction length
+        """
+        origin = [float(value) for value in origin[:3]]
+        inverse_direction = [
+            1.0 / value if value != 0 else math.inf
+            for value in (float(direction[0]), float(direction[1]), float(direction[2]))
+        ]
+
+        def distance_to(node_box):
+            # slab test
+            t_near = 0.0
+            t_far = max_distance
+            for axis in range(3):
+                t1 = (node_box[axis] - origin[axis]) * inverse_direction[axis]
+                t2 = (node_box[axis + 3] - origin[axis]) * inverse_direction[axis]
+                # 0 * inf (ray parallel to the slab and starting on its border)
+                if t1 != t1:
+                    t1 = -math.inf
+                if t2 != t2:
+                    t2 = math.inf
+                if t1 > t2:
+                    t1, t2 = t2, t1
+                t_near = max(t_near, t1)
+                t_far = min(t_far, t2)
+                if t_near > t_far:
+                    return None
+            return t_near
+
+        hits = []
+        if self.root == _NULL:
+            return hits
+        stack = [self.root]
+        while len(stack) > 0:
+            node = stack.pop()
+            if self._height[node] == 0:
+                distance = distance_to(self._tight[node])
+                if distance is not None:
+                    hits.append((distance, self._data[node]))
+            elif distance_to(self._bounds[node]) is not None:
+                stack.append(self._child1[node])
+                stack.append(self._child2[node])
+        hits.sort(key=lambda hit: hit[0])
+        return hits
+
+    ############################################################################
+    # private methods
+    ############################################################################
+
+    def _query(self, test):
+        # internal nodes (and fat boxes) are only used to discard whole branches.
+        # leaves are tested against their real box
+        result = []
+        if self.root == _NULL:
+            return result
+        stack = [self.root]
+        while len(stack) > 0:
+            node = stack.pop()
+            if self._height[node] == 0:
+                if test(self._tight[node]):
+                    result.append(self._data[node])
+            elif test(self._bounds[node]):
+                stack.append(self._child1[node])
+                stack.append(self._child2[node])
+        return result
+
+    def _allocate_node(self):
+        if len(self._free_nodes) > 0:
+            node = self._free_nodes.pop()
+        else:
+            node = len(self._bounds)
+            self._bounds.append(None)
+            self._tight.append(None)
+            self._data.append(None)
+            self._parent.append(_NULL)
+            self._child1.append(_NULL)
+            self._child2.append(_NULL)
+            self._height.append(-1)
+        self._parent[node] = _NULL
+        self._child1[node] = _NULL
+        self._child2[node] = _NULL
+        self._height[node] = 0
+        return node
+
+    def _free_node(self, node):
+        self._bounds[node] = None
+        self._tight[node] = None
+        self._data[node] = None
+        self._height[node] = -1
+        self._free_nodes.append(node)
+
+    def _insert_leaf(self, leaf):
+        if self.root == _NULL:
+            self.root = leaf
+            self._parent[leaf] = _NULL
+            return
+
+        # find the best sibling going down the tree.
+        # cost is the surface area of the new parent plus how much the
+        # ancestors would grow (surface area heuristic)
+        leaf_box = self._bounds[leaf]
+        node = self.root
+        while self._height[node] > 0:
+            child1 = self._child1[node]
+            child2 = self._child2[node]
+
+            area = AABBTree._area(self._bounds[node])
+            combined_area = AABBTree._union_area(self._bounds[node], leaf_box)
+
+            # cost of creating a new parent for this node and the new leaf
+            cost = 2.0 * combined_area
+            # minimum cost of pushing the leaf further down the tree
+            inheritance_cost = 2.0 * (combined_area - area)
+
+            cost1 = self._descend_cost(child1, leaf_box) + inheritance_cost
+            cost2 = self._descend_cost(child2, leaf_box) + inheritance_cost
+
+            if cost < cost1 and cost < cost2:
+                break
+            node = child1 if cost1 < cost2 else child2
+
+        sibling = node
+        old_parent = self._parent[sibling]
+        new_parent = self._allocate_node()
+        self._parent[new_parent] = old_parent
+        self._bounds[new_parent] = AABBTree._union(leaf_box, self._bounds[sibling])
+        self._height[new_parent] = self._height[sibling] + 1
+
+        if old_parent != _NULL:
+            if self._child1[old_parent] == sibling:
+                self._child1[old_parent] = new_parent
+            else:
+                self._child2[old_parent] = new_parent
+        else:
+            self.root = new_parent
+        self._child1[new_parent] = sibling
+        self._child2[new_parent] = leaf
+        self._parent[sibling] = new_parent
+        self._parent[leaf] = new_parent
+
+        # walk back up fixing heights and boxes
+        self._refit(self._parent[leaf])
+
+    def _descend_cost(self, child, leaf_box):
+        union_area = AABBTree._union_area(leaf_box, self._bounds[child])
+        if self._height[child] == 0:
+            return union_area
+        return union_area - AABBTree._area(self._bounds[child])
+
+    def _remove_leaf(self, leaf):
+        if leaf == self.root:
+            self.root = _NULL
+            return
+
+        parent = self._parent[leaf]
+        grand_parent = self._parent[parent]
+        sibling = self._child2[parent] if self._child1[parent] == leaf else self._child1[parent]
+
+        if grand_parent != _NULL:
+            # the sibling takes the place of the parent
+            if self._child1[grand_parent] == parent:
+                self._child1[grand_parent] = sibling
+            else:
+                self._child2[grand_parent] = sibling
+            self._parent[sibling] = grand_parent
+            self._free_node(parent)
+            self._refit(grand_parent)
+        else:
+            self.root = sibling
+            self._parent[sibling] = _NULL
+            self._free_node(parent)
+        self._parent[leaf] = _NULL
+
+    def _refit(self, node):
+        while node != _NULL:
+            node = self._balance(node)
+            child1 = self._child1[node]
+            child2 = self._child2[node]
+            self._height[node] = 1 + max(self._height[child1], self._height[child2])
+            self._bounds[node] = AABBTree._union(self._bounds[child1], self._bounds[child2])
+            node = self._parent[node]
+
+    # if one of the children of a is more than 1 level taller than the other one,
+    # rotate it up. returns the node that is now at the position of a
+    def _balance(self, a):
+        if self._height[a] < 2:
+            return a
+
+        b = self._child1[a]
+        c = self._child2[a]
+        balance = self._height[c] - self._height[b]
+
+        # rotate c up
+        if balance > 1:
+            f = self._child1[c]
+            g = self._child2[c]
+            self._child1[c] = a
+            self._parent[c] = self._parent[a]
+            self._parent[a] = c
+            self._replace_child(self._parent[c], a, c)
+
+            # the tallest grandchild stays with c, the other one goes to a
+            if self._height[f] > self._height[g]:
+                self._child2[c] = f
+                self._child2[a] = g
+                self._parent[g] = a
+                self._bounds[a] = AABBTree._union(self._bounds[b], self._bounds[g])
+                self._bounds[c] = AABBTree._union(self._bounds[a], self._bounds[f])
+                self._height[a] = 1 + max(self._height[b], self._height[g])
+                self._height[c] = 1 + max(self._height[a], self._height[f])
+            else:
+                self._child2[c] = g
+                self._child2[a] = f
+                self._parent[f] = a
+                self._bounds[a] = AABBTree._union(self._bounds[b], self._bounds[f])
+                self._bounds[c] = AABBTree._union(self._bounds[a], self._bounds[g])
+                self._height[a] = 1 + max(self._height[b], self._height[f])
+                self._height[c] = 1 + max(self._height[a], self._height[g])
+            return c
+
+        # rotate b up
+        if balance < -1:
+            d = self._child1[b]
+            e = self._child2[b]
+            self._child1[b] = a
+            self._parent[b] = self._parent[a]
+            self._parent[a] = b
+            self._replace_child(self._parent[b], a, b)
+
+            if self._height[d] > self._height[e]:
+                self._child2[b] = d
+                self._child1[a] = e
+                self._parent[e] = a
+                self._bounds[a] = AABBTree._union(self._bounds[c], self._bounds[e])
+                self._bounds[b] = AABBTree._union(self._bounds[a], self._bounds[d])
+                self._height[a] = 1 + max(self._height[c], self._height[e])
+                self._height[b] = 1 + max(self._height[a], self._height[d])
+            else:
+                self._child2[b] = e
+                self._child1[a] = d
+                self._parent[d] = a
+                self._bounds[a] = AABBTree._union(self._bounds[c], self._bounds[d])
+                self._bounds[b] = AABBTree._union(self._bounds[a], self._bounds[e])
+                self._height[a] = 1 + max(self._height[c], self._height[d])
+                self._height[b] = 1 + max(self._height[a], self._height[e])
+            return b
+
+        return a
+
+    def _replace_child(self, parent, old_child, new_child):
+        if parent == _NULL:
+            self.root = new_child
+        elif self._child1[parent] == old_child:
+            self._child1[parent] = new_child
+        else:
+            self._child2[parent] = new_child
+
+    def _fatten(self, box):
+        margin = self.margin
+        return [
+            box[0] - margin, box[1] - margin, box[2] - margin,
+            box[3] + margin, box[4] + margin, box[5] + margin
+        ]
+
+    ############################################################################
+    # box helpers
+    ############################################################################
+
+    @staticmethod
+    def _box(aabb_min, aabb_max):
+        return [
+            float(aabb_min[0]), float(aabb_min[1]), float(aabb_min[2]),
+            float(aabb_max[0]), float(aabb_max[1]), float(aabb_max[2])
+        ]
+
+    @staticmethod
+    def _union(a, b):
+        return [
+            min(a[0], b[0]), min(a[1], b[1]), min(a[2], b[2]),
+            max(a[3], b[3]), max(a[4], b[4]), max(a[5], b[5])
+        ]
+
+    @staticmethod
+    def _area(box):
+        dx = box[3] - box[0]
+        dy = box[4] - box[1]
+        dz = box[5] - box[2]
+        return 2.0 * (dx * dy + dy * dz + dz * dx)
+
+    # same as _area(_union(a, b)) without building the union box.
+    # this is what we compute the most while inserting
+    @staticmethod
+    def _union_area(a, b):
+        dx = (a[3] if a[3] > b[3] else b[3]) - (a[0] if a[0] < b[0] else b[0])
+        dy = (a[4] if a[4] > b[4] else b[4]) - (a[1] if a[1] < b[1] else b[1])
+        dz = (a[5] if a[5] > b[5] else b[5]) - (a[2] if a[2] < b[2] else b[2])
+        return 2.0 * (dx * dy + dy * dz + dz * dx)
+
+    @staticmethod
+    def _contains(outer, inner):
+        return (outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] <= inner[2]
+            and inner[3] <= outer[3] and inner[4] <= outer[4] and inner[5] <= outer[5])
+
+    @staticmethod
+    def _overlap(a, b):
+        return (a[0] <= b[3] and b[0] <= a[3]
+            and a[1] <= b[4] and b[1] <= a[4]
+            and a[2] <= b[5] and b[2] <= a[5])
+
+# points (N,3) -> position along a morton (z-order) curve over their bounding box.
+# 10 bits per axis, interleaved
+def _morton_codes(points):
+    low = points.min(axis=0)
+    extent = np.maximum(points.max(axis=0) - low, 1e-12)
+    cells = ((points - low) / extent * 1023).astype(np.int64)
+
+    def spread(v):
+        v = (v | (v << 16)) & 0x030000FF
+        v = (v | (v << 8)) & 0x0300F00F
+        v = (v | (v << 4)) & 0x030C30C3
+        v = (v | (v << 2)) & 0x09249249
+        return v
+
+    return spread(cells[:, 0]) | (spread(cells[:, 1]) << 1) | (spread(cells[:, 2]) << 2)
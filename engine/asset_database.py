@@ -0,0 +1,175 @@
+# assets (meshes, textures) referenced by the hash of their content.
+# scene files don't embed any mesh data, they only keep the content hash of the files
+# they come from (see scene_file.py). loading a scene creates lightweight handles
+# and the files are only read the first time the asset is actually used
+# (first draw of a renderer, first bind of a texture).
+
+# handles stand in for the asset: every attribute they don't have
+# is taken from the asset, loading it if needed. so renderers and materials
+# can use them without knowing whether the asset is there yet.
+# mesh handles also know the bounds of their mesh, so culling and
+# the spatial index don't need to load anything, and what static batching
+# needs to group them (drawing mode, attributes and compression).
+#
+# files are only read once, when loading them. the content is checked against
+# the hash recorded with the handle right there (handles made from a path alone,
+# like the engine textures, learn their hash then).
+
+import hashlib
+import io
+import weakref
+
+import numpy as np
+
+from engine import base_mesh
+from engine.base_mesh import BaseMesh
+from engine.texture import Texture
+from engine import vertex_layout
+
+# bytes of the content hashes
+HASH_SIZE = 16
+
+ASSET_MESH = 0
+ASSET_TEXTURE = 1
+# meshes built by code (Cube, Quad...). their path is the class name
+ASSET_PRIMITIVE = 2
+
+_primitives = ("Triangle", "Quad", "Cube")
+
+# flags of a mesh handle: one bit per attribute (in vertex_layout.ATTRIB_NAMES order) and
+# one more for compressed meshes
+MESH_COMPRESSED = 1 << len(vertex_layout.ATTRIB_NAMES)
+
+# content hash -> handle. the same asset used by several scenes is loaded once.
+# handles are only kept while something uses them (renderers, materials),
+# their asset goes away with them
+_handles = weakref.WeakValueDictionary()
+# path -> handle, for handles whose hash is not known until they get loaded
+_path_handles = weakref.WeakValueDictionary()
+
+def content_hash(path):
+    with open(path, "rb") as input_file:
+        return data_hash(input_file.read())
+
+def data_hash(data):
+    return hashlib.blake2b(data, digest_size=HASH_SIZE).digest()
+
+def primitive_hash(name):
+    return hashlib.blake2b(name.encode("utf-8"), digest_size=HASH_SIZE).digest()
+
+def is_primitive(mesh):
+    return type(mesh).__name__ in _primitives
+
+def get_handle(kind, asset_hash, path, bounds = None, drawing_mode = None, flags = 0):
+    """ the handle of the asset with the given content hash (created the first time) """
+    handle = _handles.get(asset_hash)
+    if handle is None:
+        if kind == ASSET_TEXTURE:
+            handle = TextureHandle(asset_hash, path)
+        else:
+            handle = MeshHandle(kind, asset_hash, path, bounds, drawing_mode, flags)
+        _handles[asset_hash] = handle
+    return handle
+
+# the file is not read here (its hash gets checked when loading it)
+def texture_handle(path):
+    handle = _path_handles.get(path)
+    if handle is None:
+        handle = TextureHandle(None, path)
+        _path_handles[path] = handle
+    return handle
+
+# what a mesh handle keeps about its mesh besides the bounds (see MeshHandle)
+def mesh_flags(mesh):
+    flags = 0
+    for bit, name in enumerate(vertex_layout.ATTRIB_NAMES):
+        if mesh.has_attrib(name):
+            flags = flags | (1 << bit)
+    if mesh.compressed:
+        flags = flags | MESH_COMPRESSED
+    return flags
+
+class AssetHandle:
+
+    def __init__(self, kind, asset_hash, path):
+        self.kind = kind
+        self.hash = asset_hash
+        self.path = path
+        self.asset = None
+
+    @property
+    def loaded(self):
+        return self.asset is not None
+
+    def resolve(self):
+        if self.asset is None:
+            self.asset = self._load()
+        return self.asset
+
+    # the asset stands behind the handle
+    def __getattr__(self, name):
+        # python looks for these on the class, don't load anything for them
+        if name.startswith("__") or name == "asset":
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+    def _load(self):
+        raise Exception("unknown asset type {}".format(self.kind))
+
+    # the content of the file (a single read), checked against our hash
+    def _read(self):
+        with open(self.path, "rb") as input_file:
+            data = input_file.read()
+        asset_hash = data_hash(data)
+        if self.hash is None:
+            self.hash = asset_hash
+        elif asset_hash != self.hash:
+            print("warning: {} changed since it was referenced".format(self.path))
+        return data
+
+class MeshHandle(AssetHandle):
+
+    # bounds: aabb min, aabb max, sphere center (3 each) and sphere radius.
+    # flags: see mesh_flags
+    def __init__(self, kind, asset_hash, path, bounds, drawing_mode, flags):
+        super().__init__(kind, asset_hash, path)
+        bounds = np.asarray(bounds, dtype=np.float64)
+        self.aabb_min = bounds[0:3]
+        self.aabb_max = bounds[3:6]
+        self.bounding_sphere_center = bounds[6:9]
+        self.bounding_sphere_radius = float(bounds[9])
+        self.drawing_mode = drawing_mode
+        self.compressed = (flags & MESH_COMPRESSED) != 0
+        self._flags = flags
+
+    def has_attrib(self, name):
+        if self.asset is not None:
+            return self.asset.has_attrib(name)
+        return (self._flags & (1 << vertex_layout.ATTRIB_NAMES.index(name))) != 0
+
+    # imported meshes keep their cpu data, unless released after loading
+    @property
+    def has_cpu_data(self):
+        return self.asset is None or self.asset.has_cpu_data
+
+    def _load(self):
+        if self.kind == ASSET_PRIMITIVE:
+            return getattr(base_mesh, self.path)()
+        return BaseMesh.from_imported_file(self.path, self._read())
+
+class TextureHandle(AssetHandle):
+
+    def __init__(self, asset_hash, path):
+        super().__init__(ASSET_TEXTURE, asset_hash, path)
+
+    def _load(self):
+        return Texture.from_image(io.BytesIO(self._read()))
+
+# bounds of a mesh as stored with its handle
+def mesh_bounds(mesh):
+    bounds = np.empty(10, dtype=np.float32)
+    bounds[0:3] = mesh.aabb_min
+    bounds[3:6] = mesh.aabb_max
+    bounds[6:9] = mesh.bounding_sphere_center
+    bounds[9] = mesh.bounding_sphere_radius
+    return bounds
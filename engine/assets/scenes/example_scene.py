@@ -108,6 +108,8 @@ class ExampleScene(Scene):
         # plane_go.transform.local_scale = pyrr.Vector3([10,10,10])
         # cube_go.transform.local_position = pyrr.Vector3([0, 0.5, 0])
         dragon.transform.local_scale = pyrr.Vector3([0.1, 0.1, 0.1])
+        # the dragon never moves, it can be batched with other static objects
+        dragon.static = True
 
         ########################################################################
         # ADD GAME OBJECTS TO THE SCENE
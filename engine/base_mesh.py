@@ -24,6 +24,9 @@ import OpenGL.GL as gl
 
 from . import vertex_attrib_loc
 from . import VertexAttrib
+from . import mesh_simplifier
+from . import vertex_layout
+from .vertex_layout import VertexLayout
 
 class BaseMesh():
 
@@ -36,21 +39,33 @@ class BaseMesh():
     # https://stackoverflow.com/questions/9450656/positional-argument-v-s-keyword-argument
     #
     # we are missing the additional texture coordinates and the tangent (vec4)
+    #
+    # vertex data can be python lists, numpy arrays or anything supporting the buffer protocol,
+    # flat or one row per vertex. float32 arrays are not copied until they get packed together
+    # into the single buffer sent to the gpu.
+    # keep_cpu_data = False drops that buffer once it's uploaded (see release_cpu_data).
+    # layout is how the attributes are arranged in the buffer (see vertex_layout.py).
+    # compressed = True stores them with smaller formats (half the memory or less)
+    # and the indices as uint16 if there are few enough vertices
     def __init__(self, vertices,*,
             uvs = None,
             normals = None,
             colors = None,
             indices = None,
             drawing_mode = gl.GL_TRIANGLES,
+            layout = vertex_layout.PLANAR,
+            compressed = False,
+            keep_cpu_data = True,
             verbose = False):
 
-
-        self.vertices = vertices
-        self.uvs = uvs
-        self.normals = normals
-        self.colors = colors
+        # flat float32 views of the given data (no copy if it's already float32)
+        vertices = BaseMesh._as_floats(vertices)
+        uvs = BaseMesh._as_floats(uvs)
+        normals = BaseMesh._as_floats(normals)
+        colors = BaseMesh._as_floats(colors)
 
         self.drawing_mode = drawing_mode
+        self.compressed = compressed
 
         # remember to use python's // integer division
         self._nr_vertices = len(vertices) // 3
@@ -65,88 +80,199 @@ class BaseMesh():
             print("indices: {}".format(indices))
             print("nr vertices: {}".format(self._nr_vertices))
 
-        # does this work when some of them are None?
-        # a) it doesn't. We need to include it only if it's not None
-        # this is python's array concatenation
-        # vertex_data = vertices + colors + uvs + normals
-        vertex_data = vertices.copy()
-        if (uvs is not None):
-            vertex_data += uvs if uvs is not None else []
-        if (normals is not None):
-            vertex_data += normals if normals is not None else []
-        if (colors is not None):
-            vertex_data += colors if colors is not None else []
+        self.attribs_size = dict(vertex_layout.ATTRIB_SIZES)
 
+        # self.vertex_data is the buffer ready to be transfered to the GPU.
+        # it's allocated once and every attribute is copied straight into its place
+        # (we used to concatenate python lists and then cast the whole thing)
+        data = {"pos" : vertices, "uv" : uvs, "normal" : normals, "color" : colors}
+        self._attrib_names = tuple(name for name, values in data.items() if values is not None)
+        formats = vertex_layout.compressed_formats(data) if compressed else None
+        self.layout = VertexLayout(self._attrib_names, self._nr_vertices, layout, formats)
+        self.vertex_data = self.layout.pack(data)
         if verbose:
-            print("whole data (before numpy cast): {}".format(vertex_data))
-        # cast to numpy array
-        # let's cast only the whole vertex_data buffer and not the individual attribs
-        # self.vertex_data is the numpy version of the data ready to be
-        # transfered to the GPU
-        self.vertex_data = np.array(vertex_data, dtype=np.float32)
-        if verbose:
-            print("whole data (after numpy cast): {}".format(vertex_data))
-
-        self.attribs = {
-            "pos" : vertices,
-            "uv" : uvs,
-            "normal" : normals,
-            "color" : colors,
-        }
-
-        self.attribs_size = {
-            "pos" : 3,
-            "uv" : 2,
-            "normal" : 3,
-            "color" : 3,
-        }
-
-        vertices_size = 0 if vertices is None else len(vertices) * 4
-        uvs_size = 0 if uvs is None else len(uvs) * 4
-        normals_size = 0 if normals is None else len(normals) * 4
-        colors_size = 0 if colors is None else len(colors) * 4
-
-        self.attribs_offset = {
-            "pos" : 0,
-            "uv" : vertices_size,
-            "normal" : (vertices_size + uvs_size),
-            "color" : (vertices_size + uvs_size + normals_size),
-        }
-
-        # self.attribs_offset = {
-        #     "pos" : 0,
-        #     "uv" : vertices.nbytes,
-        #     "normal" : (vertices.nbytes + uvs.nbytes),
-        #     "color" : (vertices.nbytes + uvs.nbytes + normals.nbytes),
-        # }
-
-        # vertices_bytes =
-        # vertices_bytes = vertices.nbytes if vertices is not None else 0
-        # uvs_bytes = uvs.nbytes if uvs is not None else 0
-        # normals_bytes = normals.nbytes if normals is not None else 0
-        # colors_bytes = colors.nbytes if colors is not None else 0
-
-        # vertices = np.array(vertices, dtype=np.float32)
-        # uvs = np.array(uvs, dtype=np.float32)
-        # normals = np.array(normals, dtype=np.float32)
-        # colors = np.array(colors, dtype=np.float32)
-
-        # print("vertices: {}".format(vertices))
-        # print("uvs: {}".format(uvs))
-        # print("normals: {}".format(normals))
-        # print("colors: {}".format(colors))
-        # print("whole data: {}".format(vertex_data))
-
-        # for key in self.attribs_offset:
-        #     print("{} offset = {}".format(key, self.attribs_offset[key]))
+            print("whole data: {}".format(self.vertex_data))
+
+        # views into vertex_data (the given data is not referenced anymore)
+        self._bind_attrib_views()
 
         self.indexed_drawing = False if indices is None else True
-        self.nr_indices = 0 if indices is None else len(indices)
+        # 16 bits indices can address 65536 vertices
+        if compressed and self._nr_vertices <= 65536:
+            self.index_type = gl.GL_UNSIGNED_SHORT
+            index_dtype = np.uint16
+        else:
+            self.index_type = gl.GL_UNSIGNED_INT
+            index_dtype = np.uint32
         # data ready to be transfer to GPU
-        self.indices = None if indices is None else np.array(indices, dtype=np.uint32)
+        self.indices = None if indices is None else np.asarray(indices, dtype=index_dtype).reshape(-1)
+        self.nr_indices = 0 if indices is None else len(self.indices)
+
+        self.compute_bounds()
+
+        # lower detail versions of this mesh, from more to less detailed (see generate_lods)
+        self.lods = []
 
         self.configure_opengl_buffers()
 
+        if not keep_cpu_data:
+            self.release_cpu_data()
+
+    def has_attrib(self, name):
+        return name in self._attrib_names
+
+    @property
+    def has_cpu_data(self):
+        return self.vertex_data is not None
+
+    # memory taken by the vertex and index buffers in the gpu (levels of detail not included)
+    @property
+    def gpu_bytes(self):
+        index_size = 2 if self.index_type == gl.GL_UNSIGNED_SHORT else 4
+        return self.layout.nbytes + self.nr_indices * index_size
+
+    # the same without compression (everything float32 and uint32)
+    @property
+    def uncompressed_bytes(self):
+        return self.layout.uncompressed_nbytes + self.nr_indices * 4
+
+    # the data stays in the gpu buffers only.
+    # bounds are kept, but levels of detail, static batching and saving need the cpu data
+    def release_cpu_data(self):
+        self.vertex_data = None
+        self.indices = None
+        self._bind_attrib_views()
+
+    # arranges the vertex buffer with another layout (levels of detail too)
+    # and uploads it again. the vaos using the mesh need to be configured again
+    # (see mesh_renderer.reconfigure_vaos)
+    def set_layout(self, mode):
+        for lod in self.lods:
+            lod.set_layout(mode)
+        if mode == self.layout.mode:
+            return
+        if self.vertex_data is None:
+            raise Exception("the cpu data of the mesh was released")
+        # the values are copied as they are stored (compressed or not)
+        layout = VertexLayout(self._attrib_names, self._nr_vertices, mode, self.layout.formats)
+        self.vertex_data = self.layout.repack(self.vertex_data, layout)
+        self.layout = layout
+        self._bind_attrib_views()
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, self.vertex_data.nbytes, self.vertex_data, gl.GL_STATIC_DRAW)
+
+    # attribs (and vertices, uvs...) are (nr vertices, size) views into vertex_data
+    # with the values as they are stored (see attrib_array for float values)
+    def _bind_attrib_views(self):
+        self.attribs = {}
+        for name in vertex_layout.ATTRIB_NAMES:
+            if self.vertex_data is None or name not in self._attrib_names:
+                self.attribs[name] = None
+                continue
+            self.attribs[name] = self.layout.view(self.vertex_data, name)
+        self.vertices = self.attribs["pos"]
+        self.uvs = self.attribs["uv"]
+        self.normals = self.attribs["normal"]
+        self.colors = self.attribs["color"]
+
+    # the views are not saved (pickle would store a copy of each of them)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ("attribs", "vertices", "uvs", "normals", "colors"):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        attribs = state.pop("attribs", None)
+        for name in ("vertices", "uvs", "normals", "colors"):
+            state.pop(name, None)
+        self.__dict__.update(state)
+        # files saved before kept python lists of every attribute
+        if "_attrib_names" not in state:
+            self._attrib_names = tuple(name for name, values in attribs.items() if values is not None)
+        # and had planar data only
+        if "layout" not in state:
+            self.layout = VertexLayout(self._attrib_names, self._nr_vertices)
+            self.__dict__.pop("attribs_offset", None)
+        # and float32 buffers and uint32 indices
+        if self.vertex_data is not None and self.vertex_data.dtype != np.uint8:
+            self.vertex_data = self.vertex_data.view(np.uint8)
+        if "index_type" not in state:
+            self.compressed = False
+            self.index_type = gl.GL_UNSIGNED_INT
+        self._bind_attrib_views()
+
+    @staticmethod
+    def _as_floats(values):
+        if values is None:
+            return None
+        return np.asarray(values, dtype=np.float32).reshape(-1)
+
+    # bounding volumes in local space (used for culling)
+    def compute_bounds(self):
+        positions = self.attrib_array("pos")
+        if len(positions) == 0:
+            positions = np.zeros((1, 3), dtype=np.float32)
+        # axis aligned bounding box
+        self.aabb_min = positions.min(axis=0)
+        self.aabb_max = positions.max(axis=0)
+        # bounding sphere around the center of the box.
+        # not the smallest one but good enough and cheap to get
+        self.bounding_sphere_center = (self.aabb_min + self.aabb_max) / 2
+        self.bounding_sphere_radius = float(np.sqrt(
+            np.max(np.sum((positions - self.bounding_sphere_center) ** 2, axis=1))
+        ))
+
+    # the data of an attribute as (nr vertices, size) float32 values.
+    # a view into vertex_data (strided when interleaved) unless the attribute is compressed
+    def attrib_array(self, name):
+        if self.vertex_data is None:
+            raise Exception("the cpu data of the mesh was released")
+        return self.layout.decode(self.vertex_data, name)
+
+    # offline step of the import pipeline: simplified versions of the mesh
+    # with a fraction of its triangles each (see mesh_simplifier.py).
+    # every level is simplified from the previous one
+    def generate_lods(self, ratios = mesh_simplifier.LOD_RATIOS):
+        self.lods = []
+        if not self.indexed_drawing or self.drawing_mode != gl.GL_TRIANGLES:
+            return
+
+        # the rest of attributes are interpolated together
+        names = [name for name in ("uv", "normal", "color") if self.has_attrib(name)]
+        positions = self.attrib_array("pos")
+        attributes = np.concatenate(
+            [self.attrib_array(name) for name in names] + [np.zeros((self._nr_vertices, 0))],
+            axis=1
+        )
+        faces = self.indices.reshape(-1, 3)
+        nr_faces = len(faces)
+
+        for ratio in ratios:
+            target = int(nr_faces * ratio)
+            positions, attributes, faces = mesh_simplifier.simplify(positions, faces, attributes, target)
+            print("lod with {} triangles (target {})".format(len(faces), target))
+
+            lod_attribs = {}
+            column = 0
+            for name in names:
+                size = self.attribs_size[name]
+                lod_attribs[name] = attributes[:, column:column + size]
+                column = column + size
+            if "normal" in lod_attribs:
+                normals = lod_attribs["normal"]
+                lod_attribs["normal"] = normals / np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+            lod = BaseMesh(
+                positions,
+                uvs = lod_attribs.get("uv"),
+                normals = lod_attribs.get("normal"),
+                colors = lod_attribs.get("color"),
+                indices = faces,
+                layout = self.layout.mode,
+                compressed = self.compressed
+            )
+            self.lods.append(lod)
+
     def configure_opengl_buffers(self):
         # this only ask the gpu for an id
         # it doesn't allocate any memory.
@@ -197,7 +323,7 @@ class BaseMesh():
                 # gl.GL_TRIANGLES,    # mode
                 self.drawing_mode,    # mode
                 self.nr_indices,    # nr of indices
-                gl.GL_UNSIGNED_INT, # type
+                self.index_type,    # type (uint32 or uint16 for compressed meshes)
                 None                # offset
                 # 0
                 # ctypes.c_void_p(0)  # offset but in pointer format (it's supposed to be an adddres)
@@ -209,6 +335,26 @@ class BaseMesh():
                 0,              # starting index
                 self.nr_vertices # nr vertices or triangles? i think it's nr vertices
             )
+
+    # draws 'count' copies at once. per instance data comes from
+    # vertex attributes with a divisor (see instanced_renderer.py)
+    def draw_instanced(self, count):
+        if (self.indexed_drawing):
+            gl.glDrawElementsInstanced(
+                self.drawing_mode,
+                self.nr_indices,
+                self.index_type,
+                None,
+                count
+            )
+        else:
+            gl.glDrawArraysInstanced(
+                self.drawing_mode,
+                0,
+                self.nr_vertices,
+                count
+            )
+
     def bind_buffers(self):
         gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo)
         if self.indexed_drawing:
@@ -216,21 +362,48 @@ class BaseMesh():
             gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, self.ebo)
 
     def save(self, filename):
+        if self.vertex_data is None:
+            raise Exception("can not save a mesh whose cpu data was released")
         # use pickle to dump mesh data into a binary file we understand
         with open(filename, "wb") as output_file:
             pickle.dump(self, output_file, pickle.HIGHEST_PROTOCOL)
 
+    # data: the content of the file if it was already read (see asset_database.py)
     @classmethod
-    def from_imported_file(cls, filename):
-        with open(filename, "rb") as input_file:
-            mesh_instance = pickle.load(input_file)
-            mesh_instance.configure_opengl_buffers()
-            # configure opengl vbos
+    def from_imported_file(cls, filename, data = None):
+        if data is None:
+            with open(filename, "rb") as input_file:
+                data = input_file.read()
+        mesh_instance = pickle.loads(data)
+        # scene files refer to meshes by the file they come from (see asset_database.py)
+        mesh_instance.source_file = filename
+        # files saved before meshes had bounds
+        if not hasattr(mesh_instance, "bounding_sphere_radius"):
+            mesh_instance.compute_bounds()
+        # files saved before meshes had levels of detail are drawn with a single level.
+        # simplifying takes too long to be done while loading (see rebuild_imported_file)
+        if not hasattr(mesh_instance, "lods"):
+            mesh_instance.lods = []
+        mesh_instance.configure_opengl_buffers()
+        # configure opengl vbos
+        for lod in mesh_instance.lods:
+            lod.configure_opengl_buffers()
 
-            return mesh_instance
+        return mesh_instance
+
+    # offline step for files imported before meshes had levels of detail:
+    # generates them and saves the file again
+    @classmethod
+    def rebuild_imported_file(cls, filename):
+        mesh_instance = cls.from_imported_file(filename)
+        mesh_instance.generate_lods()
+        mesh_instance.save(filename)
+        return mesh_instance
 
     @classmethod
-    def from_file(cls, filename, verbose=False):
+    # compress = True stores the imported mesh with compressed vertices and indices
+    # (see BaseMesh.__init__)
+    def from_file(cls, filename, verbose=False, compress=False):
         asset = assimp.load(
             filename,
             processing=assimp.postprocess.aiProcessPreset_TargetRealtime_MaxQuality
@@ -310,21 +483,18 @@ class BaseMesh():
         # which is returning 8 with the first of them equal to 2
         # and all the others equal to zero
         # but the data has vec3 with zeros for z
-        vertices = [coord for vertex in vertices for coord in vertex]
+        # assimp gives us numpy arrays already. base meshes take them as they are
+        # (we used to flatten them into python lists first)
         final_uvs = None
         if uvs is not None:
-            final_uvs = []
-            for uv in uvs:
-                final_uvs.append(uv[0])
-                final_uvs.append(uv[1])
-
-            # uvs = [coord for uv in uvs for coord in uv]
-        if normals is not None:
-            normals = [coord for normal in normals for coord in normal]
+            final_uvs = np.asarray(uvs)[:, :2]
         if colors is not None:
-            colors = [channel for color in colors for channel in color]
-        indices = [index for triangle in indices for index in triangle]
-        mesh_instance = cls(vertices, uvs=final_uvs ,normals=normals ,colors=colors, indices=indices, verbose=verbose)
+            # first color set, without alpha
+            colors = np.asarray(colors[0])[:, :3]
+        indices = np.asarray(indices)
+        mesh_instance = cls(vertices, uvs=final_uvs ,normals=normals ,colors=colors, indices=indices, compressed=compress, verbose=verbose)
+        # the levels of detail get saved with the mesh
+        mesh_instance.generate_lods()
 
         assimp.release(asset)
 
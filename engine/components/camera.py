@@ -1,4 +1,5 @@
 import pyrr
+import numpy as np
 
 # i think it's a better practise to use absolute import path
 # from .component import Component
@@ -34,16 +35,27 @@ class Camera(Component):
 
         self.clear_color = (0.705, 0.980, 0.992) # light blue
 
-        # whenever we have a class that inherits from Component
-        # and we DO have a valid component gui implemented, then set it
-        self.gui = CameraGUI(self)
+        # skip objects hidden behind others using gpu queries (see occlusion_culling.py)
+        self.occlusion_culling = False
+
         self.name = "camera"
 
         # shortcut for now
         self.transform = self.game_object.transform
 
+        # version of the transform used for the cached view_projection.
+        # other clients can read (and clean) the transform's view matrix,
+        # so we can not rely on its dirty flag
+        self._view_projection_version = -1
+        self._view_projection_dirty = True
+        self._frustum_planes = None
+
         self._set_projection_matrix()
 
+    # built the first time an inspector shows us (see Component.gui)
+    def _create_gui(self):
+        return CameraGUI(self)
+
     # internal getters
     @property
     def vfov(self):
@@ -101,11 +113,39 @@ class Camera(Component):
             self._view_projection = pyrr.matrix44.multiply(
                 self.transform.view_mat, self.projection
             )
+            self._view_projection_version = self.transform.version
+            self._view_projection_dirty = False
+            self._frustum_planes = None
         return self._view_projection
 
+    # the 6 planes (left, right, bottom, top, near, far) as rows (a, b, c, d)
+    # with normals pointing inside the frustum and normalized,
+    # so a*x + b*y + c*z + d is the signed distance of a world space point to the plane.
+    # extracted directly from the view projection matrix (gribb-hartmann).
+    # with pyrr's convention clip = point * view_projection, so clip.x is the dot
+    # product with the first column and so on.
+    @property
+    def frustum_planes(self):
+        view_projection = self.view_projection
+        if self._frustum_planes is None:
+            columns = np.asarray(view_projection, dtype=np.float64).T
+            planes = np.array([
+                columns[3] + columns[0],    # left
+                columns[3] - columns[0],    # right
+                columns[3] + columns[1],    # bottom
+                columns[3] - columns[1],    # top
+                columns[3] + columns[2],    # near
+                columns[3] - columns[2],    # far
+            ])
+            planes /= np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+            self._frustum_planes = planes
+        return self._frustum_planes
+
     @property
     def view_projection_dirty(self):
-        return self._projection_dirty or self.transform.view_dirty
+        return (self._view_projection_dirty
+            or self._projection_dirty
+            or self._view_projection_version != self.transform.version)
 
     def look_at(self, eye, center, up):
         pass
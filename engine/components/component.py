@@ -1,12 +1,78 @@
+import engine.editor
+
 # since python list can have elements of different types,
 # do we actually need a base class for components?
 class Component:
 
+    # components that can keep their data in the ecs world of the scene (see ecs.py)
+    # give the name and dtype of their rows. when the game object gets an entity,
+    # the scene moves their data into the world and their update is done
+    # by ecs_system for all of them at once
+    ecs_name = None
+    ecs_dtype = None
+
     def __init__(self, game_object):
         self.game_object = game_object
         self.name = ""
-        self.gui = None
+        # editor gui of the component. it's only built the first time
+        # an inspector needs it (see the gui property)
+        self._gui = None
 
         # in Unity, the class hierarchy is
         # Component > Behaviour > MonoBehaviour with the enabled property at Behaviour level
-        self.enabled = True
+        self._enabled = True
+
+        # set while our data live in an ecs world
+        self._world = None
+        self._entity = None
+
+    @property
+    def gui(self):
+        if self._gui is None and engine.editor.enabled:
+            self._gui = self._create_gui()
+        return self._gui
+
+    @gui.setter
+    def gui(self, value):
+        self._gui = value
+
+    # called when the inspector showing it gets closed
+    def release_gui(self):
+        self._gui = None
+
+    # components having a gui return a new instance of it
+    def _create_gui(self):
+        return None
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    # it's a property so subclasses can react to it (see _on_enabled_changed)
+    @enabled.setter
+    def enabled(self, value):
+        if value == self._enabled:
+            return
+        self._enabled = value
+        self._on_enabled_changed()
+
+    def _on_enabled_changed(self):
+        pass
+
+    # the row of our data in the world (see ecs_name)
+    def _ecs_values(self):
+        return None
+
+    def _bind_entity(self, world, entity):
+        self._world = world
+        self._entity = entity
+
+    # called before the component gets removed from the world.
+    # subclasses take a copy of their data back
+    def _unbind_entity(self):
+        self._world = None
+        self._entity = None
+
+    # the row of our component in the world (don't keep it, rows move)
+    def _ecs_row(self):
+        return self._world.get_component(self._entity, self.ecs_name)
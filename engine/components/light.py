@@ -28,9 +28,18 @@ class Light(Component):
         # self.color = (1.0, 0.992, 0.658) # yellowish
         self.color = (1.0, 1.0, 0.878) # yellowish
 
-        self.gui = light_gui.LightGUI(self)
+        # point lights only.
+        # distance at which the light stops having any effect
+        # (used to find the light clusters they touch, see light_clusters.py)
+        self.range = 10.0
+        self.intensity = 1.0
+
         self.name = "light"
 
+    # built the first time an inspector shows us (see Component.gui)
+    def _create_gui(self):
+        return light_gui.LightGUI(self)
+
     # internal getters
     @property
     def position(self):
@@ -13,6 +13,145 @@ from .component import Component
 from engine.gui import MeshRendererGUI
 
 import ctypes
+import weakref
+import numpy as np
+
+# renderers drawing the same mesh with the same shader program
+# end up with exactly the same vao configuration, so they share it.
+# that way, the render queue can draw all of them without switching vaos.
+# mesh -> {shader: vao}. meshes are weak keys: once nothing else uses a mesh,
+# its vaos are released too (see get_vao)
+_vao_cache = weakref.WeakKeyDictionary()
+# vaos of collected meshes waiting to be deleted. the gc can collect a mesh at any point,
+# even without our gl context being current, so they are deleted by the render loop
+# (see delete_released_vaos)
+_released_vaos = []
+
+# numpy type of the stored vertex values -> opengl type (see vertex_layout.FORMAT_DTYPES)
+_gl_types = {
+    np.dtype(np.float32) : gl.GL_FLOAT,
+    np.dtype(np.float16) : gl.GL_HALF_FLOAT,
+    np.dtype(np.uint16) : gl.GL_UNSIGNED_SHORT,
+    np.dtype(np.uint8) : gl.GL_UNSIGNED_BYTE,
+    np.dtype(np.int8) : gl.GL_BYTE,
+}
+
+# connects the mesh buffers to the vertex attributes of the shader.
+# also used by the instanced renderers (see instanced_renderer.py)
+def configure_vao(vao, mesh, shader):
+    # we need to configure the vao
+    # for that, we need to have the mesh data
+    # and the current material/shader vertex attribs
+    gl.glBindVertexArray(vao)
+
+    # to configure the vao, we need the vbo and ebo bound
+    # do we need to ensure we have the right vbo
+    # this need to be done after biding the vao
+    mesh.bind_buffers()
+
+    # let's check how well matches the mesh data
+    # with the material/shader that we are going to use
+    # opengl offers two functions to inspect shaders' input:
+    # - glGetProgramiv(program, GL_ACTIVE_ATTRIBUTES)
+    #   that returns a list of attributes available and their type.
+    #   actually, the previous function just return the NUMBER of ative attribs.
+    #   the actual function to get the data attrib data is:
+    # - glGetActiveAttrib(program, index, returned_data)
+    # - glGetAttribLocation(program, attribName)
+    #   that returns specifically the location parameter of the attribute.
+    # NONE of this need the program to be bound (in use). That's why we need to specify the program
+
+    # let's check what's available in the shader
+    # do we need the glUseProgram() when calling glGetAttribLocation?
+
+    # we are not just 'checking' how well they match
+    # but we are also connecting mesh data to vertex attributes in vertex shader.
+    # we actually need to perform this every time we replace the material
+    # i think this part of the code should be using some interace provided by the material
+    for attrib in vertex_attrib_loc:
+        loc = gl.glGetAttribLocation(shader.program, attrib)
+        if (loc >= 0):
+            # things to test:
+            # - do not enable the attrib at all if vertex doesn't have data
+            # - enable attrib but don't specify any layout (attribPointer)
+            # compressed normals feed another input (see vertex_layout.VertexLayout.source)
+            source = mesh.layout.source(attrib)
+            if source is not None:
+                gl.glEnableVertexAttribArray(loc)
+                # where the attribute is in the vbo depends on the layout of the mesh
+                # (planar or interleaved, see vertex_layout.py) and so does its format
+                gl.glVertexAttribPointer(
+                    loc,            # index of the generic vertex attribute
+                    mesh.layout.components(source),  # size: nr of components in the vertex attribute
+                    _gl_types[mesh.layout.dtype(source)],    # data type of each element
+                    gl.GL_TRUE if mesh.layout.normalized(source) else gl.GL_FALSE,    # should data go through normalization?
+                    mesh.layout.strides[source],    # stride: bytes from one vertex to the next
+                    ctypes.c_void_p(mesh.layout.offsets[source]) # offset but in pointer format (it's supposed to be an adddres)
+                )
+            else:
+                # enabling the attrib without specifying the data source
+                # with glVertexAttribPointer failed at rendering time
+                # gl.glEnableVertexAttribArray(loc)
+
+                # it seems that we need to use glDisableVertexAttribArray
+                # if we are not going to enable it
+                gl.glDisableVertexAttribArray(loc)
+
+    gl.glBindVertexArray(0)
+
+# shared vao for drawing the mesh with the shader (created the first time)
+def get_vao(mesh, shader):
+    vaos = _vao_cache.get(mesh)
+    if vaos is None:
+        vaos = {}
+        _vao_cache[mesh] = vaos
+        # the vaos of the mesh go away with it
+        weakref.finalize(mesh, _release_later, vaos)
+    if shader not in vaos:
+        vao = gl.glGenVertexArrays(1)
+        vaos[shader] = vao
+        configure_vao(vao, mesh, shader)
+    return vaos[shader]
+
+def _delete_vaos(vaos):
+    if len(vaos) > 0:
+        gl.glDeleteVertexArrays(len(vaos), list(vaos.values()))
+        vaos.clear()
+
+# no gl calls here (called by the gc)
+def _release_later(vaos):
+    _released_vaos.extend(vaos.values())
+    vaos.clear()
+
+# deletes the vaos of the meshes collected since the last call.
+# called once per frame from the render loop (see Scene.update)
+def delete_released_vaos():
+    vaos = []
+    while len(_released_vaos) > 0:
+        vaos.append(_released_vaos.pop())
+    if len(vaos) > 0:
+        gl.glDeleteVertexArrays(len(vaos), vaos)
+
+# after changing the layout of the mesh (see BaseMesh.set_layout).
+# vaos keep their ids so renderers holding them don't need to know
+def reconfigure_vaos(mesh):
+    for shader, vao in _vao_cache.get(mesh, {}).items():
+        configure_vao(vao, mesh, shader)
+
+# for meshes that are going away (like rebuilt static batches)
+# without waiting for them to be collected
+def release_vaos(mesh):
+    vaos = _vao_cache.pop(mesh, None)
+    if vaos is not None:
+        _delete_vaos(vaos)
+
+# levels of detail (see BaseMesh.generate_lods).
+# the level is picked by the size of the object on screen: the radius of its bounding sphere
+# relative to half the height of the screen. level i + 1 is used below LOD_SCREEN_SIZES[i].
+LOD_SCREEN_SIZES = (0.5, 0.25, 0.1)
+# to avoid popping back and forth around a threshold, a level is only left
+# when the size is this fraction beyond the threshold
+LOD_HYSTERESIS = 0.1
 
 class MeshRenderer(Component):
     # we could say this class is in charge of rendering a model using some material
@@ -27,16 +166,25 @@ class MeshRenderer(Component):
 
         self.mesh = mesh
 
-        # whenever we have a class that inherits from Component
-        # and we DO have a valid component gui, then set it
-        self.gui = MeshRendererGUI(self)
         self.name = "mesh renderer"
 
-        self.vao = gl.glGenVertexArrays(1)
+        # the vao is picked (or created) the first time it's needed after setting the material.
+        # meshes loaded with a scene file are not read until then (see asset_database.py)
+        self._vao = None
+
+        # level of detail currently used by each camera.
+        # cameras are weak keys so removed cameras don't stay around because of us
+        self._lod_levels = weakref.WeakKeyDictionary()
+        # > 1 keeps more detail, < 1 less
+        self.lod_bias = 1.0
 
         # set up material-mesh link by calling the setter property
         self.material = material
 
+    # built the first time an inspector shows us (see Component.gui)
+    def _create_gui(self):
+        return MeshRendererGUI(self)
+
     # material getter
     @property
     def material(self):
@@ -46,67 +194,32 @@ class MeshRenderer(Component):
     @material.setter
     def material(self, value):
         self._material = value
+        self._vao = None
 
-        # we need to configure the vao
-        # for that, we need to have the mesh data
-        # and the current material/shader vertex attribs
-        gl.glBindVertexArray(self.vao)
+        # the scene groups renderers by material
+        self._notify_render_queue()
 
-        # to configure the vao, we need the vbo and ebo bound
-        # do we need to ensure we have the right vbo
-        # this need to be done after biding the vao
-        self.mesh.bind_buffers()
-
-        # let's check how well matches the mesh data
-        # with the material/shader that we are going to use
-        # opengl offers two functions to inspect shaders' input:
-        # - glGetProgramiv(program, GL_ACTIVE_ATTRIBUTES)
-        #   that returns a list of attributes available and their type.
-        #   actually, the previous function just return the NUMBER of ative attribs.
-        #   the actual function to get the data attrib data is:
-        # - glGetActiveAttrib(program, index, returned_data)
-        # - glGetAttribLocation(program, attribName)
-        #   that returns specifically the location parameter of the attribute.
-        # NONE of this need the program to be bound (in use). That's why we need to specify the program
-
-        # let's check what's available in the shader
-        # do we need the glUseProgram() when calling glGetAttribLocation?
-
-        # we are not just 'checking' how well they match
-        # but we are also connecting mesh data to vertex attributes in vertex shader.
-        # we actually need to perform this every time we replace the material
-        # i think this part of the code should be using some interace provided by the material
-        for attrib in vertex_attrib_loc:
-            loc = gl.glGetAttribLocation(self._material.shader.program, attrib)
-            if (loc >= 0):
-                # things to test:
-                # - do not enable the attrib at all if vertex doesn't have data
-                # - enable attrib but don't specify any layout (attribPointer)
-                print("{} attrib available in shader {}".format(attrib, self._material.shader.program))
-                if self.mesh.attribs[attrib] is not None:
-                    print("{} attrib available in mesh data".format(attrib))
-                    gl.glEnableVertexAttribArray(loc)
-                    gl.glVertexAttribPointer(
-                        loc,            # index of the generic vertex attribute
-                        self.mesh.attribs_size[attrib],  # size: nr of components in the vertex attribute
-                        gl.GL_FLOAT,    # data type of each element
-                        gl.GL_FALSE,    # should data go through normalization?
-                        0,              # stride
-                        ctypes.c_void_p(self.mesh.attribs_offset[attrib]) # offset but in pointer format (it's supposed to be an adddres)
-                    )
-                else:
-                    # enabling the attrib without specifying the data source
-                    # with glVertexAttribPointer failed at rendering time
-                    # gl.glEnableVertexAttribArray(loc)
-
-                    # it seems that we need to use glDisableVertexAttribArray
-                    # if we are not going to enable it
-                    gl.glDisableVertexAttribArray(loc)
-                    print("{} attrib not available in mesh data".format(attrib))
-            else:
-                print("{} attrib not available in shader {}".format(attrib, self._material.shader.program))
+    @property
+    def vao(self):
+        if self._vao is None:
+            self._vao = get_vao(self.mesh, self._material.shader)
+        return self._vao
 
-        gl.glBindVertexArray(0)
+    # renderers with the same key share their vao (see get_vao)
+    @property
+    def vao_key(self):
+        return (self.mesh, self._material.shader)
+
+    def _on_enabled_changed(self):
+        self._notify_render_queue()
+
+    def _notify_render_queue(self):
+        # renderers used by the editor (grid, gizmos) don't belong to any game object
+        if self.game_object is not None and self.game_object.scene is not None:
+            self.game_object.scene.render_queue.renderer_changed(self)
+            # static batches bake the material and the enabled state of their renderers
+            if self.game_object.static:
+                self.game_object.scene._static_changed()
 
     def render(self):
         # there is some sort of double 'dependency' here.
@@ -118,6 +231,60 @@ class MeshRenderer(Component):
         self.mesh.draw()
         gl.glBindVertexArray(0)
 
+    # world space axis aligned box enclosing the mesh (min, max).
+    # it's the mesh box transformed by the model matrix and boxed again,
+    # so it can be bigger than the tightest one when rotated
+    def world_bounds(self):
+        model_mat = np.asarray(self.game_object.transform.model_mat, dtype=np.float64)
+        local_center = (self.mesh.aabb_min + self.mesh.aabb_max) / 2
+        local_extent = (self.mesh.aabb_max - self.mesh.aabb_min) / 2
+        # row vectors (pyrr's convention): translation in the last row
+        center = local_center @ model_mat[:3, :3] + model_mat[3, :3]
+        extent = local_extent @ np.abs(model_mat[:3, :3])
+        return center - extent, center + extent
+
+    # radius of the bounding sphere over half the screen height (for the given camera)
+    def screen_size(self, camera):
+        model_mat = np.asarray(self.game_object.transform.model_mat, dtype=np.float64)
+        center = self.mesh.bounding_sphere_center @ model_mat[:3, :3] + model_mat[3, :3]
+        scale = np.sqrt(np.max(np.sum(model_mat[:3, :3] ** 2, axis=1)))
+        radius = self.mesh.bounding_sphere_radius * scale
+        distance = np.linalg.norm(center - np.asarray(camera.transform.position, dtype=np.float64))
+        if distance <= radius:
+            return float("inf")
+        return radius / (distance * np.tan(np.radians(camera.vfov) / 2))
+
+    # the mesh to draw from the given camera: the mesh itself or one of its levels of detail.
+    # the screen size can be given when it's already known (see RenderQueue.screen_sizes)
+    def lod_mesh(self, camera, screen_size = None):
+        lods = self.mesh.lods
+        if len(lods) == 0:
+            return self.mesh
+        nr_levels = min(len(lods), len(LOD_SCREEN_SIZES))
+
+        if screen_size is None:
+            screen_size = self.screen_size(camera)
+        size = screen_size * self.lod_bias
+        level = min(self._lod_levels.get(camera, 0), nr_levels)
+        while level < nr_levels and size < LOD_SCREEN_SIZES[level] * (1 - LOD_HYSTERESIS):
+            level = level + 1
+        while level > 0 and size > LOD_SCREEN_SIZES[level - 1] * (1 + LOD_HYSTERESIS):
+            level = level - 1
+        self._lod_levels[camera] = level
+
+        return self.mesh if level == 0 else lods[level - 1]
+
+    # vao for drawing the mesh or one of its levels of detail with the current material
+    def vao_for(self, mesh):
+        if mesh is self.mesh:
+            return self.vao
+        return get_vao(mesh, self._material.shader)
+
+    # used by the scene when drawing the render queue.
+    # the vao (and material) are expected to be already bound
+    def draw(self):
+        self.mesh.draw()
+
     # we need to support a variable number of "uniform_value".
     def set_uniform(self, uniform_name, *uniform_values):
         # common function for setting uniforms
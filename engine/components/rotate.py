@@ -1,22 +1,88 @@
+import numpy as np
 import pyrr
 
 # i don't want to reference things as engine.<thing>
 # i want to reference them by the actual name of the engine as
 # kalsengi.time
 import engine.time
+import engine.math
 from .component import Component
 
 
 class Rotate(Component):
 
+    # in an ecs world, rotate rows are updated all at once by ecs_system
+    ecs_name = "rotate"
+    ecs_dtype = np.dtype([
+        ("angular_speed", np.float32),
+        ("axis", np.float32, (3,)),
+        ("enabled", np.bool_),
+    ])
+
     def __init__(self, game_object, angular_speed = 15.0, axis = pyrr.Vector3([0, 1, 0])):
         super().__init__(game_object)
 
-        self.angular_speed = angular_speed
-        self.axis = axis
+        self._angular_speed = angular_speed
+        self._axis = axis
+
+    # while bound to an entity, our data live in the world
+    @property
+    def angular_speed(self):
+        if self._world is not None:
+            return float(self._ecs_row()["angular_speed"])
+        return self._angular_speed
+
+    @angular_speed.setter
+    def angular_speed(self, value):
+        if self._world is not None:
+            self._ecs_row()["angular_speed"] = value
+        else:
+            self._angular_speed = value
+
+    @property
+    def axis(self):
+        if self._world is not None:
+            return pyrr.Vector3(self._ecs_row()["axis"])
+        return self._axis
+
+    @axis.setter
+    def axis(self, value):
+        if self._world is not None:
+            self._ecs_row()["axis"] = value
+        else:
+            self._axis = value
 
     def update(self):
         # we need to access our Time singleton here
         delta_rot = (self.angular_speed * engine.time.delta_time) * (self.axis)
         # delta_rot = self.angular_speed * (self.axis)
         self.game_object.transform.rotate(delta_rot)
+
+    def _on_enabled_changed(self):
+        if self._world is not None:
+            self._ecs_row()["enabled"] = self.enabled
+
+    def _ecs_values(self):
+        return (self._angular_speed, self._axis, self.enabled)
+
+    def _unbind_entity(self):
+        row = self._ecs_row()
+        self._angular_speed = float(row["angular_speed"])
+        self._axis = pyrr.Vector3(row["axis"])
+        super()._unbind_entity()
+
+    # same as update, for every rotate row of an archetype at once
+    @staticmethod
+    def ecs_system(transform_store, archetype):
+        rotates = archetype.column("rotate")
+        enabled = rotates["enabled"]
+        if not np.any(enabled):
+            return
+        slots = archetype.column("transform")["slot"][enabled]
+        speeds = rotates["angular_speed"][enabled] * engine.time.delta_time
+        euler = speeds[:, np.newaxis] * rotates["axis"][enabled]
+        delta = engine.math.quaternion_from_euler(euler)
+        # applied on top of the current rotation (same as Transform.rotate)
+        rotations = transform_store.rotations
+        rotations[slots] = engine.math.quaternion_multiply(rotations[slots], delta)
+        transform_store.rotations_written(slots)
@@ -0,0 +1,242 @@
+# archetype based entity component storage.
+# game objects keep their components in a python list and every component
+# updates itself, one python call per component per frame.
+# that's fine for a few hundred objects, but big simulations spend the whole frame in those calls.
+#
+# here an entity is just an id. its components are rows of numpy structured arrays (one dtype per
+# component type) and entities with exactly the same set of components are stored together
+# in an archetype, one column per component type:
+#
+#   archetype ("rotate", "transform")
+#     entities    [ 3,  7,  8, ...]
+#     rotate      [(speed, axis), ...]
+#     transform   [(slot,), ...]
+#
+# systems work on whole columns at once (see World.add_system).
+# adding or removing a component moves the entity to another archetype,
+# so that's meant to happen once in a while, not every frame.
+#
+# game objects and components keep working as before. scenes created with a world
+# give every game object an entity, and the components that know how to keep their data
+# in the world (see Component.ecs_name) become thin handles over their row,
+# in the same way transforms become handles over their slot of a TransformStore.
+
+import numpy as np
+
+# every entity of a scene has the slot of its transform in the TransformStore of the scene
+TRANSFORM_DTYPE = np.dtype([("slot", np.int64)])
+
+class Archetype:
+
+    def __init__(self, signature, dtypes, capacity = 64):
+        # sorted tuple of component names
+        self.signature = signature
+        self.capacity = max(capacity, 1)
+        self.size = 0
+        self.entities = np.empty(self.capacity, dtype=np.int64)
+        self._columns = {name : np.zeros(self.capacity, dtype=dtypes[name]) for name in signature}
+
+    def column(self, name):
+        """ the rows in use of a component type (a view, writes go to the storage) """
+        return self._columns[name][:self.size]
+
+    def entities_view(self):
+        return self.entities[:self.size]
+
+    def has(self, name):
+        return name in self._columns
+
+    # rows for count new entities at the end. returns the first row
+    def _append(self, entities):
+        count = len(entities)
+        while self.size + count > self.capacity:
+            self._grow()
+        first = self.size
+        self.size = self.size + count
+        self.entities[first:self.size] = entities
+        return first
+
+    # the last row takes the place of the removed one.
+    # returns the entity that got moved (-1 if the removed row was the last one)
+    def _remove(self, row):
+        last = self.size - 1
+        moved = -1
+        if row != last:
+            self.entities[row] = self.entities[last]
+            for column in self._columns.values():
+                column[row] = column[last]
+            moved = int(self.entities[row])
+        self.size = last
+        return moved
+
+    def _grow(self):
+        self.capacity = self.capacity * 2
+        entities = np.empty(self.capacity, dtype=np.int64)
+        entities[:self.size] = self.entities[:self.size]
+        self.entities = entities
+        for name, old_column in self._columns.items():
+            column = np.zeros(self.capacity, dtype=old_column.dtype)
+            column[:self.size] = old_column[:self.size]
+            self._columns[name] = column
+
+class World:
+
+    def __init__(self):
+        # component name -> numpy dtype of its rows
+        self.dtypes = {}
+        # signature -> archetype
+        self.archetypes = {}
+        # entity -> (archetype, row). None for destroyed entities
+        self._locations = []
+        self._free_entities = []
+        # names of a query -> matching archetypes. kept up to date when new archetypes show up
+        self._queries = {}
+        # (system, names) in the order they were added
+        self._systems = []
+
+    def register_component(self, name, dtype):
+        dtype = np.dtype(dtype)
+        if name in self.dtypes:
+            if self.dtypes[name] != dtype:
+                raise Exception("component {} is already registered with another dtype".format(name))
+            return
+        self.dtypes[name] = dtype
+
+    def is_registered(self, name):
+        return name in self.dtypes
+
+    def create_entity(self, **components):
+        """ new entity with the given components (name = values of its row) """
+        if len(self._free_entities) > 0:
+            entity = self._free_entities.pop()
+        else:
+            entity = len(self._locations)
+            self._locations.append(None)
+        archetype = self._get_archetype(tuple(sorted(components.keys())))
+        row = archetype._append([entity])
+        for name, values in components.items():
+            archetype._columns[name][row] = values
+        self._locations[entity] = (archetype, row)
+        return entity
+
+    def create_entities(self, count, **columns):
+        """
+        count new entities sharing the same components.
+        every column is an array with the rows of the new entities (or a single row for all of them).
+        returns the array of entity ids
+        """
+        first = len(self._locations)
+        entities = np.arange(first, first + count, dtype=np.int64)
+        archetype = self._get_archetype(tuple(sorted(columns.keys())))
+        first_row = archetype._append(entities)
+        for name, values in columns.items():
+            archetype._columns[name][first_row:first_row + count] = values
+        self._locations.extend((archetype, row) for row in range(first_row, first_row + count))
+        return entities
+
+    def destroy_entity(self, entity):
+        archetype, row = self._location(entity)
+        self._remove_row(archetype, row)
+        self._locations[entity] = None
+        self._free_entities.append(entity)
+
+    def is_alive(self, entity):
+        return 0 <= entity < len(self._locations) and self._locations[entity] is not None
+
+    def has_component(self, entity, name):
+        archetype, row = self._location(entity)
+        return archetype.has(name)
+
+    def get_component(self, entity, name):
+        """
+        the row of the component (a numpy structured scalar, writing its fields writes the storage).
+        don't keep it around, rows move when entities change their components
+        """
+        archetype, row = self._location(entity)
+        if not archetype.has(name):
+            raise Exception("entity {} has no component {}".format(entity, name))
+        return archetype._columns[name][row]
+
+    def add_component(self, entity, name, values = None):
+        archetype, row = self._location(entity)
+        if archetype.has(name):
+            raise Exception("entity {} already has a component {}".format(entity, name))
+        target = self._get_archetype(tuple(sorted(archetype.signature + (name,))))
+        new_row = self._move(entity, archetype, row, target)
+        if values is not None:
+            target._columns[name][new_row] = values
+        else:
+            target._columns[name][new_row] = np.zeros((), dtype=self.dtypes[name])
+
+    def remove_component(self, entity, name):
+        archetype, row = self._location(entity)
+        if not archetype.has(name):
+            raise Exception("entity {} has no component {}".format(entity, name))
+        target = self._get_archetype(tuple(n for n in archetype.signature if n != name))
+        self._move(entity, archetype, row, target)
+
+    def query(self, *names):
+        """ archetypes having (at least) all the given components """
+        key = tuple(sorted(names))
+        if key not in self._queries:
+            self._queries[key] = [
+                archetype for archetype in self.archetypes.values()
+                if all(archetype.has(name) for name in key)
+            ]
+        return self._queries[key]
+
+    def add_system(self, system, *names):
+        """ system(archetype) gets called on every update for each non empty archetype matching names """
+        self._systems.append((system, names))
+
+    def remove_system(self, system):
+        self._systems = [entry for entry in self._systems if entry[0] is not system]
+
+    def update(self):
+        for system, names in self._systems:
+            for archetype in self.query(*names):
+                if archetype.size > 0:
+                    system(archetype)
+
+    @property
+    def nr_entities(self):
+        return len(self._locations) - len(self._free_entities)
+
+    ############################################################################
+    # private methods
+    ############################################################################
+
+    def _location(self, entity):
+        location = self._locations[entity] if 0 <= entity < len(self._locations) else None
+        if location is None:
+            raise Exception("entity {} doesn't exist".format(entity))
+        return location
+
+    def _get_archetype(self, signature):
+        archetype = self.archetypes.get(signature)
+        if archetype is not None:
+            return archetype
+        for name in signature:
+            if name not in self.dtypes:
+                raise Exception("component {} is not registered".format(name))
+        archetype = Archetype(signature, self.dtypes)
+        self.archetypes[signature] = archetype
+        for key, archetypes in self._queries.items():
+            if all(archetype.has(name) for name in key):
+                archetypes.append(archetype)
+        return archetype
+
+    # copies the components the entity keeps into a row of target
+    def _move(self, entity, source, row, target):
+        new_row = target._append([entity])
+        for name in target.signature:
+            if source.has(name):
+                target._columns[name][new_row] = source._columns[name][row]
+        self._remove_row(source, row)
+        self._locations[entity] = (target, new_row)
+        return new_row
+
+    def _remove_row(self, archetype, row):
+        moved = archetype._remove(row)
+        if moved >= 0:
+            self._locations[moved] = (archetype, row)
@@ -0,0 +1,6 @@
+# editor singleton (same idea as time.py)
+
+# the editor (hierarchy panel, inspectors and the guis of the components) is on by default.
+# game only or headless runs set this to False before building their scenes
+# and nothing editor related gets created
+enabled = True
@@ -9,6 +9,7 @@ import engine.material_manager
 from engine.gui.camera_gui import CameraGUI
 from engine.gui.transform_gui import TransformGUI
 from engine.texture import Texture
+from engine import vertex_layout
 
 class EditorWindow:
 
@@ -149,6 +150,10 @@ class RenderingInfoWindow(EditorWindow):
     def __init__(self, main_window):
         super().__init__(main_window)
         self.fps_counter = FPSCounter()
+        # scene mesh memory (see Scene.mesh_memory).
+        # it goes through every mesh so it's only updated once per second
+        self.mesh_memory = (0, 0)
+        self.mesh_memory_time = None
 
     def update(self):
         # maybe this should only be done if the window is open
@@ -180,6 +185,46 @@ class RenderingInfoWindow(EditorWindow):
             if changed:
                 self.main_window.vsync = value
 
+            render_queue = self.main_window.scene.render_queue
+            changed, value = imgui.checkbox("frustum culling", render_queue.culling)
+            if changed:
+                render_queue.culling = value
+            changed, value = imgui.checkbox("gpu instancing", render_queue.instancing)
+            if changed:
+                render_queue.instancing = value
+            scene = self.main_window.scene
+            changed, value = imgui.checkbox("static batching", scene.static_batching)
+            if changed:
+                scene.static_batching = value
+                scene._static_changed()
+            nr_batched = sum(len(batch.renderers) for batch in scene.static_batches)
+            imgui.text("static batches: {} ({} renderers, {} draw calls saved)".format(
+                len(scene.static_batches), nr_batched, nr_batched - len(scene.static_batches)))
+            imgui.text("renderers: {}".format(len(render_queue.renderers)))
+            imgui.text("scene gpu time: {:.2f} ms".format(self.main_window.scene_gpu_timer.milliseconds))
+            # to compare both layouts of the vertex buffers (see vertex_layout.py)
+            changed, value = imgui.checkbox("interleaved vertices", scene.vertex_layout == vertex_layout.INTERLEAVED)
+            if changed:
+                scene.set_vertex_layout(vertex_layout.INTERLEAVED if value else vertex_layout.PLANAR)
+            if self.mesh_memory_time is None or engine.time.time - self.mesh_memory_time > 1.0:
+                self.mesh_memory = scene.mesh_memory()
+                self.mesh_memory_time = engine.time.time
+            gpu_bytes, uncompressed_bytes = self.mesh_memory
+            saved = 1.0 - gpu_bytes / uncompressed_bytes if uncompressed_bytes > 0 else 0.0
+            imgui.text("mesh memory: {:.2f} MB ({:.2f} MB uncompressed, {:.0f}% saved)".format(
+                gpu_bytes / 1048576, uncompressed_bytes / 1048576, saved * 100))
+            for name, value in render_queue.stats.items():
+                imgui.text("{}: {}".format(name, value))
+            imgui.text("queue changes: {}".format(render_queue.nr_changes))
+            imgui.text("queue rebuilds: {}".format(render_queue.nr_rebuilds))
+            light_clusters = self.main_window.scene.light_clusters
+            imgui.text("point lights: {} ({} cluster references, max {} per cluster)".format(
+                light_clusters.nr_lights, light_clusters.nr_references, light_clusters.max_cluster_lights))
+
+            spatial_index = self.main_window.scene.spatial_index
+            imgui.text("spatial index: {} objects, height {}".format(spatial_index.nr_proxies, spatial_index.height))
+            imgui.text("spatial index reinserts: {}".format(spatial_index.nr_reinserts))
+
             imgui.end()
 
 
@@ -0,0 +1,66 @@
+# data that is the same for every draw of a frame (camera matrices and lights).
+# it used to be uploaded with glUniform calls for every material the scene used,
+# and the mvp matrix was computed in python for every object.
+# now it goes once per camera into a uniform buffer object (ubo)
+# and all shader programs read it from the FrameData block
+# (engine/shaders/include/frame_data.glsl).
+# shaders only need a model matrix per object.
+
+import numpy as np
+import OpenGL.GL as gl
+
+# the binding point all programs connect their FrameData block to (see Shader._compile)
+FRAME_DATA_BINDING = 0
+FRAME_DATA_BLOCK = "FrameData"
+
+# std140 layout in floats (see frame_data.glsl)
+_VIEW = 0
+_PROJECTION = 16
+_VIEW_PROJECTION = 32
+_CAMERA_POS = 48
+_LIGHT_POS = 52
+_LIGHT_COLOR = 56
+_CLIP_PLANES = 60
+_CLUSTER_GRID = 64
+_SIZE = 68
+
+class FrameUniforms:
+
+    def __init__(self):
+        # we reuse the same array every frame
+        self.data = np.zeros(_SIZE, dtype=np.float32)
+
+        self.ubo = gl.glGenBuffers(1)
+        gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, self.ubo)
+        gl.glBufferData(gl.GL_UNIFORM_BUFFER, self.data.nbytes, None, gl.GL_DYNAMIC_DRAW)
+        gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, 0)
+        gl.glBindBufferBase(gl.GL_UNIFORM_BUFFER, FRAME_DATA_BINDING, self.ubo)
+
+        # how many times the buffer was uploaded (once per camera per frame)
+        self.nr_uploads = 0
+
+    # cluster_grid is the nr of light clusters along x, y and z (see light_clusters.py)
+    def update(self, camera, light_sources, cluster_grid = (1, 1, 1)):
+        data = self.data
+        # matrices go in pyrr's layout, the same memory that glUniformMatrix4fv
+        # used to receive without transposing
+        data[_VIEW:_VIEW + 16] = np.ravel(camera.transform.view_mat)
+        data[_PROJECTION:_PROJECTION + 16] = np.ravel(camera.projection)
+        data[_VIEW_PROJECTION:_VIEW_PROJECTION + 16] = np.ravel(camera.view_projection)
+        data[_CAMERA_POS:_CAMERA_POS + 3] = camera.transform.position
+        data[_CLIP_PLANES:_CLIP_PLANES + 2] = (camera.near, camera.far)
+        data[_CLUSTER_GRID:_CLUSTER_GRID + 3] = cluster_grid
+
+        # only one light is supported for now
+        if len(light_sources) > 0:
+            data[_LIGHT_POS:_LIGHT_POS + 4] = light_sources[0].position
+            data[_LIGHT_COLOR:_LIGHT_COLOR + 3] = light_sources[0].color
+        else:
+            data[_LIGHT_POS:_CLIP_PLANES] = 0
+
+        gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, self.ubo)
+        gl.glBufferSubData(gl.GL_UNIFORM_BUFFER, 0, data.nbytes, data)
+        gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, 0)
+        # other code could have used the binding point in between
+        gl.glBindBufferBase(gl.GL_UNIFORM_BUFFER, FRAME_DATA_BINDING, self.ubo)
+        self.nr_uploads = self.nr_uploads + 1
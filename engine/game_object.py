@@ -21,9 +21,19 @@ class GameObject:
 
     def __init__(self, name=""):
         self.id = GameObject.nr_instances
-        self.name = name
+        self._name = name
         self.components = []
+        # requested type -> what get_component found for it (None included).
+        # get_component is called a lot, this saves scanning the list most of the time
+        self._components_by_type = {}
         self.transform = Transform(game_object=self)
+        # set by the scene when the game object gets added to it
+        self.scene = None
+        # static game objects are not supposed to move.
+        # their renderers get baked into the static batches of the scene (see static_batcher.py)
+        self._static = False
+        # id of our entity in the ecs world of the scene (see ecs.py), if it has one
+        self.entity = None
 
         GameObject.nr_instances = GameObject.nr_instances + 1
 
@@ -35,10 +45,51 @@ class GameObject:
     def add_component(self, component_type, *params):
         component = component_type(self, *params)
         self.components.append(component)
+        self._components_by_type = {}
+        # components added after the game object is in the scene
+        # need to be registered too (update lists, cameras, lights)
+        if self.scene is not None:
+            self.scene._register_component(component)
         return component
 
+    @property
+    def name(self):
+        return self._name
+
+    # the hierarchy panel of the scene indexes the names
+    @name.setter
+    def name(self, value):
+        self._name = value
+        if self.scene is not None:
+            self.scene._hierarchy_changed()
+
+    @property
+    def static(self):
+        return self._static
+
+    @static.setter
+    def static(self, value):
+        if value == self._static:
+            return
+        self._static = value
+        if self.scene is not None:
+            self.scene._static_changed()
+
     def get_component(self, component_type):
-        for component in self.components:
-            if isinstance(component, component_type):
-                return component
-        return None
+        # the first component that is an instance of the type (subclasses included),
+        # remembered until our components change
+        if component_type not in self._components_by_type:
+            found = None
+            for component in self.components:
+                if isinstance(component, component_type):
+                    found = component
+                    break
+            self._components_by_type[component_type] = found
+        return self._components_by_type[component_type]
+
+    def remove_component(self, component):
+        self.components.remove(component)
+        self._components_by_type = {}
+        if self.scene is not None:
+            self.scene._unregister_component(component)
+        component.release_gui()
@@ -39,11 +39,9 @@ class Gizmo:
         translation_mat = pyrr.matrix44.create_from_translation(position)
         rotation_mat = Transform.matrix_from_quaternion(rotation)
         model_mat = pyrr.matrix44.multiply(rotation_mat, translation_mat)
-        mvp = pyrr.matrix44.multiply(
-            pyrr.matrix44.multiply(model_mat, camera.transform.view_mat),
-            camera.projection)
-
-        self.renderer.material.set_matrix("mvp", mvp)
+        # view and projection come from the frame uniforms
+        # set by the scene for this camera
+        self.renderer.material.set_matrix("model", model_mat)
 
         gl.glClear(gl.GL_DEPTH_BUFFER_BIT)
 
@@ -75,11 +73,9 @@ class CameraGizmo:
         translation_mat = pyrr.matrix44.create_from_translation(position)
         rotation_mat = Transform.matrix_from_quaternion(rotation)
         model_mat = pyrr.matrix44.multiply(rotation_mat, translation_mat)
-        mvp = pyrr.matrix44.multiply(
-            pyrr.matrix44.multiply(model_mat, camera.transform.view_mat),
-            camera.projection)
-
-        self.renderer.material.set_matrix("mvp", mvp)
+        # view and projection come from the frame uniforms
+        # set by the scene for this camera
+        self.renderer.material.set_matrix("model", model_mat)
 
         gl.glClear(gl.GL_DEPTH_BUFFER_BIT)
 
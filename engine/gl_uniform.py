@@ -142,6 +142,8 @@ gl_uniform_type_to_f = {
     gl.GL_INT_VEC3    : gl_uniform,
     gl.GL_INT_VEC4    : gl_uniform,
     gl.GL_SAMPLER_2D    : gl_uniform,
+    gl.GL_SAMPLER_BUFFER    : gl_uniform,
+    gl.GL_UNSIGNED_INT_SAMPLER_BUFFER    : gl_uniform,
     gl.GL_FLOAT_MAT4    : gl_uniform_matrix,
 }
 
@@ -155,6 +157,8 @@ gl_uniform_type_to_function = {
     gl.GL_INT_VEC3      : gl.glUniform3i,
     gl.GL_INT_VEC4      : gl.glUniform4i,
     gl.GL_SAMPLER_2D    : gl.glUniform1i,
+    gl.GL_SAMPLER_BUFFER    : gl.glUniform1i,
+    gl.GL_UNSIGNED_INT_SAMPLER_BUFFER    : gl.glUniform1i,
     gl.GL_FLOAT_MAT4    : gl.glUniformMatrix4fv,
 }
 
@@ -168,6 +172,8 @@ gl_uniform_type_to_f2 = {
     gl.GL_INT_VEC3    : gl_uniform2,
     gl.GL_INT_VEC4    : gl_uniform2,
     gl.GL_SAMPLER_2D    : gl_uniform2,
+    gl.GL_SAMPLER_BUFFER    : gl_uniform2,
+    gl.GL_UNSIGNED_INT_SAMPLER_BUFFER    : gl_uniform2,
     gl.GL_FLOAT_MAT4    : gl_uniform_matrix2,
 }
 
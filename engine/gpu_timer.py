@@ -0,0 +1,58 @@
+# time spent by the gpu on the commands issued between begin and end
+# (GL_TIME_ELAPSED queries).
+# same as with occlusion queries (see occlusion_culling.py), waiting for the result
+# would stall the cpu until the gpu catches up, so we never wait:
+# every frame gets its own query and we keep the latest result that is already available.
+
+import OpenGL.GL as gl
+
+# frames that can be waiting for their results.
+# beyond this, frames are not measured until one of them is back
+MAX_QUERIES_IN_FLIGHT = 4
+
+class GpuTimer:
+
+    def __init__(self):
+        # issued queries waiting for their results (oldest first)
+        self._pending = []
+        self._free = []
+        self._current = None
+
+        # latest result
+        self.milliseconds = 0.0
+
+    def begin(self):
+        self._collect()
+        if len(self._free) > 0:
+            self._current = self._free.pop()
+        elif len(self._pending) < MAX_QUERIES_IN_FLIGHT:
+            self._current = gl.glGenQueries(1)
+        else:
+            self._current = None
+            return
+        gl.glBeginQuery(gl.GL_TIME_ELAPSED, self._current)
+
+    def end(self):
+        if self._current is None:
+            return
+        gl.glEndQuery(gl.GL_TIME_ELAPSED)
+        self._pending.append(self._current)
+        self._current = None
+
+    def release(self):
+        queries = self._pending + self._free
+        if len(queries) > 0:
+            gl.glDeleteQueries(len(queries), queries)
+        self._pending = []
+        self._free = []
+
+    def _collect(self):
+        while len(self._pending) > 0:
+            query = self._pending[0]
+            if not gl.glGetQueryObjectuiv(query, gl.GL_QUERY_RESULT_AVAILABLE):
+                # the later ones are not back either
+                break
+            nanoseconds = gl.glGetQueryObjectui64v(query, gl.GL_QUERY_RESULT)
+            self.milliseconds = nanoseconds / 1000000.0
+            self._pending.pop(0)
+            self._free.append(query)
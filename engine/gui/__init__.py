@@ -4,4 +4,5 @@ from .material_gui import MaterialGUI
 from .game_object_gui import GameObjectGUI
 from .mesh_renderer_gui import MeshRendererGUI
 from .light_gui import LightGUI
+from .hierarchy_gui import HierarchyGUI
 
@@ -30,6 +30,10 @@ class CameraGUI(ComponentGUI):
             if (changed):
                 self.camera.far = far
 
+            changed, value = imgui.checkbox("occlusion culling", self.camera.occlusion_culling)
+            if changed:
+                self.camera.occlusion_culling = value
+
             expanded, visible = imgui.collapsing_header("matrices")
             if expanded:
                 imgui.text("view matrix")
@@ -17,6 +17,10 @@ class GameObjectGUI:
         # the id ideally needs to be unique and invariant
         self.expanded, self.opened = imgui.begin("Inspector##{}".format(self.game_object.id), closable=True)
 
+        changed, value = imgui.checkbox("static", self.game_object.static)
+        if changed:
+            self.game_object.static = value
+
         self.transform_gui.draw()
 
         # for each component, draw its gui
@@ -0,0 +1,191 @@
+import imgui
+import numpy as np
+
+# the scene hierarchy panel.
+# it used to emit one selectable per game object every frame, which is fine for
+# a test scene but with tens of thousands of objects the gui alone takes the whole frame.
+#
+# now the panel keeps the list of rows it shows (game object and depth),
+# and only rebuilds it when the hierarchy, the expanded nodes or the filter change.
+# - collapsed subtrees are not even visited when building the rows
+# - imgui's list clipper tells us which rows are inside the scrolling region,
+#   so only those get drawn
+# - filtering goes through a prebuilt index of the lower case names (in hierarchy order).
+#   typing more characters only searches among the previous matches
+
+class HierarchyGUI:
+
+    def __init__(self, scene):
+        self.scene = scene
+        # ids of the expanded game objects
+        self.expanded = set()
+        self.filter_text = ""
+
+        # (game object, depth) of the rows to draw
+        self._rows = []
+        self._rows_dirty = True
+        # scene.hierarchy_version the rows and the index were built for
+        self._hierarchy_version = -1
+
+        # the whole hierarchy (expanded or not) in depth first order.
+        # used for filtering
+        self._index_objects = None
+        self._index_names = None
+        self._index_depths = None
+        self._index_parents = None
+        self._root_objects = None
+        # filter text and indices into the index of the matches of the last filter
+        self._last_filter = ""
+        self._last_matches = None
+
+    def draw(self):
+        imgui.begin("Scene Hierarchy")
+
+        changed, text = imgui.input_text("filter", self.filter_text, 255)
+        if changed:
+            self.filter_text = text
+            self._rows_dirty = True
+
+        if self.scene.hierarchy_version != self._hierarchy_version:
+            self._hierarchy_version = self.scene.hierarchy_version
+            self._index_objects = None
+            self._root_objects = None
+            self._rows_dirty = True
+        if self._rows_dirty:
+            self._build_rows()
+
+        imgui.begin_child("hierarchy tree", border=True)
+        # only the rows inside the visible part of the child window are drawn.
+        # the clipper moves the cursor over the rest (all rows have the same height)
+        clipper = imgui.ListClipper()
+        clipper.begin(len(self._rows))
+        while clipper.step():
+            for idx in range(clipper.display_start, clipper.display_end):
+                self._draw_row(*self._rows[idx])
+        clipper.end()
+        imgui.end_child()
+
+        imgui.end()
+
+    def _draw_row(self, game_object, depth):
+        filtering = len(self.filter_text) > 0
+        # we push and pop the indentation ourselves (NO_TREE_PUSH_ON_OPEN),
+        # since the children of a node are not necessarily drawn right after it
+        flags = (
+            imgui.TREE_NODE_OPEN_ON_ARROW |
+            imgui.TREE_NODE_NO_TREE_PUSH_ON_OPEN |
+            imgui.TREE_NODE_SPAN_AVAILABLE_WIDTH
+        )
+        if len(game_object.transform.children) == 0:
+            flags = flags | imgui.TREE_NODE_LEAF
+        if self.scene.selected == game_object:
+            flags = flags | imgui.TREE_NODE_SELECTED
+
+        indent = depth * imgui.get_tree_node_to_label_spacing()
+        if indent > 0:
+            imgui.indent(indent)
+
+        # while filtering, everything matching is shown (expanded or not)
+        expanded = filtering or game_object.id in self.expanded
+        imgui.set_next_item_open(expanded)
+        # the id after ## keeps the node the same when the game object gets renamed
+        opened = imgui.tree_node("{}##{}".format(game_object.name, game_object.id), flags)
+
+        # clicks on the arrow only toggle the node
+        if imgui.is_item_clicked() and opened == expanded:
+            self.scene.selected = game_object
+        if not filtering and opened != expanded:
+            if opened:
+                self.expanded.add(game_object.id)
+            else:
+                self.expanded.discard(game_object.id)
+            self._rows_dirty = True
+
+        # detect double click in the node
+        if imgui.is_item_hovered() and imgui.is_mouse_double_clicked():
+            self.scene.selected = game_object
+            self.scene.open_inspector(game_object)
+
+        if indent > 0:
+            imgui.unindent(indent)
+
+    def _build_rows(self):
+        self._rows_dirty = False
+        if len(self.filter_text) > 0:
+            self._build_filtered_rows()
+            return
+        # depth first, only going into expanded nodes
+        self._rows = []
+        pending = [(game_object, 0) for game_object in reversed(self._roots())]
+        while len(pending) > 0:
+            game_object, depth = pending.pop()
+            self._rows.append((game_object, depth))
+            if game_object.id in self.expanded:
+                for child in reversed(game_object.transform.children):
+                    if child.game_object is not None and child.game_object.scene is self.scene:
+                        pending.append((child.game_object, depth + 1))
+
+    def _build_filtered_rows(self):
+        if self._index_objects is None:
+            self._build_index()
+            self._last_matches = None
+
+        text = self.filter_text.lower()
+        # more characters typed: the matches can only be among the previous ones
+        if self._last_matches is not None and text.startswith(self._last_filter):
+            candidates = self._last_matches
+        else:
+            candidates = np.arange(len(self._index_objects))
+        found = np.char.find(self._index_names[candidates], text) >= 0
+        matches = candidates[found]
+        self._last_filter = text
+        self._last_matches = matches
+
+        # the ancestors of the matches are shown too, so they stay in their place in the tree
+        shown = np.zeros(len(self._index_objects), dtype=bool)
+        shown[matches] = True
+        level = matches
+        while len(level) > 0:
+            parents = self._index_parents[level]
+            parents = parents[parents >= 0]
+            level = parents[~shown[parents]]
+            shown[level] = True
+
+        self._rows = [
+            (self._index_objects[idx], self._index_depths[idx])
+            for idx in np.flatnonzero(shown).tolist()
+        ]
+
+    # whole hierarchy in depth first order, with the names in lower case
+    def _build_index(self):
+        objects = []
+        depths = []
+        parents = []
+        pending = [(game_object, 0, -1) for game_object in reversed(self._roots())]
+        while len(pending) > 0:
+            game_object, depth, parent = pending.pop()
+            idx = len(objects)
+            objects.append(game_object)
+            depths.append(depth)
+            parents.append(parent)
+            for child in reversed(game_object.transform.children):
+                if child.game_object is not None and child.game_object.scene is self.scene:
+                    pending.append((child.game_object, depth + 1, idx))
+        self._index_objects = objects
+        self._index_depths = depths
+        self._index_parents = np.array(parents, dtype=np.int64)
+        self._index_names = np.array([game_object.name.lower() for game_object in objects], dtype=str)
+
+    # game objects of the scene without a parent in the scene (in the order they were added)
+    def _roots(self):
+        if self._root_objects is None:
+            self._root_objects = self._find_roots()
+        return self._root_objects
+
+    def _find_roots(self):
+        return [
+            game_object for game_object in self.scene.game_objects
+            if game_object.transform.parent is None
+            or game_object.transform.parent.game_object is None
+            or game_object.transform.parent.game_object.scene is not self.scene
+        ]
@@ -29,4 +29,12 @@ class LightGUI(ComponentGUI):
                 # print("light type: changed to value {}".format(light_type))
                 self.light.light_type = (opt_index + 1)
 
+            if self.light.light_type == light_module.LightType.POINT:
+                changed, value = imgui.drag_float("range", self.light.range, change_speed=0.1, min_value=0.0, max_value=1000.0)
+                if changed:
+                    self.light.range = value
+                changed, value = imgui.drag_float("intensity", self.light.intensity, change_speed=0.01, min_value=0.0, max_value=100.0)
+                if changed:
+                    self.light.intensity = value
+
 
@@ -32,6 +32,12 @@ class MeshRendererGUI(ComponentGUI):
                 selected_uuid,_ = available_materials[opt_index]
                 self.mesh_renderer.material = engine.material_manager.get_from_id(selected_uuid)
 
+            if len(self.mesh_renderer.mesh.lods) > 0:
+                imgui.text("levels of detail: {}".format(len(self.mesh_renderer.mesh.lods)))
+                changed, value = imgui.drag_float("lod bias", self.mesh_renderer.lod_bias, change_speed=0.01, min_value=0.01, max_value=10.0)
+                if changed:
+                    self.mesh_renderer.lod_bias = value
+
             self.mesh_renderer.material.gui.draw()
 
 
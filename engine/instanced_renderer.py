@@ -0,0 +1,72 @@
+# draws many copies of the same mesh with the same material in a single draw call.
+# rather than setting the mvp/model uniforms and calling glDrawElements per object,
+# the model matrices of all copies are uploaded into an instance vbo
+# and the (instanced) vertex shader reads its matrix as a vertex attribute
+# that advances once per instance (glVertexAttribDivisor).
+# the scene creates one of these per mesh/material pair that shows up
+# several times in a row in the render queue.
+
+import ctypes
+
+import numpy as np
+import OpenGL.GL as gl
+
+from engine.components.mesh_renderer import configure_vao
+
+# layout(location=4) in mat4 instance_model;
+# a mat4 attribute takes 4 consecutive locations (one per column)
+INSTANCE_MODEL_LOC = 4
+
+class InstancedRenderer:
+
+    def __init__(self, mesh, material):
+        self.mesh = mesh
+        # the instanced variant of the material (see material_manager.get_instanced_variant)
+        self.material = material
+
+        self.instance_vbo = gl.glGenBuffers(1)
+        # nr of matrices that fit in the instance vbo
+        self.capacity = 0
+
+        # same vertex attributes as a regular renderer plus the per instance ones
+        self.vao = gl.glGenVertexArrays(1)
+        configure_vao(self.vao, mesh, material.shader)
+
+        gl.glBindVertexArray(self.vao)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.instance_vbo)
+        matrix_size = 16 * 4
+        for column in range(4):
+            loc = INSTANCE_MODEL_LOC + column
+            gl.glEnableVertexAttribArray(loc)
+            gl.glVertexAttribPointer(
+                loc,
+                4,              # one column of the matrix
+                gl.GL_FLOAT,
+                gl.GL_FALSE,
+                matrix_size,    # stride: one matrix per instance
+                ctypes.c_void_p(column * 4 * 4)
+            )
+            gl.glVertexAttribDivisor(loc, 1)
+        gl.glBindVertexArray(0)
+
+    # model matrices as (N,4,4) in pyrr's layout.
+    # the same memory read as column major gives the matrices the shader expects
+    # (the same way they are passed to glUniformMatrix4fv without transposing)
+    def upload(self, model_matrices):
+        data = np.ascontiguousarray(model_matrices, dtype=np.float32)
+        count = len(data)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.instance_vbo)
+        if count > self.capacity:
+            # grow with some room so we don't reallocate every time an object gets in view
+            self.capacity = max(count, self.capacity * 2)
+            gl.glBufferData(gl.GL_ARRAY_BUFFER, self.capacity * 16 * 4, None, gl.GL_DYNAMIC_DRAW)
+        gl.glBufferSubData(gl.GL_ARRAY_BUFFER, 0, data.nbytes, data)
+
+    # expects the vao and the material to be already bound
+    def draw(self, count):
+        self.mesh.draw_instanced(count)
+
+    # the mesh is not drawn by the scene anymore, free our vao and instance vbo
+    def release(self):
+        gl.glDeleteVertexArrays(1, [self.vao])
+        gl.glDeleteBuffers(1, [self.instance_vbo])
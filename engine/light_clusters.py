@@ -0,0 +1,235 @@
+# clustered forward lighting.
+# only the first light of the scene reaches the regular shaders (see frame_uniforms.py).
+# to support many point lights, the view frustum of the camera is split into a 3d grid
+# of clusters (froxels): tiles in screen space and slices in depth.
+# every frame the point lights are gathered and uploaded once (prepare) and
+# then, per camera (update), they are binned into the clusters they touch
+# and the clustered shaders only go through the lights of the cluster of each fragment
+# (see engine/shaders/include/light_clusters.glsl).
+
+# the binning is done on the cpu with numpy, for all lights at once:
+# - light spheres are moved to view space and boxed in cluster coordinates
+# - every (light, cluster) pair of those boxes is tested against the cluster bounds
+# - the surviving pairs are sorted by cluster
+# the result is uploaded as texture buffers (glsl 330 doesn't have storage buffers):
+# - point lights: 2 texels per light, (position, range) and (color, intensity)
+# - cluster ranges: offset and count into the light indices, per cluster
+# - light indices: the lights of all the clusters one after the other
+
+import numpy as np
+import OpenGL.GL as gl
+
+# texture units used by the cluster buffers.
+# materials use the first units for their own textures.
+# programs get their samplers pointed to these units when compiled (see Shader._compile)
+CLUSTER_TEXTURE_UNITS = {
+    "_point_lights" : 13,
+    "_cluster_ranges" : 14,
+    "_cluster_light_indices" : 15,
+}
+
+# default nr of clusters along x, y and z (depth)
+CLUSTER_GRID = (16, 9, 24)
+
+# lights closer than this to the camera plane cover the whole screen
+_MIN_DEPTH = 1e-4
+
+# depth slices are exponential so clusters keep a similar shape along the frustum.
+# depth -> slice index (not clamped)
+def depth_slices(depths, near, far, nr_slices):
+    return np.floor(np.log(depths / near) / np.log(far / near) * nr_slices)
+
+# bounds of every cluster in view space (nr_clusters, 3) min and max.
+# cluster index = (z * grid_y + y) * grid_x + x
+def cluster_bounds(tan_half_vfov, aspect_ratio, near, far, grid):
+    grid_x, grid_y, grid_z = grid
+    # slice boundaries in depth and tile boundaries in ndc
+    depths = near * (far / near) ** (np.arange(grid_z + 1) / grid_z)
+    tiles_x = np.linspace(-1.0, 1.0, grid_x + 1) * tan_half_vfov * aspect_ratio
+    tiles_y = np.linspace(-1.0, 1.0, grid_y + 1) * tan_half_vfov
+
+    z, y, x = np.meshgrid(np.arange(grid_z), np.arange(grid_y), np.arange(grid_x), indexing="ij")
+    x, y, z = x.ravel(), y.ravel(), z.ravel()
+    near_depth = depths[z]
+    far_depth = depths[z + 1]
+
+    # a cluster is a piece of frustum, its box takes both of its depth ends
+    bounds_min = np.empty((len(x), 3))
+    bounds_max = np.empty((len(x), 3))
+    bounds_min[:, 0] = np.minimum(tiles_x[x] * near_depth, tiles_x[x] * far_depth)
+    bounds_max[:, 0] = np.maximum(tiles_x[x + 1] * near_depth, tiles_x[x + 1] * far_depth)
+    bounds_min[:, 1] = np.minimum(tiles_y[y] * near_depth, tiles_y[y] * far_depth)
+    bounds_max[:, 1] = np.maximum(tiles_y[y + 1] * near_depth, tiles_y[y + 1] * far_depth)
+    # cameras look along -z in view space
+    bounds_min[:, 2] = -far_depth
+    bounds_max[:, 2] = -near_depth
+    return bounds_min, bounds_max
+
+# point lights (view space centers (N,3) and ranges (N,)) -> (cluster_ranges, light_indices)
+# cluster_ranges is (nr_clusters, 2): offset and count of the lights of each cluster
+# in light_indices
+def bin_lights(centers, radii, tan_half_vfov, aspect_ratio, near, far, grid, bounds=None):
+    grid_x, grid_y, grid_z = grid
+    nr_clusters = grid_x * grid_y * grid_z
+    if bounds is None:
+        bounds = cluster_bounds(tan_half_vfov, aspect_ratio, near, far, grid)
+
+    depths = -centers[:, 2]
+    closest = np.maximum(depths - radii, near)
+    furthest = np.minimum(depths + radii, far)
+    visible = closest <= furthest
+
+    # slices
+    z0 = np.clip(depth_slices(closest, near, far, grid_z), 0, grid_z - 1)
+    # (lights behind the camera are dropped below, keep their log defined)
+    z1 = np.clip(depth_slices(np.maximum(furthest, near), near, far, grid_z), 0, grid_z - 1)
+
+    # tiles. x/depth over the box around the sphere has its extremes at the corners.
+    # spheres reaching the camera plane can be anywhere on screen
+    front = depths - radii
+    behind = depths + radii
+    projected = front > _MIN_DEPTH
+    safe_front = np.where(projected, front, 1.0)
+    scale_x = tan_half_vfov * aspect_ratio
+    scale_y = tan_half_vfov
+
+    def tile_range(coords, scale, nr_tiles):
+        corners = np.stack([
+            (coords - radii) / safe_front,
+            (coords - radii) / behind,
+            (coords + radii) / safe_front,
+            (coords + radii) / behind,
+        ]) / scale
+        ndc_min = np.where(projected, corners.min(axis=0), -1.0)
+        ndc_max = np.where(projected, corners.max(axis=0), 1.0)
+        inside = (ndc_max >= -1.0) & (ndc_min <= 1.0)
+        first = np.clip(np.floor((ndc_min + 1.0) / 2.0 * nr_tiles), 0, nr_tiles - 1)
+        last = np.clip(np.floor((ndc_max + 1.0) / 2.0 * nr_tiles), 0, nr_tiles - 1)
+        return first, last, inside
+
+    x0, x1, inside_x = tile_range(centers[:, 0], scale_x, grid_x)
+    y0, y1, inside_y = tile_range(centers[:, 1], scale_y, grid_y)
+    visible = visible & inside_x & inside_y
+
+    # every light gets the clusters of its box
+    lights = np.flatnonzero(visible)
+    x0, y0, z0 = x0[lights].astype(np.int64), y0[lights].astype(np.int64), z0[lights].astype(np.int64)
+    size_x = x1[lights].astype(np.int64) - x0 + 1
+    size_y = y1[lights].astype(np.int64) - y0 + 1
+    size_z = z1[lights].astype(np.int64) - z0 + 1
+    counts = size_x * size_y * size_z
+
+    pair_light = np.repeat(lights, counts)
+    starts = np.cumsum(counts) - counts
+    local = np.arange(len(pair_light)) - np.repeat(starts, counts)
+    size_x = np.repeat(size_x, counts)
+    size_y = np.repeat(size_y, counts)
+    x = np.repeat(x0, counts) + local % size_x
+    y = np.repeat(y0, counts) + (local // size_x) % size_y
+    z = np.repeat(z0, counts) + local // (size_x * size_y)
+    pair_cluster = (z * grid_y + y) * grid_x + x
+
+    # boxes in cluster coordinates are loose for spheres,
+    # keep only the clusters the sphere actually touches
+    bounds_min, bounds_max = bounds
+    pair_centers = centers[pair_light]
+    closest_points = np.clip(pair_centers, bounds_min[pair_cluster], bounds_max[pair_cluster])
+    distances = np.sum((pair_centers - closest_points) ** 2, axis=1)
+    touching = distances <= radii[pair_light] ** 2
+    pair_light = pair_light[touching]
+    pair_cluster = pair_cluster[touching]
+
+    order = np.argsort(pair_cluster, kind="stable")
+    light_indices = pair_light[order].astype(np.uint32)
+
+    cluster_counts = np.bincount(pair_cluster, minlength=nr_clusters)
+    cluster_ranges = np.empty((nr_clusters, 2), dtype=np.uint32)
+    cluster_ranges[:, 0] = np.cumsum(cluster_counts) - cluster_counts
+    cluster_ranges[:, 1] = cluster_counts
+    return cluster_ranges, light_indices
+
+class LightClusters:
+
+    def __init__(self, grid = CLUSTER_GRID):
+        self.grid = grid
+        # the cluster bounds only change with the camera projection
+        self._bounds = None
+        self._bounds_key = None
+
+        # texture buffers: (buffer, texture, internal format)
+        self._buffers = {}
+        for name, internal_format in (
+                ("_point_lights", gl.GL_RGBA32F),
+                ("_cluster_ranges", gl.GL_RG32UI),
+                ("_cluster_light_indices", gl.GL_R32UI)):
+            self._buffers[name] = (gl.glGenBuffers(1), gl.glGenTextures(1), internal_format)
+
+        # world space (position, range) and (color, intensity) of the point lights
+        # gathered by prepare for the views of the frame
+        self._light_data = np.zeros((1, 8), dtype=np.float32)
+
+        # stats for the editor
+        self.nr_lights = 0
+        self.nr_references = 0
+        self.max_cluster_lights = 0
+
+    # gathers and uploads the point lights. they are the same for all the cameras of the frame
+    def prepare(self, point_lights):
+        nr_lights = len(point_lights)
+
+        light_data = np.zeros((max(nr_lights, 1), 8), dtype=np.float32)
+        for i, light in enumerate(point_lights):
+            light_data[i, 0:3] = light.game_object.transform.position
+            light_data[i, 3] = light.range
+            light_data[i, 4:7] = light.color
+            light_data[i, 7] = light.intensity
+
+        self._light_data = light_data
+        self.nr_lights = nr_lights
+        self._upload("_point_lights", light_data)
+
+    # bins the prepared point lights for the given camera and uploads the result.
+    # the buffers are left bound to their texture units for the draws that follow
+    def update(self, camera):
+        nr_lights = self.nr_lights
+        light_data = self._light_data
+
+        tan_half_vfov = np.tan(np.radians(camera.vfov) / 2)
+        bounds_key = (tan_half_vfov, camera.aspect_ratio, camera.near, camera.far, self.grid)
+        if bounds_key != self._bounds_key:
+            self._bounds = cluster_bounds(*bounds_key)
+            self._bounds_key = bounds_key
+
+        # world -> view space (row vectors, pyrr's convention)
+        view_mat = np.asarray(camera.transform.view_mat, dtype=np.float64)
+        centers = light_data[:nr_lights, 0:3] @ view_mat[:3, :3] + view_mat[3, :3]
+        radii = light_data[:nr_lights, 3].astype(np.float64)
+        cluster_ranges, light_indices = bin_lights(
+            centers, radii, *bounds_key, bounds=self._bounds
+        )
+
+        self.nr_references = len(light_indices)
+        self.max_cluster_lights = int(cluster_ranges[:, 1].max())
+
+        if len(light_indices) == 0:
+            # empty buffers can't back a texture
+            light_indices = np.zeros(1, dtype=np.uint32)
+
+        self._bind("_point_lights")
+        self._upload("_cluster_ranges", cluster_ranges)
+        self._upload("_cluster_light_indices", light_indices)
+
+    def _upload(self, name, data):
+        buffer, texture, internal_format = self._buffers[name]
+        data = np.ascontiguousarray(data)
+        gl.glBindBuffer(gl.GL_TEXTURE_BUFFER, buffer)
+        gl.glBufferData(gl.GL_TEXTURE_BUFFER, data.nbytes, data, gl.GL_STREAM_DRAW)
+        gl.glBindBuffer(gl.GL_TEXTURE_BUFFER, 0)
+        self._bind(name)
+
+    def _bind(self, name):
+        buffer, texture, internal_format = self._buffers[name]
+        gl.glActiveTexture(gl.GL_TEXTURE0 + CLUSTER_TEXTURE_UNITS[name])
+        gl.glBindTexture(gl.GL_TEXTURE_BUFFER, texture)
+        gl.glTexBuffer(gl.GL_TEXTURE_BUFFER, internal_format, buffer)
+        gl.glActiveTexture(gl.GL_TEXTURE0)
@@ -41,6 +41,12 @@ class Material:
 
         self.textures = []
 
+        # bumped whenever a uniform value changes (see copy_values_from)
+        self.values_version = 0
+
+        # transparent materials are drawn after the opaque ones, back to front
+        self.transparent = False
+
         self.uuid = None
 
         self.gui = None
@@ -115,14 +121,21 @@ class Material:
             self.vertex_attribs[name] = attrib
             # print("attrib {} size={} type={}".format(name, size, type_))
 
-    def use(self):
-        self.shader.use()
+    # the render queue draws materials sharing the same textures one after the other.
+    # in that case there is no need to bind them again (bind_textures=False).
+    # the same goes for materials sharing the shader program (use_program=False)
+    def use(self, bind_textures=True, use_program=True):
+        if use_program:
+            self.shader.use()
         # apply uniform changes that were requested
         # while the material was not being used
         for uniform_name in self.uniforms:
             if self.uniforms[uniform_name]["dirty"] and "value" in self.uniforms[uniform_name]:
                 self.set_uniform(uniform_name, self.uniforms[uniform_name]["value"])
 
+        if not bind_textures:
+            return
+
         # if len(self.textures) > 0:
         #     print("using material {}".format(self.uuid))
         for texture in self.textures:
@@ -130,6 +143,25 @@ class Material:
             # print("binding texture {} {} {}".format(texture["texture"], texture["unit"], texture["name"]))
             texture["texture"].bind(texture["unit"])
 
+    # used to keep a material using a different shader (like its instanced version)
+    # in sync with this one. values are applied the next time it gets used.
+    # values are replaced (never modified in place) when set, so only the uniforms
+    # holding a different value than ours get dirtied
+    def copy_values_from(self, other):
+        for uniform_name, uniform in other.uniforms.items():
+            if "value" not in uniform or uniform_name not in self.uniforms:
+                continue
+            own_uniform = self.uniforms[uniform_name]
+            if own_uniform.get("value") is not uniform["value"]:
+                own_uniform["value"] = uniform["value"]
+                own_uniform["dirty"] = True
+
+    # the textures bound by 'use' and their texture units.
+    # two materials with the same texture set leave the same textures bound
+    @property
+    def texture_set(self):
+        return tuple((texture["unit"], texture["texture"]) for texture in self.textures)
+
     # we need a method for callbacks to use with gui widgets
     # that "set uniform values" but those are not apply (call to glUniform)
     # until the next time we use the material
@@ -137,6 +169,7 @@ class Material:
         if (uniform_name in self.uniforms):
             self.uniforms[uniform_name]["value"] = list_of_values
             self.uniforms[uniform_name]["dirty"] = True
+            self.values_version = self.values_version + 1
 
     # this is intended to be called once during setup
     # and then we will bind the appropiate textures when we use the material
@@ -182,7 +215,9 @@ class Material:
             loc = self.uniforms[uniform_name]["loc"]
             # type is not needed anymore
             uniform_type = self.uniforms[uniform_name]["type"]
-            self.uniforms[uniform_name]["value"] = list_of_values
+            if self.uniforms[uniform_name].get("value") is not list_of_values:
+                self.uniforms[uniform_name]["value"] = list_of_values
+                self.values_version = self.values_version + 1
             self.uniforms[uniform_name]["fun"](loc, *list_of_values)
             self.uniforms[uniform_name]["dirty"] = False
         else:
@@ -31,6 +31,8 @@ _nr_materials = 0
 _id_to_name = {}
 _name_to_id = {}
 _materials = {} # key is the numeric id
+# material -> material using the instanced version of its shader (or None)
+_instanced_variants = {}
 
 ################################################################################
 # public methods
@@ -75,6 +77,14 @@ def get_from_id(uuid:int):
     else:
         raise ArgumentError("material id {} not found".format(uuid))
 
+# used by scene files to refer to materials
+def get_name(material):
+    global _id_to_name
+    if material.uuid in _id_to_name and _materials[material.uuid] is material:
+        return _id_to_name[material.uuid]
+    else:
+        raise Exception("material {} is not in the database".format(material.uuid))
+
 # we need a method to list all available materials in a consistent order
 # i.e, by calling it twice, the order is always the same.
 # i'm not sure dictionaries in python preserve the order
@@ -99,6 +109,29 @@ def get_material_id_by_ref(ref_material):
     return None
 
 
+# the material used to draw many copies of a mesh with 'material' at once.
+# it's not listed with the rest of materials, it just follows the original one:
+# it shares its textures and gets its uniform values copied before being used
+# (only when they changed since the last copy).
+# returns None when the shader of the material doesn't have an instanced version
+def get_instanced_variant(material):
+    if material not in _instanced_variants:
+        variant = None
+        shader_name = shader_manager.get_instanced_variant_name(material.shader)
+        if shader_name is not None:
+            variant = Material(shader_manager.get_instance_from_name(shader_name))
+            variant.textures = material.textures
+            variant.transparent = material.transparent
+            # values_version of the material the last time its values were copied
+            variant.source_version = -1
+        _instanced_variants[material] = variant
+
+    variant = _instanced_variants[material]
+    if variant is not None and variant.source_version != material.values_version:
+        variant.copy_values_from(material)
+        variant.source_version = material.values_version
+    return variant
+
 ################################################################################
 # internal methods
 ################################################################################
@@ -108,6 +141,7 @@ def _create_materials():
     # internal materials
     _create_material("transform_gizmo", "mvp_vertex_color") # render using mvp matrix and vertex color
     _create_material("camera_gizmo", "mvp_flat_color_uniform") # render using mvp matrix and vertex color
+    _create_material("occlusion_box", "mvp_flat_color_uniform") # bounding boxes for occlusion queries (no color is written)
 
     # list of materials I want to have availabe
     # - textured + tint color (uniform) + light diffuse
@@ -125,6 +159,9 @@ def _create_materials():
 
     phong_color_material = _create_material("phong_color", "phong_uniform_color")
     phong_texture_material = _create_material("phong_texture", "phong_texture_uniform_color")
+    # same as above but lit by all the point lights of the scene
+    phong_color_clustered_material = _create_material("phong_color_clustered", "phong_uniform_color_clustered")
+    phong_texture_clustered_material = _create_material("phong_texture_clustered", "phong_texture_uniform_color_clustered")
 
     _create_material("texture_vertex_color", "mvp_texture_vertex_color")
     grid_material = _create_material("flat_color_uniform_far_clipped", "mvp_flat_color_uniform_far_clipped")
@@ -186,6 +223,15 @@ def _create_materials():
     phong_texture_material.set_uniform("slider_1_32_shine_damper", [32.0])
     phong_texture_material.set_texture("texture0", low_poly_texture, 0)
 
+    phong_color_clustered_material.use()
+    phong_color_clustered_material.set_uniform("slider_0_1_reflectivity", [1.0])
+    phong_color_clustered_material.set_uniform("slider_1_32_shine_damper", [32.0])
+
+    phong_texture_clustered_material.use()
+    phong_texture_clustered_material.set_uniform("slider_0_1_reflectivity", [1.0])
+    phong_texture_clustered_material.set_uniform("slider_1_32_shine_damper", [32.0])
+    phong_texture_clustered_material.set_texture("texture0", low_poly_texture, 0)
+
 
     grid_material.use()
     grid_material.set_uniform("color", [0.678, 0.678, 0.678])
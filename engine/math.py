@@ -0,0 +1,386 @@
+import math
+import numpy as np
+
+# math utilities shared by transforms.
+#
+# quaternions are stored as (w, x, y, z), same as in Transform.
+# matrices follow pyrr's convention: vectors are rows and the translation
+# is stored in the last row (i.e. what we called 'col major' in transform.py).
+#
+# there are two flavours of every function:
+# - batched versions working on numpy arrays of shape (N,4) quaternions,
+#   (N,3) vectors/euler angles and (N,) angles. these are the ones to use
+#   when updating many transforms at once (see transform_store.py).
+# - single versions (suffix _single) for one quaternion at a time.
+#   they use plain float math (numpy is slow for tiny arrays) and can
+#   write the result into an existing 'out' buffer so nothing gets allocated.
+
+################################################################################
+# batched versions
+################################################################################
+
+def quaternion_multiply(q, r, out=None):
+    """ hamilton product q * r (apply r first, then q) """
+    q = np.asarray(q)
+    r = np.asarray(r)
+    q0, q1, q2, q3 = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    r0, r1, r2, r3 = r[..., 0], r[..., 1], r[..., 2], r[..., 3]
+    if out is None:
+        out = np.empty(np.broadcast(q, r).shape, dtype=np.result_type(q, r, np.float32))
+    # compute everything before writing in case out is one of the inputs
+    w = r0 * q0 - r1 * q1 - r2 * q2 - r3 * q3
+    x = r0 * q1 + r1 * q0 - r2 * q3 + r3 * q2
+    y = r0 * q2 + r1 * q3 + r2 * q0 - r3 * q1
+    z = r0 * q3 - r1 * q2 + r2 * q1 + r3 * q0
+    out[..., 0] = w
+    out[..., 1] = x
+    out[..., 2] = y
+    out[..., 3] = z
+    return out
+
+def quaternion_conjugate(q, out=None):
+    q = np.asarray(q)
+    if out is None:
+        out = np.empty_like(q)
+    out[..., 0] = q[..., 0]
+    out[..., 1:] = -q[..., 1:]
+    return out
+
+def versor_from_angle_axis(angles, axes, out=None):
+    """ angles in radians (N,); axes must be already normalized (N,3) """
+    angles = np.asarray(angles)
+    axes = np.asarray(axes)
+    half_angles = angles / 2.0
+    if out is None:
+        out = np.empty(axes.shape[:-1] + (4,), dtype=np.result_type(axes, half_angles))
+    out[..., 0] = np.cos(half_angles)
+    out[..., 1:] = np.sin(half_angles)[..., np.newaxis] * axes
+    return out
+
+def quaternion_from_euler(euler, out=None):
+    """ euler angles in degrees (N,3). same convention as Transform: Rx * Ry * Rz """
+    euler = np.asarray(euler)
+    half_angles = np.radians(euler) / 2.0
+    cos = np.cos(half_angles)
+    sin = np.sin(half_angles)
+    cx, cy, cz = cos[..., 0], cos[..., 1], cos[..., 2]
+    sx, sy, sz = sin[..., 0], sin[..., 1], sin[..., 2]
+    if out is None:
+        out = np.empty(euler.shape[:-1] + (4,), dtype=cos.dtype)
+    # closed form of quaternion_x * (quaternion_y * quaternion_z)
+    out[..., 0] = cx * cy * cz - sx * sy * sz
+    out[..., 1] = sx * cy * cz + cx * sy * sz
+    out[..., 2] = cx * sy * cz - sx * cy * sz
+    out[..., 3] = cx * cy * sz + sx * sy * cz
+    return out
+
+def rotation_from_quaternion(q):
+    """ 3x3 rotation matrices (N,3,3) in math notation (column vectors) """
+    q = np.asarray(q)
+    w, x, y, z = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    rotation = np.empty(q.shape[:-1] + (3, 3), dtype=np.result_type(q, np.float32))
+    rotation[..., 0, 0] = 1 - 2*y*y - 2*z*z
+    rotation[..., 0, 1] = 2*x*y - 2*w*z
+    rotation[..., 0, 2] = 2*x*z + 2*w*y
+    rotation[..., 1, 0] = 2*x*y + 2*w*z
+    rotation[..., 1, 1] = 1 - 2*x*x - 2*z*z
+    rotation[..., 1, 2] = 2*y*z - 2*w*x
+    rotation[..., 2, 0] = 2*x*z - 2*w*y
+    rotation[..., 2, 1] = 2*y*z + 2*w*x
+    rotation[..., 2, 2] = 1 - 2*x*x - 2*y*y
+    return rotation
+
+def matrix_from_quaternion(q, out=None):
+    """ 4x4 rotation matrices (N,4,4) ready to be used as pyrr matrices """
+    q = np.asarray(q)
+    rotation = rotation_from_quaternion(q)
+    if out is None:
+        out = np.zeros(q.shape[:-1] + (4, 4), dtype=rotation.dtype)
+    else:
+        out[...] = 0
+    out[..., :3, :3] = np.swapaxes(rotation, -1, -2)
+    out[..., 3, 3] = 1
+    return out
+
+def nlerp(q, r, t, out=None):
+    """ normalized linear interpolation. cheaper than slerp but the speed is not constant """
+    q = np.asarray(q)
+    r = np.asarray(r)
+    t = np.asarray(t)[..., np.newaxis]
+    # q and -q are the same rotation. take the shortest path
+    dot = np.sum(q * r, axis=-1, keepdims=True)
+    r = np.where(dot < 0, -r, r)
+    result = q + t * (r - q)
+    result /= np.linalg.norm(result, axis=-1, keepdims=True)
+    if out is None:
+        return result
+    out[...] = result
+    return out
+
+def slerp(q, r, t, out=None):
+    """ spherical linear interpolation between unit quaternions """
+    q = np.asarray(q)
+    r = np.asarray(r)
+    t = np.asarray(t)[..., np.newaxis]
+    dot = np.sum(q * r, axis=-1, keepdims=True)
+    r = np.where(dot < 0, -r, r)
+    dot = np.clip(np.abs(dot), 0.0, 1.0)
+
+    theta = np.arccos(dot)
+    sin_theta = np.sin(theta)
+    # when the quaternions are too close, sin(theta) goes to zero.
+    # linear interpolation is good enough there
+    close = sin_theta < 1e-6
+    safe_sin_theta = np.where(close, 1.0, sin_theta)
+    weight_q = np.where(close, 1.0 - t, np.sin((1.0 - t) * theta) / safe_sin_theta)
+    weight_r = np.where(close, t, np.sin(t * theta) / safe_sin_theta)
+    result = weight_q * q + weight_r * r
+    result /= np.linalg.norm(result, axis=-1, keepdims=True)
+    if out is None:
+        return result
+    out[...] = result
+    return out
+
+################################################################################
+# single quaternion versions
+################################################################################
+
+def quaternion_multiply_single(q, r, out=None):
+    q0, q1, q2, q3 = q[0], q[1], q[2], q[3]
+    r0, r1, r2, r3 = r[0], r[1], r[2], r[3]
+    w = r0 * q0 - r1 * q1 - r2 * q2 - r3 * q3
+    x = r0 * q1 + r1 * q0 - r2 * q3 + r3 * q2
+    y = r0 * q2 + r1 * q3 + r2 * q0 - r3 * q1
+    z = r0 * q3 - r1 * q2 + r2 * q1 + r3 * q0
+    if out is None:
+        return [w, x, y, z]
+    out[0] = w
+    out[1] = x
+    out[2] = y
+    out[3] = z
+    return out
+
+def versor_from_angle_axis_single(angle, axis, out=None):
+    half_angle = angle / 2.0
+    sin_half_angle = math.sin(half_angle)
+    w = math.cos(half_angle)
+    x = sin_half_angle * axis[0]
+    y = sin_half_angle * axis[1]
+    z = sin_half_angle * axis[2]
+    if out is None:
+        return [w, x, y, z]
+    out[0] = w
+    out[1] = x
+    out[2] = y
+    out[3] = z
+    return out
+
+def quaternion_from_euler_single(euler, out=None):
+    x_half = math.radians(euler[0]) / 2.0
+    y_half = math.radians(euler[1]) / 2.0
+    z_half = math.radians(euler[2]) / 2.0
+    cx = math.cos(x_half)
+    cy = math.cos(y_half)
+    cz = math.cos(z_half)
+    sx = math.sin(x_half)
+    sy = math.sin(y_half)
+    sz = math.sin(z_half)
+    w = cx * cy * cz - sx * sy * sz
+    x = sx * cy * cz + cx * sy * sz
+    y = cx * sy * cz - sx * cy * sz
+    z = cx * cy * sz + sx * sy * cz
+    if out is None:
+        return [w, x, y, z]
+    out[0] = w
+    out[1] = x
+    out[2] = y
+    out[3] = z
+    return out
+
+def matrix_from_quaternion_single(q, out=None):
+    w, x, y, z = q[0], q[1], q[2], q[3]
+    if out is None:
+        out = np.empty((4, 4))
+    # this is the transposed of the math rotation matrix (pyrr's convention)
+    out[0, 0] = 1 - 2*y*y - 2*z*z
+    out[0, 1] = 2*x*y + 2*w*z
+    out[0, 2] = 2*x*z - 2*w*y
+    out[0, 3] = 0
+    out[1, 0] = 2*x*y - 2*w*z
+    out[1, 1] = 1 - 2*x*x - 2*z*z
+    out[1, 2] = 2*y*z + 2*w*x
+    out[1, 3] = 0
+    out[2, 0] = 2*x*z + 2*w*y
+    out[2, 1] = 2*y*z - 2*w*x
+    out[2, 2] = 1 - 2*x*x - 2*y*y
+    out[2, 3] = 0
+    out[3, 0] = 0
+    out[3, 1] = 0
+    out[3, 2] = 0
+    out[3, 3] = 1
+    return out
+
+def quaternion_from_rotation_single(rotation, out=None):
+    """ quaternion of a 3x3 rotation matrix in math notation (column vectors) """
+    r = rotation
+    trace = r[0][0] + r[1][1] + r[2][2]
+    # pick the biggest component to divide by (shepperd's method), the others follow from it
+    if trace > 0:
+        s = math.sqrt(trace + 1.0) * 2
+        w = s / 4
+        x = (r[2][1] - r[1][2]) / s
+        y = (r[0][2] - r[2][0]) / s
+        z = (r[1][0] - r[0][1]) / s
+    elif r[0][0] > r[1][1] and r[0][0] > r[2][2]:
+        s = math.sqrt(1.0 + r[0][0] - r[1][1] - r[2][2]) * 2
+        w = (r[2][1] - r[1][2]) / s
+        x = s / 4
+        y = (r[0][1] + r[1][0]) / s
+        z = (r[0][2] + r[2][0]) / s
+    elif r[1][1] > r[2][2]:
+        s = math.sqrt(1.0 + r[1][1] - r[0][0] - r[2][2]) * 2
+        w = (r[0][2] - r[2][0]) / s
+        x = (r[0][1] + r[1][0]) / s
+        y = s / 4
+        z = (r[1][2] + r[2][1]) / s
+    else:
+        s = math.sqrt(1.0 + r[2][2] - r[0][0] - r[1][1]) * 2
+        w = (r[1][0] - r[0][1]) / s
+        x = (r[0][2] + r[2][0]) / s
+        y = (r[1][2] + r[2][1]) / s
+        z = s / 4
+    if out is None:
+        return [w, x, y, z]
+    out[0] = w
+    out[1] = x
+    out[2] = y
+    out[3] = z
+    return out
+
+def euler_from_rotation_single(rotation, gimbal_z=0.0):
+    """ euler angles in degrees of a 3x3 rotation matrix in math notation (inverse of quaternion_from_euler).
+    when the y angle is +-90 degrees only x + z (or x - z) is known, z takes gimbal_z then """
+    r = rotation
+    # Rx * Ry * Rz has sin(y) in its first row, third column
+    sin_y = max(min(r[0][2], 1.0), -1.0)
+    y = math.asin(sin_y)
+    if math.cos(y) > 1e-6:
+        x = math.atan2(-r[1][2], r[2][2])
+        z = math.atan2(-r[0][1], r[0][0])
+    else:
+        z = math.radians(gimbal_z)
+        # the second row is (sin(x + z), cos(x + z)) for y = 90 and (sin(z - x), cos(z - x)) for y = -90
+        angle = math.atan2(r[1][0], r[1][1])
+        x = angle - z if sin_y > 0 else z - angle
+    return [math.degrees(x), math.degrees(y), math.degrees(z)]
+
+def nlerp_single(q, r, t, out=None):
+    dot = q[0] * r[0] + q[1] * r[1] + q[2] * r[2] + q[3] * r[3]
+    sign = -1.0 if dot < 0 else 1.0
+    w = q[0] + t * (sign * r[0] - q[0])
+    x = q[1] + t * (sign * r[1] - q[1])
+    y = q[2] + t * (sign * r[2] - q[2])
+    z = q[3] + t * (sign * r[3] - q[3])
+    inverse_length = 1.0 / math.sqrt(w * w + x * x + y * y + z * z)
+    if out is None:
+        out = [0.0, 0.0, 0.0, 0.0]
+    out[0] = w * inverse_length
+    out[1] = x * inverse_length
+    out[2] = y * inverse_length
+    out[3] = z * inverse_length
+    return out
+
+def slerp_single(q, r, t, out=None):
+    dot = q[0] * r[0] + q[1] * r[1] + q[2] * r[2] + q[3] * r[3]
+    sign = -1.0 if dot < 0 else 1.0
+    dot = min(abs(dot), 1.0)
+    theta = math.acos(dot)
+    sin_theta = math.sin(theta)
+    if sin_theta < 1e-6:
+        return nlerp_single(q, r, t, out)
+    weight_q = math.sin((1.0 - t) * theta) / sin_theta
+    weight_r = sign * math.sin(t * theta) / sin_theta
+    if out is None:
+        out = [0.0, 0.0, 0.0, 0.0]
+    # read everything before writing in case out is q or r
+    w = weight_q * q[0] + weight_r * r[0]
+    x = weight_q * q[1] + weight_r * r[1]
+    y = weight_q * q[2] + weight_r * r[2]
+    z = weight_q * q[3] + weight_r * r[3]
+    out[0] = w
+    out[1] = x
+    out[2] = y
+    out[3] = z
+    return out
+
+################################################################################
+# transforms
+################################################################################
+
+def compose_trs(positions, rotations, scales):
+    """
+    local model matrices (scale * rotation * translation) and their inverses
+    built directly from positions (N,3), quaternions (N,4) and scales (N,3)
+    """
+    positions = np.asarray(positions)
+    scales = np.asarray(scales)
+    rotation = rotation_from_quaternion(rotations)
+    n = rotation.shape[0]
+
+    # model = S * R^T * T
+    model = np.zeros((n, 4, 4), dtype=rotation.dtype)
+    model[:, :3, :3] = scales[:, :, np.newaxis] * np.swapaxes(rotation, 1, 2)
+    model[:, 3, :3] = positions
+    model[:, 3, 3] = 1
+
+    # inverse = T^-1 * R * S^-1
+    inverse_scales = 1.0 / scales
+    inverse = np.zeros((n, 4, 4), dtype=rotation.dtype)
+    inverse[:, :3, :3] = rotation * inverse_scales[:, np.newaxis, :]
+    inverse[:, 3, :3] = -np.einsum("ni,nij->nj", positions, rotation) * inverse_scales
+    inverse[:, 3, 3] = 1
+    return model, inverse
+
+def compose_trs_single(position, rotation, scale, model_out, inverse_out):
+    """
+    same as compose_trs for a single transform.
+    writes the local model matrix and its inverse into the given 4x4 buffers
+    so nothing needs to be allocated every time a transform changes
+    """
+    px, py, pz = float(position[0]), float(position[1]), float(position[2])
+    w, x, y, z = float(rotation[0]), float(rotation[1]), float(rotation[2]), float(rotation[3])
+    sx, sy, sz = float(scale[0]), float(scale[1]), float(scale[2])
+
+    # math rotation matrix (column vectors)
+    r00 = 1 - 2*y*y - 2*z*z
+    r01 = 2*x*y - 2*w*z
+    r02 = 2*x*z + 2*w*y
+    r10 = 2*x*y + 2*w*z
+    r11 = 1 - 2*x*x - 2*z*z
+    r12 = 2*y*z - 2*w*x
+    r20 = 2*x*z - 2*w*y
+    r21 = 2*y*z + 2*w*x
+    r22 = 1 - 2*x*x - 2*y*y
+
+    # model = S * R^T * T (row i of R^T scaled by s_i, translation in the last row)
+    model_out[:] = [
+        [sx * r00, sx * r10, sx * r20, 0],
+        [sy * r01, sy * r11, sy * r21, 0],
+        [sz * r02, sz * r12, sz * r22, 0],
+        [px, py, pz, 1],
+    ]
+
+    # inverse = T^-1 * R * S^-1 (column j of R scaled by 1/s_j)
+    ix, iy, iz = 1.0 / sx, 1.0 / sy, 1.0 / sz
+    inverse_out[:] = [
+        [r00 * ix, r01 * iy, r02 * iz, 0],
+        [r10 * ix, r11 * iy, r12 * iz, 0],
+        [r20 * ix, r21 * iy, r22 * iz, 0],
+        [
+            -(px * r00 + py * r10 + pz * r20) * ix,
+            -(px * r01 + py * r11 + pz * r21) * iy,
+            -(px * r02 + py * r12 + pz * r22) * iz,
+            1
+        ],
+    ]
+    return model_out, inverse_out
@@ -0,0 +1,201 @@
+# mesh simplification for levels of detail (lods).
+# it's the quadric error metric edge collapse from garland & heckbert:
+# - every vertex gets a quadric (4x4 matrix) that measures the squared distance
+#   to the planes of the triangles around it
+# - the cost of collapsing an edge is the error of the best position for the merged
+#   vertex under the sum of the quadrics of both ends
+# - the cheapest edge is collapsed over and over until reaching the target nr of triangles
+# open borders (including uv seams, where vertices are split) get extra planes
+# perpendicular to them so they don't shrink.
+# the other vertex attributes (uvs, normals, colors) are interpolated along the collapsed edge.
+
+# this is meant to be run once when importing a model (see BaseMesh.generate_lods),
+# the levels are cached with the mesh
+
+import heapq
+
+import numpy as np
+
+# weight of the planes keeping open borders in place
+BORDER_WEIGHT = 1000.0
+
+# triangles of every level of detail relative to the original mesh
+LOD_RATIOS = (0.5, 0.25, 0.125)
+
+# collapses are rejected when they flip a triangle around the merged vertex
+_MIN_NORMAL_DOT = 0.2
+
+def plane_quadrics(positions, faces):
+    """ area weighted quadrics of the planes of the triangles (nr faces, 4, 4) """
+    v0 = positions[faces[:, 0]]
+    v1 = positions[faces[:, 1]]
+    v2 = positions[faces[:, 2]]
+    normals = np.cross(v1 - v0, v2 - v0)
+    lengths = np.linalg.norm(normals, axis=1)
+    areas = lengths / 2
+    normals = normals / np.maximum(lengths, 1e-20)[:, np.newaxis]
+    planes = np.empty((len(faces), 4))
+    planes[:, :3] = normals
+    planes[:, 3] = -np.sum(normals * v0, axis=1)
+    return areas[:, np.newaxis, np.newaxis] * planes[:, :, np.newaxis] * planes[:, np.newaxis, :]
+
+def border_quadrics(positions, faces):
+    """ (vertex pairs, quadrics) of the planes perpendicular to the open borders """
+    # directed edges of every face and the face they belong to
+    edges = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]])
+    edge_faces = np.tile(np.arange(len(faces)), 3)
+    # borders are edges used by only one face
+    keys = np.sort(edges, axis=1)
+    _, inverse, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+    border = counts[inverse.ravel()] == 1
+    edges = edges[border]
+    edge_faces = edge_faces[border]
+
+    v0 = positions[faces[edge_faces, 0]]
+    v1 = positions[faces[edge_faces, 1]]
+    v2 = positions[faces[edge_faces, 2]]
+    face_normals = np.cross(v1 - v0, v2 - v0)
+    a = positions[edges[:, 0]]
+    b = positions[edges[:, 1]]
+    normals = np.cross(b - a, face_normals)
+    lengths = np.linalg.norm(normals, axis=1)
+    normals = normals / np.maximum(lengths, 1e-20)[:, np.newaxis]
+    planes = np.empty((len(edges), 4))
+    planes[:, :3] = normals
+    planes[:, 3] = -np.sum(normals * a, axis=1)
+    weights = BORDER_WEIGHT * np.sum((b - a) ** 2, axis=1)
+    quadrics = weights[:, np.newaxis, np.newaxis] * planes[:, :, np.newaxis] * planes[:, np.newaxis, :]
+    return edges, quadrics
+
+# best positions for the merged vertices of some edges and their errors.
+# quadrics (k,4,4) are the sums of the quadrics of both ends (k,3) of the edges
+def collapse_targets(quadrics, a, b):
+    # candidates: both ends, the middle and the minimum of the quadric (when it exists)
+    candidates = np.stack([a, b, (a + b) / 2, (a + b) / 2], axis=1)
+    solvable = np.abs(np.linalg.det(quadrics[:, :3, :3])) > 1e-12
+    if np.any(solvable):
+        candidates[solvable, 3] = np.linalg.solve(
+            quadrics[solvable, :3, :3], -quadrics[solvable, :3, 3:]
+        )[:, :, 0]
+
+    points = np.concatenate([candidates, np.ones(candidates.shape[:2] + (1,))], axis=2)
+    errors = np.einsum("kci,kij,kcj->kc", points, quadrics, points)
+    best = np.argmin(errors, axis=1)
+    rows = np.arange(len(quadrics))
+    return np.maximum(errors[rows, best], 0.0), candidates[rows, best]
+
+def simplify(positions, faces, attributes, target_faces):
+    """
+    positions (n,3), faces (m,3) and other per vertex attributes (n,k) ->
+    the same for a mesh with at most target_faces triangles (if it can get there)
+    """
+    positions = np.array(positions, dtype=np.float64)
+    attributes = np.array(attributes, dtype=np.float64).reshape(len(positions), -1)
+    faces = np.array(faces, dtype=np.int64).reshape(-1, 3)
+
+    # vertex quadrics
+    quadrics = np.zeros((len(positions), 4, 4))
+    face_quadrics = plane_quadrics(positions, faces)
+    for corner in range(3):
+        np.add.at(quadrics, faces[:, corner], face_quadrics)
+    border_edges, border_planes = border_quadrics(positions, faces)
+    for end in range(2):
+        np.add.at(quadrics, border_edges[:, end], border_planes)
+
+    # adjacency: faces around every vertex
+    vertex_faces = [set() for _ in range(len(positions))]
+    for face_index, face in enumerate(faces.tolist()):
+        for vertex in face:
+            vertex_faces[vertex].add(face_index)
+    face_alive = np.ones(len(faces), dtype=bool)
+    nr_faces = len(faces)
+
+    # every change of a vertex invalidates the heap entries of its edges
+    versions = [0] * len(positions)
+
+    # edges from a to every vertex in others
+    def push(a, others):
+        others = np.array(others, dtype=np.int64)
+        errors, targets = collapse_targets(
+            quadrics[a] + quadrics[others],
+            np.repeat(positions[a][np.newaxis], len(others), axis=0),
+            positions[others]
+        )
+        for error, b, target in zip(errors.tolist(), others.tolist(), targets.tolist()):
+            heapq.heappush(heap, (error, min(a, b), max(a, b), versions[a], versions[b], target))
+
+    edges = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]])
+    edges = np.unique(np.sort(edges, axis=1), axis=0)
+    errors, targets = collapse_targets(
+        quadrics[edges[:, 0]] + quadrics[edges[:, 1]],
+        positions[edges[:, 0]],
+        positions[edges[:, 1]]
+    )
+    heap = [
+        (error, a, b, 0, 0, target)
+        for error, (a, b), target in zip(errors.tolist(), edges.tolist(), targets.tolist())
+    ]
+    heapq.heapify(heap)
+
+    while nr_faces > target_faces and len(heap) > 0:
+        error, a, b, version_a, version_b, target = heapq.heappop(heap)
+        if versions[a] != version_a or versions[b] != version_b:
+            continue
+        target = np.array(target)
+
+        # faces that lose their area and faces that just move
+        shared = vertex_faces[a] & vertex_faces[b]
+        moved = (vertex_faces[a] | vertex_faces[b]) - shared
+        if len(shared) == 0:
+            continue
+        if _flips(positions, faces, moved, a, b, target):
+            continue
+
+        # b gets merged into a
+        edge = positions[b] - positions[a]
+        length = edge @ edge
+        t = 0.0 if length == 0 else float(np.clip((target - positions[a]) @ edge / length, 0.0, 1.0))
+        attributes[a] = (1 - t) * attributes[a] + t * attributes[b]
+        positions[a] = target
+        quadrics[a] = quadrics[a] + quadrics[b]
+
+        for face_index in shared:
+            face_alive[face_index] = False
+            nr_faces = nr_faces - 1
+            for vertex in faces[face_index]:
+                vertex_faces[vertex].discard(face_index)
+        for face_index in vertex_faces[b]:
+            face = faces[face_index]
+            face[face == b] = a
+            vertex_faces[a].add(face_index)
+        vertex_faces[b] = set()
+        versions[a] = versions[a] + 1
+        versions[b] = versions[b] + 1
+
+        neighbours = set()
+        for face_index in vertex_faces[a]:
+            neighbours.update(faces[face_index].tolist())
+        neighbours.discard(a)
+        if len(neighbours) > 0:
+            push(a, list(neighbours))
+
+    # keep only the vertices still in use
+    faces = faces[face_alive]
+    used, faces = np.unique(faces, return_inverse=True)
+    return positions[used], attributes[used], faces.reshape(-1, 3)
+
+# does moving a and b to target flip any of the (non degenerated) faces around them?
+def _flips(positions, faces, moved, a, b, target):
+    if len(moved) == 0:
+        return False
+    moved_faces = faces[list(moved)]
+    corners = positions[moved_faces]
+    before = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    corners[(moved_faces == a) | (moved_faces == b)] = target
+    after = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    before_lengths = np.linalg.norm(before, axis=1)
+    after_lengths = np.linalg.norm(after, axis=1)
+    dots = np.sum(before * after, axis=1)
+    flipped = (after_lengths == 0) | (dots < _MIN_NORMAL_DOT * before_lengths * after_lengths)
+    # faces that were already degenerated don't count
+    return bool(np.any(flipped & (before_lengths > 0)))
@@ -0,0 +1,144 @@
+# hardware occlusion culling.
+# frustum culling keeps drawing everything in front of the camera,
+# even the objects completely hidden behind others.
+# the gpu can tell us whether anything of a draw passed the depth test
+# (GL_ANY_SAMPLES_PASSED queries), so we ask it about the bounding boxes of the renderers.
+
+# waiting for the result of a query stalls the cpu until the gpu catches up,
+# so we never wait. temporal coherence: what was hidden last frame is most likely
+# still hidden, so we use the latest result that is already available:
+# - renderers visible in the latest result are drawn normally
+# - after them, the boxes of all opaque renderers are drawn (without writing color or depth)
+#   inside a query each. the results are read in a later frame
+# - renderers hidden in the latest result are drawn after the boxes with conditional rendering
+#   on their box query. the gpu skips them if the box didn't pass the depth test,
+#   so nothing pops in when they become visible again.
+#   neither the cpu nor the gpu waits for it (GL_QUERY_NO_WAIT): a result that is not
+#   ready yet just means the renderer gets drawn
+
+# this is enabled per camera (Camera.occlusion_culling) and
+# every camera keeps its own results (see Scene.draw_scene)
+
+import numpy as np
+import OpenGL.GL as gl
+
+# queries of a renderer can be waiting for their results for a few frames.
+# beyond this, the renderer doesn't get a new query until one of them is back
+MAX_QUERIES_IN_FLIGHT = 3
+
+# boxes get a bit bigger so the faces of flat objects are not hidden by the objects themselves
+_BOX_PADDING = 0.01
+
+class _RendererQueries:
+
+    def __init__(self):
+        # issued queries waiting for their results (oldest first)
+        self.pending = []
+        self.free = []
+        # latest query issued (used for conditional rendering)
+        self.latest = None
+        # result of the latest query that came back
+        self.visible = True
+
+class OcclusionQueries:
+    """ occlusion results of the renderers seen by one camera """
+
+    def __init__(self):
+        # renderer -> _RendererQueries
+        self._renderers = {}
+
+        # stats for the editor
+        self.nr_queries = 0
+        self.nr_occluded = 0
+
+    def is_occluded(self, renderer):
+        entry = self._renderers.get(renderer)
+        return entry is not None and not entry.visible
+
+    # reads the results that are already available (never waits for the gpu)
+    def collect(self):
+        self.nr_occluded = 0
+        for entry in self._renderers.values():
+            while len(entry.pending) > 0:
+                query = entry.pending[0]
+                if not gl.glGetQueryObjectuiv(query, gl.GL_QUERY_RESULT_AVAILABLE):
+                    # the later ones are not back either
+                    break
+                entry.visible = bool(gl.glGetQueryObjectuiv(query, gl.GL_QUERY_RESULT))
+                entry.pending.pop(0)
+                entry.free.append(query)
+            if not entry.visible:
+                self.nr_occluded = self.nr_occluded + 1
+
+    # used when the camera is inside the box of the renderer (there is nothing to test)
+    def set_visible(self, renderer):
+        entry = self._get_entry(renderer)
+        entry.visible = True
+
+    # starts the query of the renderer for this frame.
+    # returns False if the renderer has too many queries waiting for results
+    def begin(self, renderer):
+        entry = self._get_entry(renderer)
+        if len(entry.free) > 0:
+            query = entry.free.pop()
+        elif len(entry.pending) < MAX_QUERIES_IN_FLIGHT:
+            query = gl.glGenQueries(1)
+        else:
+            return False
+        gl.glBeginQuery(gl.GL_ANY_SAMPLES_PASSED, query)
+        entry.pending.append(query)
+        entry.latest = query
+        self.nr_queries = self.nr_queries + 1
+        return True
+
+    def end(self):
+        gl.glEndQuery(gl.GL_ANY_SAMPLES_PASSED)
+
+    # the following draws only happen if the latest query of the renderer passed.
+    # wait tells the gpu to wait for the result. by default it doesn't:
+    # if the result is not there yet the renderer gets drawn (it was hidden last frame anyway,
+    # so at worst we draw something hidden instead of stalling the gpu pipeline)
+    def begin_conditional(self, renderer, wait = False):
+        entry = self._renderers.get(renderer)
+        if entry is None or entry.latest is None:
+            return False
+        mode = gl.GL_QUERY_WAIT if wait else gl.GL_QUERY_NO_WAIT
+        gl.glBeginConditionalRender(entry.latest, mode)
+        return True
+
+    def end_conditional(self):
+        gl.glEndConditionalRender()
+
+    # renderers that left the scene
+    def forget(self, renderer):
+        entry = self._renderers.pop(renderer, None)
+        if entry is None:
+            return
+        queries = entry.pending + entry.free
+        if len(queries) > 0:
+            gl.glDeleteQueries(len(queries), queries)
+
+    def release(self):
+        for renderer in list(self._renderers.keys()):
+            self.forget(renderer)
+
+    def _get_entry(self, renderer):
+        if renderer not in self._renderers:
+            self._renderers[renderer] = _RendererQueries()
+        return self._renderers[renderer]
+
+# model matrix (pyrr's layout) of a unit cube centered at the origin
+# stretched over a world space box
+def box_model_matrix(aabb_min, aabb_max):
+    size = aabb_max - aabb_min
+    padding = np.maximum(size * _BOX_PADDING, _BOX_PADDING)
+    model_mat = np.identity(4, dtype=np.float32)
+    model_mat[[0, 1, 2], [0, 1, 2]] = size + 2 * padding
+    model_mat[3, :3] = (aabb_min + aabb_max) / 2
+    return model_mat
+
+# boxes of objects around the camera get clipped by the near plane and can't be tested
+def contains_camera(aabb_min, aabb_max, camera):
+    position = np.asarray(camera.transform.position, dtype=np.float64)
+    margin = camera.near * 2
+    return bool(np.all(position >= aabb_min - margin) and np.all(position <= aabb_max + margin))
@@ -0,0 +1,314 @@
+import numpy as np
+
+# the scene used to find out what to draw by going through all game objects
+# and all their components every frame (twice per camera).
+# the render queue keeps the list of mesh renderers of the scene
+# and it only gets rebuilt when something that affects it changes:
+# - a renderer is added or removed (with its game object)
+# - a renderer gets enabled or disabled
+# - a renderer changes its material
+# drawing a frame is then just going through the prebuilt list.
+
+# draw order.
+# every draw gets a 64 bit sort key and the whole queue is sorted at once with numpy.
+# the most significant bits are the most expensive state to change, so sorting
+# the keys groups draws sharing programs, textures and vaos together.
+# opaque draws:
+#   | pass (2) | program (10) | texture set (10) | material (10) | vao (12) | depth (20) |
+# opaque draws sharing the same state are drawn front to back (early depth test).
+# transparent draws need to be drawn back to front regardless of their state:
+#   | pass (2) | inverted depth (20) | material (10) | vao (12) | unused (20) |
+# ids are not the opengl names but small indices given when rebuilding the queue.
+
+# several cameras can draw the same frame (editor scene view, game view, previews...).
+# everything that doesn't depend on the camera (world matrices, world bounds)
+# is computed once per frame by prepare() and shared by the views.
+# each view only does the culling, sorting and lod selection for its camera.
+
+PASS_OPAQUE = 0
+PASS_TRANSPARENT = 1
+
+_PASS_SHIFT = 62
+_PROGRAM_SHIFT = 52
+_TEXTURE_SET_SHIFT = 42
+_MATERIAL_SHIFT = 32
+_VAO_SHIFT = 20
+_OPAQUE_DEPTH_SHIFT = 0
+_TRANSPARENT_DEPTH_SHIFT = 42
+
+_ID_BITS = 10
+_VAO_BITS = 12
+_DEPTH_BITS = 20
+_MAX_DEPTH = (1 << _DEPTH_BITS) - 1
+
+# camera independent data of the enabled renderers for the current frame.
+# arrays are indexed the same way as draws
+class PreparedDraws:
+
+    def __init__(self, draws, world_matrices, sphere_centers, sphere_radii, aabb_min, aabb_max):
+        self.draws = draws
+        self.world_matrices = world_matrices
+        # world space bounding spheres (N,3) and (N,)
+        self.sphere_centers = sphere_centers
+        self.sphere_radii = sphere_radii
+        # world space boxes (N,3)
+        self.aabb_min = aabb_min
+        self.aabb_max = aabb_max
+
+class RenderQueue:
+
+    # when the scene has a transform store, positions for the depth keys
+    # are read straight from its arrays
+    def __init__(self, transform_store = None):
+        self.transform_store = transform_store
+
+        # every renderer in the scene (enabled or not)
+        self.renderers = []
+        # enabled renderers and the state part of their sort keys
+        self._draws = []
+        self._state_keys = np.zeros(0, dtype=np.uint64)
+        self._transparent = np.zeros(0, dtype=bool)
+        # local space bounding spheres of the meshes (for frustum culling)
+        self._sphere_centers = np.zeros((0, 4), dtype=np.float64)
+        self._sphere_radii = np.zeros(0, dtype=np.float64)
+        # and boxes (center and half size)
+        self._box_centers = np.zeros((0, 3), dtype=np.float64)
+        self._box_extents = np.zeros((0, 3), dtype=np.float64)
+        self._store_slots = None
+        # PreparedDraws of the current frame (None until prepare is called)
+        self.prepared = None
+        # draws outside the view frustum of the camera are skipped
+        self.culling = True
+        # consecutive draws of the same mesh and material are drawn
+        # with a single instanced draw call (see Scene.draw_scene)
+        self.instancing = True
+        self._dirty = False
+
+        # counters to show in the editor how often the queue is rebuilt.
+        # changes are the notifications received.
+        # several changes in the same frame produce only one rebuild
+        self.nr_changes = 0
+        self.nr_rebuilds = 0
+
+        # state changes done while drawing the current frame (see Scene.draw_scene).
+        # reset by the scene at the beginning of every frame
+        self.stats = RenderQueue._empty_stats()
+
+    def add(self, renderer):
+        self.renderers.append(renderer)
+        self._changed()
+
+    def remove(self, renderer):
+        if renderer in self.renderers:
+            self.renderers.remove(renderer)
+            self._changed()
+
+    # called by the renderers when they get enabled/disabled or change their material
+    def renderer_changed(self, renderer):
+        # renderers get their material set before being added to the scene
+        if renderer in self.renderers:
+            self._changed()
+
+    def new_frame(self):
+        self.stats = RenderQueue._empty_stats()
+        self.prepared = None
+
+    @property
+    def draws(self):
+        """ enabled renderers in no particular order """
+        if self._dirty:
+            self._rebuild()
+        return self._draws
+
+    # the camera independent part of the frame (once per frame, before drawing any view)
+    def prepare(self):
+        draws = self.draws
+        world_matrices = self._world_matrices()
+
+        # bounding spheres and boxes to world space, all draws at once
+        sphere_centers = np.einsum("ni,nij->nj", self._sphere_centers, world_matrices)[:, :3]
+        # scale can stretch the sphere. use the biggest axis scale to stay conservative
+        scales = np.sqrt(np.max(np.sum(world_matrices[:, :3, :3] ** 2, axis=2), axis=1))
+        sphere_radii = self._sphere_radii * scales
+        box_centers = np.einsum("ni,nij->nj", self._box_centers, world_matrices[:, :3, :3]) + world_matrices[:, 3, :3]
+        box_extents = np.einsum("ni,nij->nj", self._box_extents, np.abs(world_matrices[:, :3, :3]))
+
+        self.prepared = PreparedDraws(
+            draws,
+            world_matrices,
+            sphere_centers,
+            sphere_radii,
+            box_centers - box_extents,
+            box_centers + box_extents
+        )
+        return self.prepared
+
+    def sorted_draws(self, camera):
+        """ visible renderers in the order they should be drawn from the given camera """
+        draws = self.prepared_draws().draws
+        return [draws[i] for i in self.sorted_indices(camera)]
+
+    # prepared data of this frame (prepared now if it wasn't or if the queue changed since then)
+    def prepared_draws(self):
+        if self.prepared is None or self._dirty:
+            self.prepare()
+        return self.prepared
+
+    def sorted_indices(self, camera):
+        """ indices (into the prepared draws) of the visible renderers in drawing order """
+        prepared = self.prepared_draws()
+        nr_draws = len(prepared.draws)
+        if nr_draws == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        if self.culling:
+            visible = np.flatnonzero(self._in_frustum(prepared, camera))
+        else:
+            visible = np.arange(nr_draws)
+        self.stats["visible"] = self.stats["visible"] + len(visible)
+        self.stats["culled"] = self.stats["culled"] + nr_draws - len(visible)
+
+        depths = self._quantized_depths(prepared.world_matrices[visible, 3, :3], camera)
+        transparent = self._transparent[visible]
+        # opaque: front to back in the lowest bits.
+        # transparent: back to front right after the pass
+        depth_keys = np.where(
+            transparent,
+            (_MAX_DEPTH - depths) << np.uint64(_TRANSPARENT_DEPTH_SHIFT),
+            depths << np.uint64(_OPAQUE_DEPTH_SHIFT)
+        )
+        keys = self._state_keys[visible] | depth_keys
+        return visible[np.argsort(keys, kind="stable")]
+
+    # radius of the bounding spheres over half the screen height, for the given draws
+    # (see MeshRenderer.lod_mesh)
+    def screen_sizes(self, indices, camera):
+        prepared = self.prepared_draws()
+        camera_position = np.asarray(camera.transform.position, dtype=np.float64)
+        distances = np.linalg.norm(prepared.sphere_centers[indices] - camera_position, axis=1)
+        radii = prepared.sphere_radii[indices]
+        tan_half_vfov = np.tan(np.radians(camera.vfov) / 2)
+        # cameras inside the sphere see it all over the screen
+        inside = distances <= radii
+        return np.where(inside, np.inf, radii / (np.where(inside, 1.0, distances) * tan_half_vfov))
+
+    def _changed(self):
+        self._dirty = True
+        self.nr_changes = self.nr_changes + 1
+
+    def _rebuild(self):
+        self._draws = [renderer for renderer in self.renderers if renderer.enabled]
+
+        # small ids, given in order of appearance
+        programs = {}
+        texture_sets = {}
+        materials = {}
+        vaos = {}
+
+        nr_draws = len(self._draws)
+        state_keys = np.zeros(nr_draws, dtype=np.uint64)
+        transparent = np.zeros(nr_draws, dtype=bool)
+        for i, renderer in enumerate(self._draws):
+            material = renderer.material
+            program_id = RenderQueue._get_id(programs, material.shader, _ID_BITS)
+            texture_set_id = RenderQueue._get_id(texture_sets, material.texture_set, _ID_BITS)
+            material_id = RenderQueue._get_id(materials, material, _ID_BITS)
+            # same key, same vao (without creating it yet)
+            vao_id = RenderQueue._get_id(vaos, renderer.vao_key, _VAO_BITS)
+
+            if material.transparent:
+                transparent[i] = True
+                key = (PASS_TRANSPARENT << _PASS_SHIFT
+                    | material_id << _MATERIAL_SHIFT
+                    | vao_id << _VAO_SHIFT)
+            else:
+                key = (PASS_OPAQUE << _PASS_SHIFT
+                    | program_id << _PROGRAM_SHIFT
+                    | texture_set_id << _TEXTURE_SET_SHIFT
+                    | material_id << _MATERIAL_SHIFT
+                    | vao_id << _VAO_SHIFT)
+            state_keys[i] = key
+
+        self._state_keys = state_keys
+        self._transparent = transparent
+
+        # bounds of the meshes don't change, so we can gather them once.
+        # centers get a 1 so they can be multiplied directly by the model matrices
+        self._sphere_centers = np.ones((nr_draws, 4), dtype=np.float64)
+        self._sphere_radii = np.zeros(nr_draws, dtype=np.float64)
+        for i, renderer in enumerate(self._draws):
+            self._sphere_centers[i, :3] = renderer.mesh.bounding_sphere_center
+            self._sphere_radii[i] = renderer.mesh.bounding_sphere_radius
+        self._box_centers = np.array(
+            [(renderer.mesh.aabb_min + renderer.mesh.aabb_max) / 2 for renderer in self._draws],
+            dtype=np.float64
+        ).reshape(-1, 3)
+        self._box_extents = np.array(
+            [(renderer.mesh.aabb_max - renderer.mesh.aabb_min) / 2 for renderer in self._draws],
+            dtype=np.float64
+        ).reshape(-1, 3)
+
+        # if every transform lives in the store, we can gather their positions at once
+        self._store_slots = None
+        store = self.transform_store
+        if store is not None and all(renderer.game_object.transform._store is store for renderer in self._draws):
+            self._store_slots = np.array(
+                [renderer.game_object.transform._slot for renderer in self._draws],
+                dtype=np.int64
+            )
+
+        self._dirty = False
+        self.nr_rebuilds = self.nr_rebuilds + 1
+
+    def _world_matrices(self):
+        if self._store_slots is not None:
+            self.transform_store.update()
+            return self.transform_store.world_matrices[self._store_slots]
+        return np.array(
+            [renderer.game_object.transform.model_mat for renderer in self._draws],
+            dtype=np.float64
+        )
+
+    # bounding spheres against the 6 planes of the camera frustum, all draws at once.
+    # a sphere is outside if its center is further than its radius behind any plane
+    def _in_frustum(self, prepared, camera):
+        planes = camera.frustum_planes
+        distances = prepared.sphere_centers @ planes[:, :3].T + planes[:, 3]
+        return np.all(distances >= -prepared.sphere_radii[:, np.newaxis], axis=1)
+
+    # world positions (N,3) -> depth keys
+    def _quantized_depths(self, positions, camera):
+        # cameras look along their -forward direction
+        camera_transform = camera.transform
+        view_direction = -np.asarray(camera_transform.forward, dtype=np.float64)
+        camera_position = np.asarray(camera_transform.position, dtype=np.float64)
+
+        depths = (positions - camera_position) @ view_direction
+        # linear depth between near and far planes mapped to [0, _MAX_DEPTH]
+        depths = (depths - camera.near) / (camera.far - camera.near)
+        depths = np.clip(depths, 0.0, 1.0) * _MAX_DEPTH
+        return depths.astype(np.uint64)
+
+    # ids beyond the available bits share the last value.
+    # that only makes the sorting less effective, drawing is still right
+    @staticmethod
+    def _get_id(ids, key, bits):
+        if key not in ids:
+            ids[key] = min(len(ids), (1 << bits) - 1)
+        return ids[key]
+
+    @staticmethod
+    def _empty_stats():
+        return {
+            "visible" : 0,
+            "culled" : 0,
+            "draws" : 0,
+            "instanced draws" : 0,
+            "instances" : 0,
+            "lod draws" : 0,
+            "occlusion queries" : 0,
+            "occluded" : 0,
+            "program switches" : 0,
+            "texture binds" : 0,
+            "vao switches" : 0,
+        }
@@ -1,19 +1,33 @@
-import inspect
-
 import imgui
 import pyrr
+import numpy as np
 import OpenGL.GL as gl
 import random
+import engine.editor
+import functools
 
-from .gui import GameObjectGUI
+from .gui import GameObjectGUI, HierarchyGUI
 # it seeems we don't need to import a module/class name if we are not going to instantiate an object
 # but in this case, when referencing the class type, we need it
 from .components import MeshRenderer
 from .components import Camera
-from .components import Light
+from .components import Light, LightType
 from .gizmo import Gizmo, CameraGizmo
 
-from .base_mesh import GridMesh
+from .base_mesh import GridMesh, Cube
+from .transform import TransformChanges
+from .render_queue import RenderQueue
+from .aabb_tree import AABBTree
+from .instanced_renderer import InstancedRenderer
+from .frame_uniforms import FrameUniforms
+from .light_clusters import LightClusters
+from .static_batcher import build_static_batches
+from .occlusion_culling import OcclusionQueries, box_model_matrix, contains_camera
+from .ecs import TRANSFORM_DTYPE
+from .asset_database import AssetHandle
+from .components.mesh_renderer import configure_vao, reconfigure_vaos, delete_released_vaos
+from . import vertex_layout
+from . import VertexAttrib
 
 from . import shader_manager
 from . import material_manager
@@ -32,13 +46,82 @@ from timeit import default_timer as timer
 
 class Scene:
 
-    def __init__(self):
+    # transform_store is optional. when given, the transforms of the game objects
+    # added to the scene are moved into it and updated in batches (see transform_store.py)
+    # world is optional too (it needs a transform store). when given, game objects get an entity
+    # and the components supporting it keep their data in the world (see ecs.py)
+    def __init__(self, transform_store = None, world = None):
         self.game_objects = []
+        self.transform_store = transform_store
+        if world is not None and transform_store is None:
+            raise Exception("scenes with an ecs world need a transform store")
+        self.world = world
+        # component types whose system was added to the world
+        self._ecs_types = set()
+        if world is not None:
+            world.register_component("transform", TRANSFORM_DTYPE)
         self.cameras = []
         self.light_sources = []
         self.selected = None
-        self.expanded = []   # the list of flags saying whether the gameObject is expanded in the hierarchy window
+        # bumped whenever game objects get added, removed, renamed or re-parented
+        # (the hierarchy panel rebuilds its rows then)
+        self.hierarchy_version = 0
+        # editor guis are only built when needed (never without editor, see editor.py)
+        self.hierarchy_gui = None
+        # game object id -> GameObjectGUI of the opened inspectors.
+        # they are created when opened and dropped when closed
         self.guis = {}
+        # component type -> list of (component, bound update method)
+        # only types that define an update method get a list.
+        # it's filled up when components get registered so we don't need to
+        # inspect every component every frame
+        self.update_lists = {}
+        # mesh renderers grouped by material, kept up to date as renderers change
+        self.render_queue = RenderQueue(transform_store)
+        # world space boxes of the mesh renderers for spatial queries
+        # (ray picking, objects in some region, etc).
+        # the data stored in the tree are the renderers.
+        # it's kept up to date through the transform change notifications
+        self.spatial_index = AABBTree()
+        self._spatial_proxies = {}  # renderer -> proxy id
+        # renderers waiting to be inserted all at once (see add_game_objects)
+        self._pending_proxies = None
+        # the transforms of our game objects report their changes here
+        self.transform_changes = TransformChanges()
+        self.transform_changes.subscribe(self._on_transforms_moved)
+
+        # (mesh, instanced material) -> InstancedRenderer (see draw_scene)
+        self._instanced_renderers = {}
+        # renderers were removed, some instanced renderers could be unused now
+        # (see _release_instanced_renderers)
+        self._instanced_dirty = False
+        # opengl state bound while drawing the render queue
+        self._draw_state = None
+        # camera and light data shared by all shaders
+        self.frame_uniforms = FrameUniforms()
+        # point lights binned per camera for the clustered shaders
+        self.light_clusters = LightClusters()
+        # renderers of static game objects baked together (see static_batcher.py).
+        # they are rebuilt on the next update whenever a static game object changes
+        self.static_batching = True
+        # layout of the vertex buffers of the meshes (see set_vertex_layout)
+        self.vertex_layout = vertex_layout.PLANAR
+        self.static_batches = []
+        self._static_dirty = False
+        # the camera independent part of the frame is done once before drawing
+        # the first view (see prepare_frame)
+        self._frame_prepared = False
+        # transform_changes.version when it was done
+        self._prepared_transforms = 0
+        # camera -> OcclusionQueries, for cameras with occlusion culling enabled.
+        # the bounding boxes of the renderers are drawn with a unit cube
+        self._occlusion_queries = {}
+        self.occlusion_box = MeshRenderer(
+            None,
+            Cube(VertexAttrib.NONE),
+            material_manager.get_from_name("occlusion_box")
+        )
+
         self.gizmo = Gizmo()
         self.camera_gizmo = CameraGizmo()
 
@@ -75,36 +158,347 @@ class Scene:
     def add_game_object(self, game_object):
         self.game_objects.append(game_object)
 
-        # check if game object was a camera
-        # NOTE: this has the issue that it doesn't take into account
-        # the fact that we can add a camera componet later!!
-        # the same problem is going to happen for any special game object as lights
-        camera = game_object.get_component(Camera)
-        light_source = game_object.get_component(Light)
-        if camera is not None:
-            self.cameras.append(camera)
-        if light_source is not None:
-            self.light_sources.append(light_source)
-
-        gui = GameObjectGUI(game_object)
-        self.guis[game_object.id] = gui
-
-        # whenever we add a game object to the scene, we are going to create its editor gui here
-
-        self.expanded.append(False)
+        # parents need to be added to the scene before their children.
+        # scene files attach all their transforms at once before adding the game objects
+        if self.transform_store is not None and game_object.transform._store is None:
+            self.transform_store.attach(game_object.transform)
+
+        if self.world is not None:
+            self._create_entity(game_object)
+
+        # components added later through game_object.add_component
+        # get registered by the game object itself
+        game_object.scene = self
+        game_object.transform._changes = self.transform_changes
+        for component in game_object.components:
+            self._register_component(component)
+
+        # its inspector gets created when opened (see open_inspector)
+        self._hierarchy_changed()
+
+        if game_object.static:
+            self._static_changed()
+
+    # same as adding them one by one (parents first),
+    # but the renderers go into the spatial index all at once
+    def add_game_objects(self, game_objects):
+        self._pending_proxies = []
+        for game_object in game_objects:
+            self.add_game_object(game_object)
+        renderers = self._pending_proxies
+        self._pending_proxies = None
+        if len(renderers) == 0:
+            return
+
+        # world boxes of all the renderers at once (same as MeshRenderer.world_bounds)
+        model_mats = np.array([renderer.game_object.transform.model_mat for renderer in renderers], dtype=np.float64)
+        local_min = np.array([renderer.mesh.aabb_min for renderer in renderers], dtype=np.float64)
+        local_max = np.array([renderer.mesh.aabb_max for renderer in renderers], dtype=np.float64)
+        local_center = (local_min + local_max) / 2
+        local_extent = (local_max - local_min) / 2
+        center = np.einsum("ni,nij->nj", local_center, model_mats[:, :3, :3]) + model_mats[:, 3, :3]
+        extent = np.einsum("ni,nij->nj", local_extent, np.abs(model_mats[:, :3, :3]))
+        proxies = self.spatial_index.create_proxies(center - extent, center + extent, renderers)
+        for renderer, proxy in zip(renderers, proxies):
+            self._spatial_proxies[renderer] = proxy
+
+    # children are not removed with their parent (remove them first)
+    def remove_game_object(self, game_object):
+        idx = self.game_objects.index(game_object)
+        self.game_objects.pop(idx)
+        self._hierarchy_changed()
+        self.close_inspector(game_object)
+        if self.selected == game_object:
+            self.selected = None
+
+        for component in game_object.components:
+            self._unregister_component(component)
+        game_object.scene = None
+        self.transform_changes._forget(game_object.transform)
+        game_object.transform._changes = None
+        if game_object.entity is not None:
+            self.world.destroy_entity(game_object.entity)
+            game_object.entity = None
+        if game_object.static:
+            self._static_changed()
+
+        if self.transform_store is not None:
+            self.transform_store.detach(game_object.transform)
+
+    # called for every component of the game objects in the scene
+    # (when adding the game object or when adding the component later)
+    def _register_component(self, component):
+        # check if the component is a camera or a light
+        if isinstance(component, Camera):
+            self.cameras.append(component)
+        if isinstance(component, Light):
+            self.light_sources.append(component)
+
+        # components added after their game object got its entity
+        game_object = component.game_object
+        if (game_object.entity is not None and component._world is None and component.ecs_name is not None
+                and not self._entity_has(game_object.entity, component.ecs_name)):
+            self._register_ecs_type(type(component))
+            self.world.add_component(game_object.entity, component.ecs_name, component._ecs_values())
+            component._bind_entity(self.world, game_object.entity)
+
+        # we only need to find out once whether the component has an update method.
+        # previously, we were doing inspect.getmembers on every component every frame.
+        # components living in the world are updated by their system instead
+        update = getattr(component, "update", None)
+        if callable(update) and component._world is None:
+            component_type = type(component)
+            if component_type not in self.update_lists:
+                self.update_lists[component_type] = []
+            self.update_lists[component_type].append((component, update))
+
+        if isinstance(component, MeshRenderer):
+            self.render_queue.add(component)
+            if self._pending_proxies is not None:
+                self._pending_proxies.append(component)
+                return
+            aabb_min, aabb_max = component.world_bounds()
+            self._spatial_proxies[component] = self.spatial_index.create_proxy(aabb_min, aabb_max, component)
+
+    def _unregister_component(self, component):
+        if component in self.cameras:
+            self.cameras.remove(component)
+        occlusion = self._occlusion_queries.pop(component, None)
+        if occlusion is not None:
+            occlusion.release()
+        if component in self.light_sources:
+            self.light_sources.remove(component)
+
+        if component._world is not None:
+            component._unbind_entity()
+            self.world.remove_component(component.game_object.entity, component.ecs_name)
+
+        update_list = self.update_lists.get(type(component))
+        if update_list is not None:
+            self.update_lists[type(component)] = [
+                entry for entry in update_list if entry[0] is not component
+            ]
+
+        if isinstance(component, MeshRenderer):
+            self.render_queue.remove(component)
+            self._instanced_dirty = True
+            proxy = self._spatial_proxies.pop(component, None)
+            if proxy is not None:
+                self.spatial_index.destroy_proxy(proxy)
+            for occlusion in self._occlusion_queries.values():
+                occlusion.forget(component)
+
+    # the entity of a game object with the data of its components supporting it, in one go
+    # (no moving it from archetype to archetype as components get added)
+    def _create_entity(self, game_object):
+        components = {"transform" : (game_object.transform._slot,)}
+        bound = []
+        for component in game_object.components:
+            if component.ecs_name is None or component.ecs_name in components:
+                continue
+            self._register_ecs_type(type(component))
+            components[component.ecs_name] = component._ecs_values()
+            bound.append(component)
+        game_object.entity = self.world.create_entity(**components)
+        for component in bound:
+            component._bind_entity(self.world, game_object.entity)
+
+    # only one component of each type per entity, the others update themselves
+    def _entity_has(self, entity, name):
+        return self.world.is_registered(name) and self.world.has_component(entity, name)
+
+    def _register_ecs_type(self, component_type):
+        if component_type in self._ecs_types:
+            return
+        self._ecs_types.add(component_type)
+        self.world.register_component(component_type.ecs_name, component_type.ecs_dtype)
+        system = functools.partial(component_type.ecs_system, self.transform_store)
+        self.world.add_system(system, "transform", component_type.ecs_name)
+
+    def raycast(self, origin, direction, max_distance = float("inf")):
+        """ closest enabled mesh renderer whose world box is hit by the ray (or None) """
+        for distance, renderer in self.spatial_index.ray_cast(origin, direction, max_distance):
+            if renderer.enabled:
+                return renderer
+        return None
+
+    # transform notification callback (once per frame).
+    # we get the roots of the subtrees that moved
+    def _on_transforms_moved(self, moved):
+        pending = list(moved)
+        while len(pending) > 0:
+            transform = pending.pop()
+            pending.extend(transform.children)
+            game_object = transform.game_object
+            if game_object is None or game_object.scene is not self:
+                continue
+            # static game objects are baked in world space
+            if game_object.static:
+                self._static_changed()
+            for component in game_object.components:
+                proxy = self._spatial_proxies.get(component)
+                if proxy is not None:
+                    aabb_min, aabb_max = component.world_bounds()
+                    self.spatial_index.move_proxy(proxy, aabb_min, aabb_max)
 
     def update(self):
-        # update components if they have an update method
-        for game_obj in self.game_objects:
-            for component in game_obj.components:
-                # inspect(object[,predicate]) returns a list of tuples name value
-                # of all members of the object
-                # print("component {} members:".format(component))
+        # counters of what gets drawn are per frame
+        self.render_queue.new_frame()
+        # vaos of meshes collected since the last frame
+        delete_released_vaos()
+        if self._instanced_dirty:
+            self._release_instanced_renderers()
+
+        # update components if they have an update method.
+        # components are updated type by type.
+        # updates can add components of new types, so we go through a copy of the lists
+        for update_list in list(self.update_lists.values()):
+            for component, update in update_list:
                 if component.enabled:
-                    for name, value in inspect.getmembers(component):
-                        if name == "update":
-                            component.update()
-                        # print(name)
+                    update()
+        # and the ones living in the world, column by column
+        if self.world is not None:
+            self.world.update()
+
+        # everything that moved this frame (including input handling before this call)
+        # is reported to the subscribers at once
+        self.transform_changes.flush()
+
+        if self._static_dirty:
+            self.build_static_batches()
+
+        self._frame_prepared = False
+
+    # frames are drawn in two stages:
+    # - prepare: the work that doesn't depend on the camera (once per frame, after update)
+    # - views: draw_scene for every camera drawing the frame, reusing the prepared data
+    def prepare_frame(self):
+        self.render_queue.prepare()
+        point_lights = [
+            light for light in self.light_sources
+            if light.light_type == LightType.POINT and light.enabled
+        ]
+        self.light_clusters.prepare(point_lights)
+        self._frame_prepared = True
+        self._prepared_transforms = self.transform_changes.version
+
+    def open_inspector(self, game_object):
+        if not engine.editor.enabled:
+            return
+        if game_object.id not in self.guis:
+            self.guis[game_object.id] = GameObjectGUI(game_object)
+        self.guis[game_object.id].opened = True
+
+    # the guis of the game object and its components are built again next time
+    def close_inspector(self, game_object):
+        gui = self.guis.pop(game_object.id, None)
+        if gui is None:
+            return
+        for component in game_object.components:
+            component.release_gui()
+
+    # arranges the vertex buffers of every mesh drawn by the scene with the given layout
+    # (see vertex_layout.py) and points their vaos to the new offsets and strides.
+    # meshes not loaded yet and meshes without cpu data keep theirs
+    def set_vertex_layout(self, mode):
+        self.vertex_layout = mode
+        for mesh in self.loaded_meshes():
+            if not mesh.has_cpu_data:
+                continue
+            mesh.set_layout(mode)
+            for layout_mesh in [mesh] + mesh.lods:
+                reconfigure_vaos(layout_mesh)
+        for instanced_renderer in self._instanced_renderers.values():
+            mesh = instanced_renderer.mesh
+            configure_vao(instanced_renderer.vao, mesh, instanced_renderer.material.shader)
+
+    # every mesh drawn by the scene (once), static batches and their original meshes included.
+    # meshes of asset handles that are not loaded yet are skipped
+    def loaded_meshes(self):
+        renderers = list(self.render_queue.renderers)
+        for batch in self.static_batches:
+            renderers.extend(batch.renderers)
+        meshes = {}
+        for renderer in renderers:
+            mesh = renderer.mesh
+            if isinstance(mesh, AssetHandle) and not mesh.loaded:
+                continue
+            meshes[id(mesh)] = mesh
+        return list(meshes.values())
+
+    # (bytes, bytes without compression) of the vertex and index buffers of the scene meshes
+    # and their levels of detail (see BaseMesh.compressed)
+    def mesh_memory(self):
+        gpu_bytes = 0
+        uncompressed_bytes = 0
+        for mesh in self.loaded_meshes():
+            for lod_mesh in [mesh] + mesh.lods:
+                gpu_bytes = gpu_bytes + lod_mesh.gpu_bytes
+                uncompressed_bytes = uncompressed_bytes + lod_mesh.uncompressed_bytes
+        return gpu_bytes, uncompressed_bytes
+
+    # the scene is not going to be used anymore (another one replaces it or the window closes).
+    # its game objects stop reporting their transform changes
+    def close(self):
+        self.transform_changes.unsubscribe(self._on_transforms_moved)
+        for game_object in self.game_objects:
+            game_object.transform._changes = None
+        for instanced_renderer in self._instanced_renderers.values():
+            instanced_renderer.release()
+        self._instanced_renderers = {}
+
+    # instanced renderers of meshes (or levels of detail) that none of our renderers use anymore.
+    # they would keep the mesh and their gpu buffers around otherwise
+    def _release_instanced_renderers(self):
+        used = set()
+        for mesh in self.loaded_meshes():
+            used.update(id(lod_mesh) for lod_mesh in [mesh] + mesh.lods)
+        for key in list(self._instanced_renderers.keys()):
+            if id(key[0]) not in used:
+                self._instanced_renderers.pop(key).release()
+        self._instanced_dirty = False
+
+    def _hierarchy_changed(self):
+        self.hierarchy_version = self.hierarchy_version + 1
+
+    def _static_changed(self):
+        self._static_dirty = True
+
+    # the scene build step for static game objects.
+    # the renderers of the previous batches go back to the render queue
+    # and the ones of static game objects are baked again
+    def build_static_batches(self):
+        for batch in self.static_batches:
+            self.render_queue.remove(batch.renderer)
+            if self.transform_store is not None:
+                self.transform_store.detach(batch.game_object.transform)
+            batch.release()
+            for occlusion in self._occlusion_queries.values():
+                occlusion.forget(batch.renderer)
+            for renderer in batch.renderers:
+                # it could have been removed from the scene in the meantime
+                if renderer.game_object.scene is self:
+                    self.render_queue.add(renderer)
+        self.static_batches = []
+        self._static_dirty = False
+
+        if not self.static_batching:
+            return
+
+        static_renderers = [
+            renderer for renderer in self.render_queue.renderers
+            if renderer.enabled and renderer.game_object.static
+        ]
+        self.static_batches, _ = build_static_batches(static_renderers)
+        for batch in self.static_batches:
+            # batched renderers stay in the spatial index (for picking)
+            # but they are drawn through their batch
+            for renderer in batch.renderers:
+                self.render_queue.remove(renderer)
+            # so the render queue can keep reading all the positions from the store
+            if self.transform_store is not None:
+                self.transform_store.attach(batch.game_object.transform)
+            self.render_queue.add(batch.renderer)
 
 
     def draw_scene(self, camera, is_editor_camera = True):
@@ -112,6 +506,16 @@ class Scene:
         # in general: for ech game object, activate its shader and draw the object.
         # but we should sort game objects by material first
 
+        # the first view of the frame prepares it if nobody did.
+        # things moved after preparing (gui edits, scripts) would be culled and drawn
+        # with their previous matrices, so it's prepared again then
+        if not self._frame_prepared or self.transform_changes.version != self._prepared_transforms:
+            self.prepare_frame()
+
+        # per frame data for this camera. the overlays drawn after this call use it too
+        self.frame_uniforms.update(camera, self.light_sources, self.light_clusters.grid)
+        self.light_clusters.update(camera)
+
         # testing grid
         if is_editor_camera:
 
@@ -133,15 +537,14 @@ class Scene:
             # the grid needs to move with the camera in the xy plane
             # actually not exactly like that.
             # it needs to move but at integer intervals
-            camera_pos = camera.transform.position
+            # take a copy. position is cached by the transform
+            camera_pos = pyrr.Vector3(camera.transform.position)
             camera_pos.x = int(camera_pos.x)
             camera_pos.y = 0
             camera_pos.z = int(camera_pos.z)
-            mvp = pyrr.matrix44.multiply(
-                pyrr.matrix44.multiply(pyrr.matrix44.create_from_translation(camera_pos), camera.transform.view_mat),
-                camera.projection)
+            model_mat = pyrr.matrix44.create_from_translation(camera_pos)
             # we should not use the renderer to set uniforms!!
-            self.grid_renderer.material.set_matrix("mvp", mvp)
+            self.grid_renderer.material.set_matrix("model", model_mat)
             self.grid_renderer.material.set_uniform("clip_distance", [self.grid_clip_distance])
             self.grid_renderer.render()
             gl.glLineWidth(5)
@@ -149,64 +552,182 @@ class Scene:
 
         # rather than interating directly through the list of game objects,
         # we need to find what materials they are using and render them by grouping them
-        # by materials
-        game_objects_per_material = {}
-        for game_obj in self.game_objects:
-            for component in game_obj.components:
-                if isinstance(component, MeshRenderer):
-                    material = component.material
-                    if material not in game_objects_per_material:
-                        # create the list of game objects for this material
-                        game_objects_per_material[material] = []
-                    game_objects_per_material[material].append(game_obj)
-
-        for material in game_objects_per_material:
-            material.use()
-
-            # # testing textures
-            # self.texture1.bind(0)
-            # self.texture2.bind(1)
-            # # material.set_uniform("texture0", [0])
-            # # material.set_uniform("texture1", [1])
-            # # end testing texture
-
-            for game_obj in game_objects_per_material[material]:
-                for component in game_obj.components:
-                    if isinstance(component, MeshRenderer):
-
-                        # mvp = pyrr.matrix44.multiply(
-                        #     pyrr.matrix44.multiply(
-                        #         game_obj.transform.model_mat,
-                        #         camera.transform.view_mat),
-                        #     camera.projection)
-
-                        mvp = pyrr.matrix44.multiply(
-                            game_obj.transform.model_mat,
-                            camera.view_projection
-                        )
-
-                        material.set_matrix("mvp", mvp)
-                        material.set_matrix("model", game_obj.transform.model_mat)
-                        material.set_uniform("_camera_pos", camera.transform.position)
-
-                        # if the material uses textures,
-                        # we need to make sure they are bound at the right texture units.
-                        # the material knows already which texture unit to use (that was set
-                        # initially using the uniform). but we need to ensure the right texture
-                        # is there.
-                        # self.texture1.bind()
-                        # self.texture2.bind(1)
-                        # therefore, material needs to know the textures is going to use
-
-                        if len(self.light_sources) > 0:
-                            # when passing uniforms, we need to treat the data as simple as possible
-                            # i.e, rather than a pyrr.vector or python array, expand them
-                            # to a comma separated invidual floats
-                            material.set_uniform("_light_pos", self.light_sources[0].position)
-                            material.set_uniform("_light_color", self.light_sources[0].color)
-
-                        # now we can ask the meshRenderer to draw the geometry
-                        component.render()
+        # by materials.
+        # UPDATE: the render queue sorts the draws so the ones sharing the same
+        # program, textures and vao come one after the other (see render_queue.py).
+        # we only change the opengl state when the next draw needs something different
+        # (see _use_material and _bind_vao)
+        self._draw_state = {
+            "material" : None,
+            "shader" : None,
+            "texture set" : None,
+            "vao" : None,
+        }
+        prepared = self.render_queue.prepared_draws()
+        order = self.render_queue.sorted_indices(camera)
+        draws = [prepared.draws[i] for i in order]
+        # level of detail of every draw for this camera
+        screen_sizes = self.render_queue.screen_sizes(order, camera).tolist()
+        meshes = [renderer.lod_mesh(camera, size) for renderer, size in zip(draws, screen_sizes)]
+
+        if not camera.occlusion_culling:
+            self._draw_list(draws, meshes)
+        else:
+            # transparent draws come last in the queue (see render_queue.py)
+            nr_opaque = 0
+            while nr_opaque < len(draws) and not draws[nr_opaque].material.transparent:
+                nr_opaque = nr_opaque + 1
+
+            occlusion = self._get_occlusion_queries(camera)
+            occlusion.collect()
+            # opaque draws hidden in the latest results wait for the depth of the rest
+            visible = []
+            hidden = []
+            for i in range(nr_opaque):
+                if occlusion.is_occluded(draws[i]):
+                    hidden.append(i)
+                else:
+                    visible.append(i)
+            self._draw_list([draws[i] for i in visible], [meshes[i] for i in visible])
+            self._draw_occlusion_tests(
+                camera,
+                occlusion,
+                draws[:nr_opaque],
+                prepared.aabb_min[order[:nr_opaque]],
+                prepared.aabb_max[order[:nr_opaque]],
+                [draws[i] for i in hidden],
+                [meshes[i] for i in hidden]
+            )
+            self._draw_list(draws[nr_opaque:], meshes[nr_opaque:])
+
+        gl.glBindVertexArray(0)
+
+    # draws in order (with gpu instancing when possible)
+    def _draw_list(self, draws, meshes):
+        i = 0
+        while i < len(draws):
+            renderer = draws[i]
+            material = renderer.material
+            mesh = meshes[i]
+
+            # the same mesh with the same material several times in a row
+            # can be drawn all at once with gpu instancing
+            end = i + 1
+            if self.render_queue.instancing:
+                while end < len(draws) and draws[end].material is material and meshes[end] is mesh:
+                    end = end + 1
+            if end - i >= 2:
+                instanced_material = material_manager.get_instanced_variant(material)
+                if instanced_material is not None:
+                    self._draw_instanced(draws[i:end], mesh, instanced_material)
+                    i = end
+                    continue
+
+            self._draw_single(renderer, mesh)
+            i = i + 1
+
+    def _draw_single(self, renderer, mesh):
+        material = renderer.material
+        self._use_material(material)
+        self._bind_vao(renderer.vao_for(mesh))
+        material.shader.set_compressed_normals(mesh.compressed)
+
+        # the view projection part is in the frame uniforms
+        material.set_matrix("model", renderer.game_object.transform.model_mat)
+
+        # now we can ask the mesh to draw the geometry
+        # (the vao of the renderer is bound)
+        mesh.draw()
+        stats = self.render_queue.stats
+        stats["draws"] = stats["draws"] + 1
+        if mesh is not renderer.mesh:
+            stats["lod draws"] = stats["lod draws"] + 1
+
+    def _get_occlusion_queries(self, camera):
+        if camera not in self._occlusion_queries:
+            self._occlusion_queries[camera] = OcclusionQueries()
+        return self._occlusion_queries[camera]
+
+    # the boxes of all the opaque renderers get tested against the depth buffer
+    # (results are read in later frames) and the hidden renderers are drawn
+    # only if their box passes (see occlusion_culling.py)
+    def _draw_occlusion_tests(self, camera, occlusion, renderers, aabbs_min, aabbs_max, hidden, hidden_meshes):
+        stats = self.render_queue.stats
+        nr_queries = occlusion.nr_queries
+
+        gl.glColorMask(gl.GL_FALSE, gl.GL_FALSE, gl.GL_FALSE, gl.GL_FALSE)
+        gl.glDepthMask(gl.GL_FALSE)
+        box_material = self.occlusion_box.material
+        self._use_material(box_material)
+        self._bind_vao(self.occlusion_box.vao)
+        for renderer, aabb_min, aabb_max in zip(renderers, aabbs_min, aabbs_max):
+            if contains_camera(aabb_min, aabb_max, camera):
+                occlusion.set_visible(renderer)
+                continue
+            if occlusion.begin(renderer):
+                box_material.set_matrix("model", box_model_matrix(aabb_min, aabb_max))
+                self.occlusion_box.mesh.draw()
+                occlusion.end()
+        gl.glColorMask(gl.GL_TRUE, gl.GL_TRUE, gl.GL_TRUE, gl.GL_TRUE)
+        gl.glDepthMask(gl.GL_TRUE)
+
+        for renderer, mesh in zip(hidden, hidden_meshes):
+            conditional = occlusion.is_occluded(renderer) and occlusion.begin_conditional(renderer)
+            self._draw_single(renderer, mesh)
+            if conditional:
+                occlusion.end_conditional()
+
+        stats["occlusion queries"] = stats["occlusion queries"] + occlusion.nr_queries - nr_queries
+        stats["occluded"] = stats["occluded"] + len(hidden)
+
+    def _draw_instanced(self, renderers, mesh, instanced_material):
+        key = (mesh, instanced_material)
+        if key not in self._instanced_renderers:
+            self._instanced_renderers[key] = InstancedRenderer(mesh, instanced_material)
+        instanced_renderer = self._instanced_renderers[key]
+
+        instanced_renderer.upload([renderer.game_object.transform.model_mat for renderer in renderers])
+
+        self._use_material(instanced_material)
+        self._bind_vao(instanced_renderer.vao)
+        instanced_material.shader.set_compressed_normals(mesh.compressed)
+        instanced_renderer.draw(len(renderers))
+
+        stats = self.render_queue.stats
+        stats["draws"] = stats["draws"] + 1
+        stats["instanced draws"] = stats["instanced draws"] + 1
+        stats["instances"] = stats["instances"] + len(renderers)
+        if mesh is not renderers[0].mesh:
+            stats["lod draws"] = stats["lod draws"] + len(renderers)
+
+    def _use_material(self, material):
+        state = self._draw_state
+        if material is state["material"]:
+            return
+        stats = self.render_queue.stats
+
+        # glUseProgram only when the program changes
+        use_program = material.shader is not state["shader"]
+        if use_program:
+            state["shader"] = material.shader
+            stats["program switches"] = stats["program switches"] + 1
+
+        texture_set = material.texture_set
+        bind_textures = texture_set != state["texture set"]
+        if bind_textures:
+            state["texture set"] = texture_set
+            stats["texture binds"] = stats["texture binds"] + len(texture_set)
+        material.use(bind_textures, use_program)
+        state["material"] = material
+        # camera and lights are not set per material anymore (see frame_uniforms.py)
+
+    def _bind_vao(self, vao):
+        state = self._draw_state
+        if vao != state["vao"]:
+            gl.glBindVertexArray(vao)
+            state["vao"] = vao
+            stats = self.render_queue.stats
+            stats["vao switches"] = stats["vao switches"] + 1
 
     def draw_overlay(self, camera):
         """" this method will draw things that need to be on top of everything like gizmos """
@@ -221,74 +742,21 @@ class Scene:
         # scene tree
         # double click in game object will open its inspector (which can be closed)
         # single click will just make it 'selected'
-        """ this will draw the scene hierarchy as a scrollable list """
-        # let's make this its "own" window (like in unity is a dockable panel)
-        imgui.begin("Scene Hierarchy")
-        # for the list i can try to use:
-        # - imgui.collapsing_header(text, visible_header, tree_flags) -> expanded, visible_header
-        # for game_obj in self.game_objects:
-        #     # we should display the expandable option only of the gameObject has children
-        #     expanded_visible = imgui.collapsing_header(game_obj.name, None)
-        #     if imgui.is_item_active():
-        #         imgui.text("{} active".format(game_obj.name))
-        #     if imgui.is_item_clicked():
-        #         imgui.text("{} clicked".format(game_obj.name))
-        #     if imgui.is_item_focused():
-        #         imgui.text("{} focused".format(game_obj.name))
-        #     if imgui.is_item_hovered():
-        #         imgui.text("{} hovered".format(game_obj.name))
-
-        # display list states
-        # for idx, game_obj in enumerate(self.game_objects):
-        interaction_values = []
-
-        # - imgui.list_box_header/footer with imgui.selectable
-        # the returned tuple has to be interpreted as:
-        # opened (or clicked) if the item was click during this frame
-        # selected if the current internal state of this item is selected
-        imgui.listbox_header("hierarchy tree")
-        for idx, game_obj in enumerate(self.game_objects):
-            # opened, selected = imgui.selectable(game_obj.name, True if self.selected == game_obj else False)
-            clicked, selected = imgui.selectable(
-                    "> {}".format(game_obj.name),
-                    True if self.selected == game_obj else False,
-                    imgui.SELECTABLE_ALLOW_DOUBLE_CLICK)
-
-            if selected:
-                self.selected = game_obj
-            if clicked:
-                self.expanded[idx] = not self.expanded[idx]
-
-            # detect double click in selectable
-            open_inspector = imgui.is_item_hovered() and imgui.is_mouse_double_clicked()
-            if open_inspector:
-                self.guis[self.selected.id].opened = True
-
-            interaction = {
-                "clicked" : clicked,
-                "selected" : selected,
-            }
-            interaction_values.append(interaction)
-
-            # is_mouse_double_clicked is a global event (not linked to any widget)
-            # double_click = imgui.is_mouse_double_clicked()
-            # if (double_click):
-            #     imgui.text("double click")
-
-            # if (self.expanded[idx]):
-            #     imgui.text("{} expanded".format(game_obj.name))
-
-        imgui.listbox_footer()
-
-        for interaction_val in interaction_values:
-            imgui.text("clicked={} selected={}".format(interaction_val["clicked"], interaction_val["selected"]))
-
-        imgui.end()
-
-        # we need to display maybe multiple inspectors and not only the one that are active
-        for game_object_id, gui in self.guis.items():
-            if gui.opened:
-                gui.draw_gui()
+        """ this will draw the scene hierarchy as a scrollable tree """
+        # let's make this its "own" window (like in unity is a dockable panel).
+        # only the visible rows get drawn (see hierarchy_gui.py)
+        if not engine.editor.enabled:
+            return
+        if self.hierarchy_gui is None:
+            self.hierarchy_gui = HierarchyGUI(self)
+        self.hierarchy_gui.draw()
+
+        # we need to display maybe multiple inspectors and not only the one that are active.
+        # the ones closed this frame get dropped
+        for game_object_id, gui in list(self.guis.items()):
+            gui.draw_gui()
+            if not gui.opened:
+                self.close_inspector(gui.game_object)
         # there are two windows to render, the hierarchy and the inspector
         # of the currrent selected object
         # if self.selected is not None and self.guis[self.selected.id].opened:
@@ -0,0 +1,321 @@
+# binary scene files.
+# scenes used to be built by code (see assets/scenes/example_scene.py), loading every mesh
+# at startup. a scene file keeps the same data in a few packed arrays so it can be
+# read with a single read and turned into numpy arrays without parsing anything:
+#
+#   header
+#   parents         int32 (nr objects)        index of the parent (-1 for roots)
+#   flags           uint8 (nr objects)        static
+#   string offsets  uint32 (nr strings + 1)   into the string data
+#   transforms      float32 (nr objects, 10)  local position, rotation (w, x, y, z) and scale
+#   components      _COMPONENT_DTYPE          game object, type and parameters
+#   assets          _ASSET_DTYPE              content hash, type, path, bounds, drawing mode and flags
+#   string data     utf-8
+#
+# game objects are stored parents first, so their index is also a valid order to add them.
+# the first strings are the names of the game objects, the rest are material names and asset paths.
+# meshes are referenced by content hash and turned into lazy handles (see asset_database.py).
+# every section starts at a multiple of 8 bytes.
+
+import gc
+import struct
+
+import numpy as np
+import pyrr
+
+from engine import asset_database
+from engine import material_manager
+from engine.components import MeshRenderer, Camera, Light, LightType, Rotate
+from engine.game_object import GameObject
+from engine.scene import Scene
+from engine.transform_store import TransformStore
+
+MAGIC = b"KSCN"
+VERSION = 2
+
+# magic, version, nr objects, nr components, nr assets, nr strings, string data size
+_HEADER = struct.Struct("<4sIIIIII")
+
+_COMPONENT_DTYPE = np.dtype([
+    ("object", "<u4"),
+    ("type", "<u2"),
+    ("enabled", "<u2"),
+    # strings or assets, depending on the type
+    ("refs", "<i4", (2,)),
+    ("params", "<f4", (8,)),
+])
+
+_ASSET_DTYPE = np.dtype([
+    ("hash", "V{}".format(asset_database.HASH_SIZE)),
+    ("kind", "<u4"),
+    ("path", "<u4"),
+    ("bounds", "<f4", (10,)),
+    # what static batching needs without loading the mesh (see asset_database.mesh_flags)
+    ("drawing_mode", "<u4"),
+    ("flags", "<u4"),
+])
+
+COMPONENT_MESH_RENDERER = 1
+COMPONENT_CAMERA = 2
+COMPONENT_LIGHT = 3
+COMPONENT_ROTATE = 4
+
+_TRANSFORM_SIZE = 10
+
+def save_scene(scene, path):
+    game_objects = _hierarchy_order(scene)
+    index = {game_object : i for i, game_object in enumerate(game_objects)}
+    nr_objects = len(game_objects)
+
+    parents = np.full(nr_objects, -1, dtype=np.int32)
+    flags = np.zeros(nr_objects, dtype=np.uint8)
+    transforms = np.zeros((nr_objects, _TRANSFORM_SIZE), dtype=np.float32)
+    strings = [game_object.name for game_object in game_objects]
+    for i, game_object in enumerate(game_objects):
+        transform = game_object.transform
+        if transform.parent is not None and transform.parent.game_object in index:
+            parents[i] = index[transform.parent.game_object]
+        flags[i] = 1 if game_object.static else 0
+        transforms[i, 0:3] = transform.local_position
+        transforms[i, 3:7] = transform.local_rotation
+        transforms[i, 7:10] = transform.local_scale
+
+    # strings and assets are shared by the components using them
+    string_ids = {}
+    def string_id(value):
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    assets = []
+    asset_ids = {}
+    # id(mesh) -> asset id. meshes are usually shared by many renderers
+    # and their reference can mean hashing the whole file they come from
+    mesh_asset_ids = {}
+    def asset_id(mesh):
+        if id(mesh) in mesh_asset_ids:
+            return mesh_asset_ids[id(mesh)]
+        kind, asset_hash, asset_path = _mesh_reference(mesh)
+        if asset_hash not in asset_ids:
+            asset_ids[asset_hash] = len(assets)
+            assets.append((
+                asset_hash, kind, string_id(asset_path), asset_database.mesh_bounds(mesh),
+                int(mesh.drawing_mode), asset_database.mesh_flags(mesh)
+            ))
+        mesh_asset_ids[id(mesh)] = asset_ids[asset_hash]
+        return asset_ids[asset_hash]
+
+    components = []
+    for i, game_object in enumerate(game_objects):
+        for component in game_object.components:
+            row = _component_row(component, string_id, asset_id)
+            if row is None:
+                print("scene file: skipping component {} of {}".format(type(component).__name__, game_object.name))
+                continue
+            component_type, refs, params = row
+            components.append((i, component_type, 1 if component.enabled else 0, refs, params))
+
+    component_array = np.zeros(len(components), dtype=_COMPONENT_DTYPE)
+    for row, (i, component_type, enabled, refs, params) in enumerate(components):
+        component_array[row]["object"] = i
+        component_array[row]["type"] = component_type
+        component_array[row]["enabled"] = enabled
+        component_array[row]["refs"][:len(refs)] = refs
+        component_array[row]["params"][:len(params)] = params
+
+    asset_array = np.zeros(len(assets), dtype=_ASSET_DTYPE)
+    for row, (asset_hash, kind, path_id, bounds, drawing_mode, mesh_flags) in enumerate(assets):
+        asset_array[row]["hash"] = asset_hash
+        asset_array[row]["kind"] = kind
+        asset_array[row]["path"] = path_id
+        asset_array[row]["bounds"] = bounds
+        asset_array[row]["drawing_mode"] = drawing_mode
+        asset_array[row]["flags"] = mesh_flags
+
+    encoded = [string.encode("utf-8") for string in strings]
+    string_offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+    string_offsets[1:] = np.cumsum([len(string) for string in encoded])
+    string_data = b"".join(encoded)
+
+    sections = [parents, flags, string_offsets, transforms, component_array, asset_array]
+    with open(path, "wb") as output_file:
+        output_file.write(_HEADER.pack(
+            MAGIC, VERSION, nr_objects, len(components), len(assets), len(strings), len(string_data)
+        ))
+        position = _HEADER.size
+        for section in sections:
+            position = _write_padding(output_file, position)
+            output_file.write(section.tobytes())
+            position = position + section.nbytes
+        _write_padding(output_file, position)
+        output_file.write(string_data)
+
+def load_scene(path, scene = None):
+    """
+    game objects of the scene file added to the given scene.
+    without a scene, a new one with a transform store big enough is created
+    """
+    # a single read for the whole file. the sections are views into it
+    with open(path, "rb") as input_file:
+        data = input_file.read()
+
+    # creating tens of thousands of objects keeps triggering the garbage collector,
+    # which goes through everything alive every time. nothing here creates garbage cycles
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _load_scene(path, data, scene)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+def _load_scene(path, data, scene):
+    magic, version, nr_objects, nr_components, nr_assets, nr_strings, strings_size = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise Exception("{} is not a scene file".format(path))
+    if version != VERSION:
+        raise Exception("scene file {} has version {} (expected {})".format(path, version, VERSION))
+
+    position = _HEADER.size
+    def section(dtype, count):
+        nonlocal position
+        position = _padded(position)
+        array = np.frombuffer(data, dtype=dtype, count=count, offset=position)
+        position = position + array.nbytes
+        return array
+
+    parents = section(np.int32, nr_objects)
+    flags = section(np.uint8, nr_objects)
+    string_offsets = section(np.uint32, nr_strings + 1).tolist()
+    transforms = section(np.float32, nr_objects * _TRANSFORM_SIZE).reshape(nr_objects, _TRANSFORM_SIZE)
+    components = section(_COMPONENT_DTYPE, nr_components)
+    assets = section(_ASSET_DTYPE, nr_assets)
+    string_data = data[_padded(position):_padded(position) + strings_size]
+    strings = [
+        string_data[string_offsets[i]:string_offsets[i + 1]].decode("utf-8")
+        for i in range(nr_strings)
+    ]
+
+    if scene is None:
+        scene = Scene(TransformStore(nr_objects))
+
+    game_objects = [GameObject(strings[i]) for i in range(nr_objects)]
+    object_transforms = [game_object.transform for game_object in game_objects]
+    # hierarchy links are set directly, the world data is computed later anyway
+    for child, parent in enumerate(parents.tolist()):
+        if parent >= 0:
+            object_transforms[child]._parent = object_transforms[parent]
+            object_transforms[parent].children.append(object_transforms[child])
+
+    # local data straight into the store arrays
+    if scene.transform_store is not None:
+        scene.transform_store.attach_many(
+            object_transforms, transforms[:, 0:3], transforms[:, 3:7], transforms[:, 7:10], parents
+        )
+    else:
+        for transform, values in zip(object_transforms, transforms.tolist()):
+            transform.local_position = pyrr.Vector3(values[0:3])
+            transform.local_rotation = np.array(values[3:7], dtype=np.float64)
+            transform.local_scale = pyrr.Vector3(values[7:10])
+
+    for i in np.flatnonzero(flags).tolist():
+        game_objects[i]._static = True
+
+    # meshes are only handles until they get drawn
+    handles = [
+        asset_database.get_handle(kind, bytes(asset_hash), strings[path_id], bounds, drawing_mode, flags)
+        for asset_hash, kind, path_id, bounds, drawing_mode, flags in zip(
+            assets["hash"].tolist(), assets["kind"].tolist(), assets["path"].tolist(), assets["bounds"].tolist(),
+            assets["drawing_mode"].tolist(), assets["flags"].tolist()
+        )
+    ]
+    materials = {}
+    # columns to python lists (much faster than going row by row through the structured array)
+    for i, component_type, enabled, refs, params in zip(
+            components["object"].tolist(),
+            components["type"].tolist(),
+            components["enabled"].tolist(),
+            components["refs"].tolist(),
+            components["params"].tolist()):
+        game_object = game_objects[i]
+        if component_type == COMPONENT_MESH_RENDERER:
+            material_name = strings[refs[1]]
+            if material_name not in materials:
+                materials[material_name] = material_manager.get_from_name(material_name)
+            component = game_object.add_component(MeshRenderer, handles[refs[0]], materials[material_name])
+            component.lod_bias = params[0]
+        elif component_type == COMPONENT_CAMERA:
+            component = game_object.add_component(Camera, params[3])
+            component.vfov = params[0]
+            component.near = params[1]
+            component.far = params[2]
+            component.clear_color = tuple(params[4:7])
+            component.occlusion_culling = params[7] != 0
+        elif component_type == COMPONENT_LIGHT:
+            component = game_object.add_component(Light, LightType(refs[0]))
+            component.color = tuple(params[0:3])
+            component.range = params[3]
+            component.intensity = params[4]
+        elif component_type == COMPONENT_ROTATE:
+            component = game_object.add_component(Rotate, params[0], pyrr.Vector3(params[1:4]))
+        else:
+            raise Exception("unknown component type {} in scene file {}".format(component_type, path))
+        component.enabled = enabled != 0
+
+    scene.add_game_objects(game_objects)
+    return scene
+
+# (type, refs, params) of the components we know how to save
+def _component_row(component, string_id, asset_id):
+    if isinstance(component, MeshRenderer):
+        refs = (asset_id(component.mesh), string_id(material_manager.get_name(component.material)))
+        return COMPONENT_MESH_RENDERER, refs, (component.lod_bias,)
+    if isinstance(component, Camera):
+        params = (
+            component.vfov, component.near, component.far, component.aspect_ratio,
+            *component.clear_color, 1.0 if component.occlusion_culling else 0.0
+        )
+        return COMPONENT_CAMERA, (), params
+    if isinstance(component, Light):
+        params = (*component.color, component.range, component.intensity)
+        return COMPONENT_LIGHT, (component.light_type.value,), params
+    if isinstance(component, Rotate):
+        return COMPONENT_ROTATE, (), (component.angular_speed, *component.axis)
+    return None
+
+# (kind, content hash, path) of the file the mesh comes from
+def _mesh_reference(mesh):
+    if isinstance(mesh, asset_database.MeshHandle):
+        return mesh.kind, mesh.hash, mesh.path
+    if asset_database.is_primitive(mesh):
+        name = type(mesh).__name__
+        return asset_database.ASSET_PRIMITIVE, asset_database.primitive_hash(name), name
+    source_file = getattr(mesh, "source_file", None)
+    if source_file is None:
+        raise Exception("meshes saved in scene files need to come from a file")
+    return asset_database.ASSET_MESH, asset_database.content_hash(source_file), source_file
+
+# game objects of the scene with parents before their children
+def _hierarchy_order(scene):
+    in_scene = set(scene.game_objects)
+    ordered = []
+    pending = [
+        game_object for game_object in reversed(scene.game_objects)
+        if game_object.transform.parent is None or game_object.transform.parent.game_object not in in_scene
+    ]
+    while len(pending) > 0:
+        game_object = pending.pop()
+        ordered.append(game_object)
+        for child in reversed(game_object.transform.children):
+            if child.game_object in in_scene:
+                pending.append(child.game_object)
+    return ordered
+
+def _padded(position):
+    return (position + 7) & ~7
+
+def _write_padding(output_file, position):
+    padded = _padded(position)
+    output_file.write(b"\0" * (padded - position))
+    return padded
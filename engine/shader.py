@@ -3,6 +3,18 @@ from OpenGL.GL.shaders import compileProgram, compileShader
 
 # for paths (python 3.5)
 from pathlib import PurePath
+import os
+import re
+
+from engine.frame_uniforms import FRAME_DATA_BINDING, FRAME_DATA_BLOCK
+from engine.light_clusters import CLUSTER_TEXTURE_UNITS
+
+# glsl doesn't have includes. we support the line
+# #include "some_file.glsl"
+# with paths relative to the shaders folder, so blocks shared by several
+# shaders (like the FrameData uniform block) are written only once
+SHADERS_DIR = "engine/shaders"
+_include_pattern = re.compile(r'^[ \t]*#include[ \t]+"([^"]+)"[ \t]*$', re.MULTILINE)
 
 class Shader:
 
@@ -21,6 +33,8 @@ class Shader:
         # we will save it for reloading
         self.vertex_file = vertex_file
         self.fragment_file = fragment_file
+        # files pulled in with #include (needed for reloading on changes)
+        self.included_files = []
 
         self._compile(vertex_src, fragment_src, *additional_shaders)
 
@@ -61,11 +75,48 @@ class Shader:
         # we should use an error shader
         # add try-catch!!
         # otherwise reloading shaders it's going to be useless
+        self.included_files = []
+        vertex_src = self._resolve_includes(vertex_src)
+        fragment_src = self._resolve_includes(fragment_src)
         vertex_shader = compileShader(vertex_src, gl.GL_VERTEX_SHADER)
         frag_shader = compileShader(fragment_src, gl.GL_FRAGMENT_SHADER)
         self.program = compileProgram(vertex_shader, frag_shader)
         self.dirty = False
 
+        # programs using the per frame data read it from the same uniform buffer
+        block_index = gl.glGetUniformBlockIndex(self.program, FRAME_DATA_BLOCK)
+        if block_index != gl.GL_INVALID_INDEX:
+            gl.glUniformBlockBinding(self.program, block_index, FRAME_DATA_BINDING)
+
+        # same for the light cluster buffers, always on the same texture units
+        for sampler, texture_unit in CLUSTER_TEXTURE_UNITS.items():
+            loc = gl.glGetUniformLocation(self.program, sampler)
+            if loc >= 0:
+                gl.glUseProgram(self.program)
+                gl.glUniform1i(loc, texture_unit)
+                gl.glUseProgram(0)
+
+        # which normals the vertex shader decodes (see include/vertex_decoding.glsl).
+        # uniforms start as 0 after linking
+        self.compressed_normals_loc = gl.glGetUniformLocation(self.program, "compressed_normals")
+        self.compressed_normals = False
+
+    # for meshes with compressed normals (see BaseMesh.compressed), the program has to be in use.
+    # uniform values stay with the program, so it's only set when it changes
+    def set_compressed_normals(self, compressed):
+        if self.compressed_normals_loc >= 0 and compressed != self.compressed_normals:
+            gl.glUniform1i(self.compressed_normals_loc, 1 if compressed else 0)
+            self.compressed_normals = compressed
+
+    def _resolve_includes(self, src):
+        def include(match):
+            path = os.path.join(SHADERS_DIR, match.group(1))
+            if path not in self.included_files:
+                self.included_files.append(path)
+            with open(path, 'r') as file:
+                return file.read()
+        return _include_pattern.sub(include, src)
+
     def reload(self):
         # if we have stored the file, read it again, and recreate the shader program
         if (self.vertex_file is not None and self.fragment_file is not None):
@@ -87,6 +138,10 @@ class Shader:
             if (path.endswith(vertex.name) or path.endswith(fragment.name)):
                 return True
 
+        for included_file in self.included_files:
+            if path.endswith(PurePath(included_file).name):
+                return True
+
         return False
 
 
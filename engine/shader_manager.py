@@ -88,6 +88,10 @@ _shaders = {} # key is the numeric id
 _dirty = {}
 _mutex = threading.Lock()
 
+# shader name -> name of the shader doing the same but reading
+# the model matrix per instance (used for gpu instancing)
+_instanced_variants = {}
+
 def get_from_name(name:str):
     global _name_to_id
     if name in _name_to_id:
@@ -108,8 +112,14 @@ def get_instance_from_name(name:str):
         alias = name + str(_nr_shaders + 1)
         files = template_shader.files()
         shader = _load_shader(alias, *files)
+        # instances remember what shader they come from
+        shader.template_name = name
         return shader
 
+def get_instanced_variant_name(shader):
+    """ name of the instanced version of the given shader (None if there is none) """
+    return _instanced_variants.get(getattr(shader, "template_name", None))
+
 def get_from_id(shader_id:int):
     global _shaders
     if shader_id in _shaders:
@@ -285,6 +295,51 @@ def _load_shaders():
         "engine/shaders/fragment/phong_texture_uniform_color.glsl"
     )
 
+    # phong lit by many point lights (clustered forward, see light_clusters.py)
+    _load_shader(
+        "phong_uniform_color_clustered",
+        "engine/shaders/vertex/mvp_light_clustered.glsl",
+        "engine/shaders/fragment/phong_uniform_color_clustered.glsl"
+    )
+
+    _load_shader(
+        "phong_texture_uniform_color_clustered",
+        "engine/shaders/vertex/mvp_light_clustered_uv.glsl",
+        "engine/shaders/fragment/phong_texture_uniform_color_clustered.glsl"
+    )
+
+    # instanced versions (the model matrix comes per instance from a vbo)
+    # see instanced_renderer.py
+    _load_instanced_variant(
+        "mvp_flat_color",
+        "engine/shaders/vertex/simple_mvp_instanced.glsl",
+        "engine/shaders/fragment/flat_color.glsl"
+    )
+
+    _load_instanced_variant(
+        "mvp_flat_color_uniform",
+        "engine/shaders/vertex/simple_mvp_instanced.glsl",
+        "engine/shaders/fragment/flat_color_uniform.glsl"
+    )
+
+    _load_instanced_variant(
+        "mvp_time_color",
+        "engine/shaders/vertex/simple_mvp_instanced.glsl",
+        "engine/shaders/fragment/flat_time_color.glsl"
+    )
+
+    _load_instanced_variant(
+        "flat_color_diffuse",
+        "engine/shaders/vertex/mvp_light_instanced.glsl",
+        "engine/shaders/fragment/flat_color_diffuse.glsl"
+    )
+
+    _load_instanced_variant(
+        "mvp_light_direction_color",
+        "engine/shaders/vertex/mvp_light_instanced.glsl",
+        "engine/shaders/fragment/light_direction.glsl"
+    )
+
     # watchdog stuff
     # afet loading the shaders, we initialize the watchdog event handler
     # do i need event_handler to be in the global scope?
@@ -309,6 +364,7 @@ def _load_shader(alias, *files):
 
     if alias not in _name_to_id:
         shader = Shader.from_file(*files)
+        shader.template_name = alias
         shader_id = _nr_shaders
         _id_to_name[shader_id] = alias
         _name_to_id[alias] = shader_id
@@ -318,6 +374,11 @@ def _load_shader(alias, *files):
     else:
         raise ArgumentError("shader alias {} already defined".format(alias))
 
+def _load_instanced_variant(name, *files):
+    alias = name + "_instanced"
+    _load_shader(alias, *files)
+    _instanced_variants[name] = alias
+
 def _update_dirty(shader_id, value):
     _mutex.acquire()
     _dirty[shader_id] = value
@@ -13,7 +13,8 @@ out vec4 out_color;
 // uniform vec3 color;
 // uniform sampler2D texture0;
 // uniform sampler2D texture1;
-uniform vec3 _light_color;
+// _light_color comes from the FrameData block
+#include "include/frame_data.glsl"
 
 // how much the surface reflect the incomming light
 uniform float reflectivity = 1.0f;  
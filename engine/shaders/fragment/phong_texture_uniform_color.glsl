@@ -10,7 +10,8 @@ out vec4 out_color;
 uniform sampler2D texture0;
 uniform vec3 color;
 // hidden
-uniform vec3 _light_color;
+// _light_color comes from the FrameData block
+#include "include/frame_data.glsl"
 
 uniform float slider_0_1_ambient_strength = 0.1f;
 uniform float slider_0_1_reflectivity = 1.0f;  
@@ -14,7 +14,8 @@ out vec4 out_color;
 // uniform sampler2D texture1;
 uniform vec3 color;
 // if uniform starts with '_' is hidden
-uniform vec3 _light_color;
+// _light_color comes from the FrameData block
+#include "include/frame_data.glsl"
 
 // thinking how we can add decorators
 // for uniforms
@@ -0,0 +1,47 @@
+#version 330
+
+// phong_uniform_color.glsl lit by the main (directional) light
+// plus the point lights of the fragment's cluster
+in vec3 v2f_to_light_ws;
+in vec3 v2f_normal_ws;
+in vec3 v2f_to_cam_ws;
+in vec3 v2f_position_ws;
+
+out vec4 out_color;
+
+uniform vec3 color;
+// hidden
+#include "include/frame_data.glsl"
+#include "include/light_clusters.glsl"
+
+uniform float slider_0_1_ambient_strength = 0.1f;
+uniform float slider_0_1_reflectivity = 1.0f;
+uniform float slider_1_32_shine_damper = 32.0f; // [1,32]
+
+void main()
+{
+    // alias
+    float shine_damper = slider_1_32_shine_damper;
+    float reflectivity = slider_0_1_reflectivity;
+    float ambient_strength = slider_0_1_ambient_strength;
+
+    vec3 normal_ws = normalize(v2f_normal_ws);
+    vec3 to_cam_ws = normalize(v2f_to_cam_ws);
+
+    // ambient light
+    vec3 ambient_light = ambient_strength * _light_color;
+
+    // main light. point lights (including the main one) come from the clusters
+    vec3 main_light = vec3(0);
+    if (_light_pos.w == 0)
+    {
+        float brightness = max(dot(v2f_to_light_ws, normal_ws), 0.0);
+        vec3 reflected_ray = reflect(-v2f_to_light_ws, normal_ws);
+        float specular_factor = pow(max(dot(reflected_ray, to_cam_ws), 0), shine_damper);
+        main_light = (brightness + reflectivity * specular_factor) * _light_color;
+    }
+
+    vec3 point_lights = clustered_point_lights(v2f_position_ws, normal_ws, to_cam_ws, reflectivity, shine_damper);
+
+    out_color = vec4((ambient_light + main_light + point_lights) * color, 1);
+}
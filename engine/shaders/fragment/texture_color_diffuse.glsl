@@ -9,7 +9,8 @@ in vec2 v2f_uv;
 out vec4 out_color;
 
 uniform sampler2D texture0;
-uniform vec3 _light_color;
+// _light_color comes from the FrameData block
+#include "include/frame_data.glsl"
 
 void main()
 {
@@ -0,0 +1,24 @@
+// per frame data shared by all shader programs.
+// it's uploaded once per camera by the scene into a uniform buffer object
+// bound to binding point 0 (see frame_uniforms.py).
+// the layout is std140, so the offsets are fixed:
+//   _view              0
+//   _projection        64
+//   _view_projection   128
+//   _camera_pos        192 (vec3 takes 16 bytes)
+//   _light_pos         208 (w = 0 directional, w = 1 point)
+//   _light_color       224
+//   _clip_planes       240 (near, far)
+//   _cluster_grid      256 (nr of light clusters along x, y, z. see light_clusters.glsl)
+// keep it in sync with FrameUniforms.update
+layout(std140) uniform FrameData
+{
+    mat4 _view;
+    mat4 _projection;
+    mat4 _view_projection;
+    vec3 _camera_pos;
+    vec4 _light_pos;
+    vec3 _light_color;
+    vec4 _clip_planes;
+    vec4 _cluster_grid;
+};
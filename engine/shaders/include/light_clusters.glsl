@@ -0,0 +1,58 @@
+// point lights binned into clusters of the view frustum (see light_clusters.py).
+// needs frame_data.glsl included before.
+// the cluster of a fragment comes from its screen tile and its depth slice,
+// so every fragment only goes through the lights that can reach it.
+
+// 2 texels per light: (position ws, range) and (color, intensity)
+uniform samplerBuffer _point_lights;
+// per cluster: offset and count into _cluster_light_indices
+uniform usamplerBuffer _cluster_ranges;
+uniform usamplerBuffer _cluster_light_indices;
+
+int cluster_index(vec3 position_ws)
+{
+    ivec3 grid = ivec3(_cluster_grid.xyz);
+
+    vec4 position_cs = _view_projection * vec4(position_ws, 1);
+    vec2 ndc = position_cs.xy / position_cs.w;
+    ivec2 tile = clamp(ivec2(floor((ndc * 0.5 + 0.5) * vec2(grid.xy))), ivec2(0), grid.xy - 1);
+
+    // depth slices are exponential between the near and far planes
+    float near_plane = _clip_planes.x;
+    float far_plane = _clip_planes.y;
+    float depth = -(_view * vec4(position_ws, 1)).z;
+    int slice = int(floor(log(depth / near_plane) / log(far_plane / near_plane) * float(grid.z)));
+    slice = clamp(slice, 0, grid.z - 1);
+
+    return (slice * grid.y + tile.y) * grid.x + tile.x;
+}
+
+// diffuse + specular contribution of the point lights of the cluster
+vec3 clustered_point_lights(vec3 position_ws, vec3 normal_ws, vec3 to_cam_ws, float reflectivity, float shine_damper)
+{
+    uvec2 range = texelFetch(_cluster_ranges, cluster_index(position_ws)).xy;
+
+    vec3 result = vec3(0);
+    for (uint i = 0u; i < range.y; i++)
+    {
+        int light = int(texelFetch(_cluster_light_indices, int(range.x + i)).x);
+        vec4 position_range = texelFetch(_point_lights, 2 * light);
+        vec4 color_intensity = texelFetch(_point_lights, 2 * light + 1);
+
+        vec3 to_light = position_range.xyz - position_ws;
+        float light_distance = length(to_light);
+        to_light = to_light / max(light_distance, 0.0001);
+
+        // smooth falloff that reaches 0 at the light range
+        float falloff = clamp(1.0 - pow(light_distance / position_range.w, 2.0), 0.0, 1.0);
+        falloff = falloff * falloff;
+        vec3 light_color = color_intensity.rgb * color_intensity.a * falloff;
+
+        float brightness = max(dot(to_light, normal_ws), 0.0);
+        vec3 reflected_ray = reflect(-to_light, normal_ws);
+        float specular_factor = pow(max(dot(reflected_ray, to_cam_ws), 0.0), shine_damper);
+
+        result += (brightness + reflectivity * specular_factor) * light_color;
+    }
+    return result;
+}
@@ -0,0 +1,24 @@
+// decoding of compressed vertex attributes (see vertex_layout.py).
+// positions (half floats), uvs (unorm16) and colors (unorm8) get converted
+// to floats by the vertex fetch itself, only normals need some work here.
+//
+// compressed meshes have no 'normal' attribute but 'normal_oct':
+// the normal mapped to a point in the octahedron |x| + |y| + |z| = 1,
+// whose lower half is folded over the upper one so it fits in a square (2 snorm8 values).
+// which one the mesh has is told by compressed_normals, set per draw by the scene
+// (see Shader.set_compressed_normals). it's 0 unless set, so other meshes read 'normal'
+layout(location=8) in vec2 normal_oct;
+uniform int compressed_normals;
+
+vec3 decode_normal(vec3 normal)
+{
+    if (compressed_normals == 0) {
+        return normal;
+    }
+    vec3 n = vec3(normal_oct, 1.0 - abs(normal_oct.x) - abs(normal_oct.y));
+    // unfold the lower half
+    float t = max(-n.z, 0.0);
+    n.x += n.x >= 0.0 ? -t : t;
+    n.y += n.y >= 0.0 ? -t : t;
+    return normalize(n);
+}
@@ -0,0 +1,39 @@
+#version 330
+
+// same as mvp_light_camera_uv.glsl but it also forwards the world space position.
+// the fragment shader needs it to find its light cluster (see light_clusters.glsl)
+layout(location=0) in vec3 pos;
+layout(location=1) in vec2 uv;
+layout(location=2) in vec3 normal;
+// compressed normals come in another attribute (see vertex_layout.py)
+#include "include/vertex_decoding.glsl"
+
+// only the model matrix is per object.
+// camera and light data come from the FrameData block
+uniform mat4 model;
+#include "include/frame_data.glsl"
+
+out vec3 v2f_to_light_ws;   // ws vector representing direction to the main light
+out vec3 v2f_normal_ws;     // ws normal
+out vec3 v2f_to_cam_ws;
+out vec3 v2f_position_ws;
+out vec2 v2f_uv;
+
+void main()
+{
+    vec3 position_ws = (model * vec4(pos, 1)).xyz;
+    gl_Position = _view_projection * vec4(position_ws, 1);
+
+    v2f_normal_ws = normalize((model * vec4(decode_normal(normal), 0)).xyz);
+    v2f_position_ws = position_ws;
+    v2f_uv = uv;
+
+    // directional light (light_pos.w = 0): same direction for all vertices
+    // point light (light_pos.w = 1): from the surface to the light source
+    if (_light_pos.w == 0)
+        v2f_to_light_ws = -_light_pos.xyz;
+    else
+        v2f_to_light_ws = normalize(_light_pos.xyz - position_ws);
+
+    v2f_to_cam_ws = normalize(_camera_pos - position_ws);
+}
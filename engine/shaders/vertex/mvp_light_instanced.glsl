@@ -0,0 +1,35 @@
+#version 330
+
+// instanced version of mvp_light.glsl
+// by specifying layout, we don't need to query for location (but we need to know this order)
+layout(location=0) in vec3 pos;
+layout(location=2) in vec3 normal;
+// compressed normals come in another attribute (see vertex_layout.py)
+#include "include/vertex_decoding.glsl"
+// per instance model matrix (it takes locations 4 to 7, one per column).
+// it comes from the instance vbo and advances once per instance (divisor = 1)
+layout(location=4) in mat4 instance_model;
+
+// mvp = view_projection * model. the model part is now per instance
+#include "include/frame_data.glsl"
+
+// a light shader needs to forward the direction to the light source
+// and the normal of the vertex
+out vec3 v2f_to_light_ws;   // ws vector representing direction to light
+out vec3 v2f_normal_ws;    // ws normal
+
+void main()
+{
+    vec4 position_ws = instance_model * vec4(pos, 1);
+    gl_Position = _view_projection * position_ws;
+
+    vec3 transformed_normal = (instance_model * vec4(decode_normal(normal), 0)).xyz;
+    v2f_normal_ws = normalize(transformed_normal);
+
+    // directional light (light_pos.w = 0): same direction for all vertices
+    // point light (light_pos.w = 1): from the surface to the light source
+    if (_light_pos.w == 0)
+        v2f_to_light_ws = -_light_pos.xyz;
+    else
+        v2f_to_light_ws = normalize(_light_pos.xyz - position_ws.xyz);
+}
@@ -4,12 +4,14 @@
 layout(location=0) in vec3 pos;
 // layout(location=1) in vec2 uv;
 layout(location=2) in vec3 normal;
+// compressed normals come in another attribute (see vertex_layout.py)
+#include "include/vertex_decoding.glsl"
 // layout(location=3) in vec3 color;
 
-uniform mat4 mvp;
+// only the model matrix is per object.
+// camera and light data come from the FrameData block
 uniform mat4 model;
-uniform vec4 _light_pos;
-uniform vec3 _camera_pos;
+#include "include/frame_data.glsl"
 
 // out vec3 v2f_color;
 // out vec2 v2f_uv;
@@ -23,9 +25,9 @@ out vec3 v2f_to_cam_ws;
 void main()
 {
     // gl_Position = rot * vec4(pos, 1);
-    gl_Position = mvp * vec4(pos, 1);
+    gl_Position = _view_projection * model * vec4(pos, 1);
 
-    vec3 transformed_normal = (model * vec4(normal, 0)).xyz;
+    vec3 transformed_normal = (model * vec4(decode_normal(normal), 0)).xyz;
     vec3 position_ws = (model * vec4(pos,1)).xyz;
     v2f_normal_ws = normalize(transformed_normal);
 
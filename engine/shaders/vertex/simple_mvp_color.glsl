@@ -5,14 +5,17 @@ layout(location=0) in vec3 pos;
 // layout(location=1) in vec2 uv;
 layout(location=3) in vec3 color;
 
-uniform mat4 mvp;
+// only the model matrix is per object.
+// camera and light data come from the FrameData block
+uniform mat4 model;
+#include "include/frame_data.glsl"
 out vec3 v2f_color;
 // out vec2 v2f_uv;
 
 void main()
 {
     // gl_Position = rot * vec4(pos, 1);
-    gl_Position = mvp * vec4(pos, 1);
+    gl_Position = _view_projection * model * vec4(pos, 1);
     v2f_color = color;
     // v2f_uv = uv;
 }
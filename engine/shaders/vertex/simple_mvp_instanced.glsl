@@ -0,0 +1,16 @@
+#version 330
+
+// instanced version of simple_mvp.glsl
+// by specifying layout, we don't need to query for location (but we need to know this order)
+layout(location=0) in vec3 pos;
+// per instance model matrix (it takes locations 4 to 7, one per column).
+// it comes from the instance vbo and advances once per instance (divisor = 1)
+layout(location=4) in mat4 instance_model;
+
+// mvp = view_projection * model. the model part is now per instance
+#include "include/frame_data.glsl"
+
+void main()
+{
+    gl_Position = _view_projection * instance_model * vec4(pos, 1);
+}
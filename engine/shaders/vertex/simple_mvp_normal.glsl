@@ -4,9 +4,15 @@
 layout(location=0) in vec3 pos;
 layout(location=1) in vec2 uv;
 layout(location=2) in vec3 normal;
+// compressed normals come in another attribute (see vertex_layout.py)
+#include "include/vertex_decoding.glsl"
 // layout(location=3) in vec3 color;
 
-uniform mat4 mvp;
+// only the model matrix is per object.
+// camera and light data come from the FrameData block
+uniform mat4 model;
+#include "include/frame_data.glsl"
+
 // out vec3 v2f_color;
 
 // NOTE:
@@ -19,12 +25,12 @@ out vec3 v2f_normal;
 void main()
 {
     // gl_Position = rot * vec4(pos, 1);
-    gl_Position = mvp * vec4(pos, 1);
+    gl_Position = _view_projection * model * vec4(pos, 1);
     // v2f_color = color;
 
     // we are passing the unmodified normal to the fragment shader
     // (without using the model matrix)
     // just because we are going to "draw" using that raw color
-    v2f_normal = normal;
+    v2f_normal = decode_normal(normal);
 }
 
@@ -4,18 +4,22 @@
 layout(location=0) in vec3 pos;
 // layout(location=1) in vec2 uv;
 layout(location=2) in vec3 normal;
+// compressed normals come in another attribute (see vertex_layout.py)
+#include "include/vertex_decoding.glsl"
 // layout(location=3) in vec3 color;
 
-uniform mat4 mvp;
+// only the model matrix is per object.
+// camera and light data come from the FrameData block
 uniform mat4 model;
+#include "include/frame_data.glsl"
 out vec3 v2f_color;
 // out vec2 v2f_uv;
 
 void main()
 {
     // gl_Position = rot * vec4(pos, 1);
-    gl_Position = mvp * vec4(pos, 1);
-    vec3 transformed_normal = (model * vec4(normal, 0)).xyz;
+    gl_Position = _view_projection * model * vec4(pos, 1);
+    vec3 transformed_normal = (model * vec4(decode_normal(normal), 0)).xyz;
 
     // NOTE: this only work when we have uniform scaling!
     transformed_normal = normalize(transformed_normal);
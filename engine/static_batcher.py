@@ -0,0 +1,123 @@
+# static batching.
+# game objects flagged as static are not supposed to move once the scene is loaded,
+# so there is no need to draw them one by one with their own model matrix.
+# the renderers of static game objects sharing the same material are baked
+# into combined meshes with their vertices already in world space.
+# to keep culling useful, they are not merged into a single huge mesh per material,
+# but into one mesh per material and per chunk (cell of a regular grid in world space).
+# each batch is drawn as any other renderer but with an identity model matrix.
+
+# only triangle meshes are batched (lines and points keep their own draws)
+# and only with other meshes having the same vertex attributes and compression.
+
+import numpy as np
+import OpenGL.GL as gl
+
+from engine.base_mesh import BaseMesh
+from engine.components import MeshRenderer
+from engine.components.mesh_renderer import release_vaos
+from engine.game_object import GameObject
+
+# size of the world space cells used to split the batches
+DEFAULT_CHUNK_SIZE = 20.0
+
+_attrib_names = ("pos", "uv", "normal", "color")
+
+# renderer -> key of the batch it belongs to (or None if it can't be batched)
+def batch_key(renderer, chunk_size):
+    mesh = renderer.mesh
+    # meshes without cpu data can not be baked
+    if mesh.drawing_mode != gl.GL_TRIANGLES or not mesh.has_cpu_data:
+        return None
+    layout = tuple(mesh.has_attrib(name) for name in _attrib_names)
+    aabb_min, aabb_max = renderer.world_bounds()
+    chunk = tuple(np.floor((aabb_min + aabb_max) / 2 / chunk_size).astype(int))
+    return (renderer.material, layout, mesh.compressed, chunk)
+
+# meshes and their model matrices -> attribute arrays and indices of a single mesh in world space
+# (the meshes are expected to share the same attributes)
+def combine_meshes(meshes, model_matrices):
+    combined = {name : [] for name in _attrib_names}
+    indices = []
+    base_vertex = 0
+    for mesh, model_mat in zip(meshes, model_matrices):
+        model_mat = np.asarray(model_mat, dtype=np.float64)
+        # row vectors (pyrr's convention): translation in the last row
+        linear = model_mat[:3, :3]
+        positions = mesh.attrib_array("pos") @ linear + model_mat[3, :3]
+        combined["pos"].append(positions)
+        if mesh.has_attrib("normal"):
+            # normals need the inverse transpose to stay perpendicular with non uniform scaling
+            normals = mesh.attrib_array("normal") @ np.linalg.inv(linear).T
+            lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+            combined["normal"].append(normals / np.maximum(lengths, 1e-12))
+        for name in ("uv", "color"):
+            if mesh.has_attrib(name):
+                combined[name].append(mesh.attrib_array(name))
+
+        if mesh.indexed_drawing:
+            indices.append(mesh.indices.astype(np.int64) + base_vertex)
+        else:
+            indices.append(np.arange(mesh.nr_vertices) + base_vertex)
+        base_vertex = base_vertex + mesh.nr_vertices
+
+    result = {}
+    for name in _attrib_names:
+        if len(combined[name]) > 0:
+            result[name] = np.concatenate(combined[name]).astype(np.float32)
+        else:
+            result[name] = None
+    return result, np.concatenate(indices).astype(np.uint32)
+
+class StaticBatch:
+
+    def __init__(self, material, renderers, compressed = False):
+        # the original renderers (they are not drawn while batched)
+        self.renderers = renderers
+
+        attribs, indices = combine_meshes(
+            [renderer.mesh for renderer in renderers],
+            [renderer.game_object.transform.model_mat for renderer in renderers]
+        )
+        self.mesh = BaseMesh(
+            attribs["pos"],
+            uvs = attribs["uv"],
+            normals = attribs["normal"],
+            colors = attribs["color"],
+            indices = indices,
+            compressed = compressed
+        )
+
+        # batches are drawn by the render queue as any other renderer.
+        # the game object only provides an identity transform (it's not part of the scene hierarchy)
+        self.game_object = GameObject("static batch")
+        self.renderer = self.game_object.add_component(MeshRenderer, self.mesh, material)
+
+    # batches get rebuilt when static objects change, free the gpu memory of the old ones
+    def release(self):
+        release_vaos(self.mesh)
+        gl.glDeleteBuffers(1, [self.mesh.vbo])
+        if self.mesh.indexed_drawing:
+            gl.glDeleteBuffers(1, [self.mesh.ebo])
+
+def build_static_batches(renderers, chunk_size = DEFAULT_CHUNK_SIZE):
+    """ static renderers -> (batches, renderers that could not be batched) """
+    groups = {}
+    unbatched = []
+    for renderer in renderers:
+        key = batch_key(renderer, chunk_size)
+        if key is None:
+            unbatched.append(renderer)
+            continue
+        if key not in groups:
+            groups[key] = []
+        groups[key].append(renderer)
+
+    batches = []
+    for key, group in groups.items():
+        # a single renderer doesn't save any draw call
+        if len(group) < 2:
+            unbatched.extend(group)
+            continue
+        batches.append(StaticBatch(key[0], group, key[2]))
+    return batches, unbatched
@@ -7,6 +7,7 @@ _name_to_id = {}
 _textures = {} # key is the numeric id
 
 from engine.texture import Texture
+from engine import asset_database
 
 def init():
     _create_textures()
@@ -50,10 +51,11 @@ def get_texture_id_by_ref(ref_texture):
     return None
 
 def _create_textures():
-    texture1 = Texture.from_image("img/ash_uvgrid01.jpg")
-    texture2 = Texture.from_image("img/wall.jpg")
-    texture3 = Texture.from_image("img/awesomeface.png")
-    texture4 = Texture.from_image("img/ImphenziaPalette02-Albedo.png")
+    # handles only. images are read the first time the textures get bound (see asset_database.py)
+    texture1 = asset_database.texture_handle("img/ash_uvgrid01.jpg")
+    texture2 = asset_database.texture_handle("img/wall.jpg")
+    texture3 = asset_database.texture_handle("img/awesomeface.png")
+    texture4 = asset_database.texture_handle("img/ImphenziaPalette02-Albedo.png")
 
     _add_texture_to_database("uv_grid",         texture1)
     _add_texture_to_database("wall",            texture2)
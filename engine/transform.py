@@ -1,13 +1,85 @@
 import pyrr
 import math
 import numpy as np
-import sys, traceback
+
+import engine.math
 
 # reading about the constraints of quaternions,
 # in the unity website they are saying quaternions can not represent a rotation beyond 180 degrees.
 # why?
 # https://docs.unity3d.com/Manual/QuaternionAndEulerRotationsInUnity.html
 
+# initial values of new transforms. copying an array is much cheaper than
+# building a new one from a list (it matters when loading big scenes)
+_ZERO = pyrr.Vector3([0, 0, 0])
+_ONE = pyrr.Vector3([1, 1, 1])
+_RIGHT = pyrr.Vector3([1, 0, 0])
+_UP = pyrr.Vector3([0, 1, 0])
+_FORWARD = pyrr.Vector3([0, 0, 1])
+_IDENTITY_QUATERNION = np.array([1, 0, 0, 0], dtype=np.float64)
+_IDENTITY = np.identity(4, dtype=np.float32)
+
+# change notifications.
+# systems that cache something about where objects are (spatial indices, culling, etc)
+# can subscribe a callback instead of polling model_dirty on every transform every frame.
+# every scene has its own TransformChanges and points the transforms of its game objects to it.
+# once per frame (see flush), callbacks get the list of transforms that changed,
+# i.e the roots of the subtrees that moved (their descendants moved with them).
+# transforms outside of a scene or without subscribers record nothing.
+class TransformChanges:
+
+    def __init__(self):
+        self.subscribers = []
+        self._moved = []
+        # goes up every time one of our transforms moves (reported or not yet).
+        # lets data built from world matrices know whether it's still valid
+        self.version = 0
+
+    # callback(moved) gets called with a list of transforms
+    def subscribe(self, callback):
+        if callback not in self.subscribers:
+            self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+        if len(self.subscribers) == 0:
+            self._discard_moved()
+
+    # called once per frame (by the scene, after updating the components).
+    # if a transform and one of its ancestors both changed, only the ancestor
+    # is reported since the whole subtree moved anyway
+    def flush(self):
+        if len(self._moved) == 0:
+            return
+        moved = []
+        for transform in self._moved:
+            ancestor = transform._parent
+            while ancestor is not None and not (ancestor._queued and ancestor._changes is self):
+                ancestor = ancestor._parent
+            if ancestor is None:
+                moved.append(transform)
+        self._discard_moved()
+        for callback in list(self.subscribers):
+            callback(moved)
+
+    def _queue(self, transform):
+        self.version = self.version + 1
+        if len(self.subscribers) > 0 and not transform._queued:
+            transform._queued = True
+            self._moved.append(transform)
+
+    # for transforms leaving the scene
+    def _forget(self, transform):
+        if transform._queued and transform._changes is self:
+            self._moved.remove(transform)
+            transform._queued = False
+
+    def _discard_moved(self):
+        for transform in self._moved:
+            transform._queued = False
+        self._moved = []
+
 class Transform:
 
     # clients don't set matrices
@@ -23,14 +95,20 @@ class Transform:
         # internal local data
         # we don't want users to set values directly so we make them private.
         # public method, apart of updating local values will also dirty some flags
-        self._local_position = pos if pos is not None else pyrr.Vector3([0, 0, 0])
+        self._local_position = pos if pos is not None else _ZERO.copy()
         # if we are not going to keep track of euler angles, maybe we should not store them
         # self._local_euler_angles = euler_angles if euler_angles is not None else pyrr.Vector3([0, 0, 0])
         # identity quaternion = (1,0,0,0)
         # note that the identity quaternion is the resulting quaternion after applying cos/sin etc.
         # to get it, we multiply the rotations obtained from 0 degrees along x direction; 0 along y and 0 along z
-        self._local_rotation = Transform.quaternion_from_euler(euler_angles)  if euler_angles is not None else [1, 0, 0, 0]
-        self._local_scale = scale if scale is not None else pyrr.Vector3([1, 1, 1])
+        # we keep it as a numpy array so we can update it in place (see rotate)
+        if euler_angles is not None:
+            self._local_rotation = np.array(Transform.quaternion_from_euler(euler_angles), dtype=np.float64)
+        else:
+            self._local_rotation = _IDENTITY_QUATERNION.copy()
+        self._local_scale = scale if scale is not None else _ONE.copy()
+        # z angle given by local_euler_angles last time (used when it's not unique)
+        self._last_euler_z = 0.0
 
         # internal matrices for individual affine transformations
         # these are LOCAL matrices.
@@ -57,8 +135,29 @@ class Transform:
         # local versions. do we actually need to local view??
         self._local_model_dirty = True
         self._local_view_dirty = True
-
-        self._ws_position_needs_update = True
+        # preallocated. they are updated in place (see _update_local_matrices)
+        self._local_model_mat = _IDENTITY.copy()
+        self._local_view_mat = _IDENTITY.copy()
+
+        # world data (model, view, position) depend on the whole chain of parents.
+        # rather than walking up the hierarchy every time we want to know if they are dirty,
+        # whenever our local values change we bump our version and push the change
+        # to our descendants (see _invalidate_world).
+        # every cached world value remembers the version it was calculated with,
+        # so checking if it's dirty is just comparing two ints.
+        # other classes (like the camera) can do the same using the 'version' property.
+        self._version = 0
+        self._model_version = -1
+        self._view_version = -1
+        self._position_version = -1
+        self._rotation_version = -1
+        self._directions_version = -1
+        # True while none of our world values was recalculated since the last change
+        self._stale = True
+        # TransformChanges we report to (the one of our scene, see Scene.add_game_object)
+        self._changes = None
+        # True while we are in its list of moved transforms waiting to be notified
+        self._queued = False
 
         # directions
         # in unity they read/write but let's make them read-only for the moment.
@@ -77,14 +176,24 @@ class Transform:
         # self._right_dirty = True
         # self._up_dirty = True
         # self._forward_dirty = True
-        # self.right = pyrr.Vector3([1, 0, 0])
-        # self.up = pyrr.Vector3([0, 1, 0])
-        # self.forward = pyrr.Vector3([0, 0, 1])
+        # UPDATE: they are cached together with the same version counter
+        # as the model matrix (see _update_directions)
+        self._right = _RIGHT.copy()
+        self._up = _UP.copy()
+        self._forward = _FORWARD.copy()
+        # final rotation (quaternion) cached in the same way
+        self._rotation = [1, 0, 0, 0]
 
         # adding support to traverse the tree hierarchy:
-        self.parent = None
+        self._parent = None
         self.children = []
 
+        # optional structure of arrays storage (see transform_store.py).
+        # when attached, our local data are views into the store arrays
+        # and matrices are calculated by the store in batches.
+        self._store = None
+        self._slot = None
+
     # internal getters
     @property
     def position(self):
@@ -92,10 +201,15 @@ class Transform:
         # or if we are going to calculate it every time using "updated" values
         # for now, let's go for the second -> working on that now
         # how expensive is to 'get' the parent model_mat? should we also cache it?
-        if self._position_dirty: # this is now checking for the parent and the changes in local_pos
+        if self._store is not None:
+            # world position is the translation part of the model matrix
+            # (last row in pyrr's convention)
+            return pyrr.Vector3(self.model_mat[3, :3])
+        if self._position_dirty:
             parent_model_matrix = self.parent.model_mat if self.parent is not None else pyrr.matrix44.create_identity()
             self._position = pyrr.Vector3(pyrr.matrix44.apply_to_vector(parent_model_matrix, self._local_position))
-            self._ws_position_needs_update = False
+            self._position_version = self._version
+            self._mark_fresh()
         return self._position
         # it's more convenient to return a pyrr.Vector3 object so we can access x,y,z
         # the problem here is we are creating a new object every time we read this value
@@ -106,11 +220,16 @@ class Transform:
     @property
     def _position_dirty(self):
         # global position depends on the parent's model matrix * local position vector.
-        # _local_position has always the right value
-        # therefore, we just need to check for parent model matrix dirty "flag" (property)
-        parent_dirty = self.parent.model_dirty if self.parent is not None else False
-        # we also need a mechanism to know if the _local_positon was changed or not
-        return parent_dirty or self._ws_position_needs_update
+        # changes in any of them bump our version
+        return self._position_version != self._version
+
+    # generation counter of our world transform.
+    # it changes every time our local values or the ones of any of our ancestors change.
+    # clients caching something that depends on this transform can keep the version
+    # they used and compare it later (and then read the up to date values through the properties)
+    @property
+    def version(self):
+        return self._version
 
 
     # in which cases we would like to get the rotation (in quaternion) of a gameObject?
@@ -123,8 +242,19 @@ class Transform:
     def rotation(self):
         # same as for position we will return local one for now
         # return self.local_rotation
-        parent_rotation = self.parent.rotation if self.parent is not None else [1, 0, 0, 0] # identity quaternion
-        return Transform.quaternion_multiply(parent_rotation, self._local_rotation)
+        # it's cached until our version changes (our local rotation or any parent changed).
+        # parents cache their own, so we don't multiply the whole chain every time
+        if self._rotation_dirty_world:
+            parent_rotation = self.parent.rotation if self.parent is not None else [1, 0, 0, 0] # identity quaternion
+            self._rotation = Transform.quaternion_multiply(parent_rotation, self._local_rotation)
+            self._rotation_version = self._version
+            self._mark_fresh()
+        return self._rotation
+
+    # _rotation_dirty is already taken by the local rotation matrix
+    @property
+    def _rotation_dirty_world(self):
+        return self._rotation_version != self._version
 
     # when are we actually supposed to get final 'scale'??
     # unity doesn't return this value because it's not always right to reprenset final
@@ -136,6 +266,10 @@ class Transform:
     #     # same as for position we will return local one for now
     #     return self.local_scale
 
+    @property
+    def parent(self):
+        return self._parent
+
     @property
     def local_position(self):
         return self._local_position
@@ -155,40 +289,11 @@ class Transform:
     def local_euler_angles(self):
         if (self._rotation_dirty):
             self._update_rotation_matrix()
-        # this is the M[1,3] of the mathematical matrix (1st row, 3 col)
-        sin_beta = self._rotation_mat[2,0]
-        sin_beta = max(min(sin_beta,1),-1)
-        y_rot_rad = math.asin(sin_beta)
-        y_rot = math.degrees(y_rot_rad)
-
-        cos_beta = math.cos(y_rot_rad)
-
-        # i need to change the order of rotations so it's z in the middle
-
-        # if not math.isclose(cos_beta, 0):
-        if not math.isclose(cos_beta, 0):
-            # gamma (z rot) is related to the matrix as
-            # M[1,2]/M[1,1] = -tan(gamma)
-            z_rot_rad = -math.atan2(self._rotation_mat[1,0]/cos_beta, self._rotation_mat[0,0]/cos_beta)
-            z_rot = math.degrees(z_rot_rad)
-
-            # alpha (x rot) is related to the matrix as
-            # M[2,3]/M[3,3] = -tan(alpha)
-            x_rot_rad = -math.atan2(self._rotation_mat[2,1]/cos_beta, self._rotation_mat[2,2]/cos_beta)
-            x_rot = math.degrees(x_rot_rad)
-            self.last_euler_angle_z = z_rot
-            self.last_euler_angle_x = x_rot
-        else:
-            # fix one of the angles to any value
-            print("last euler angles = ({},{},{})".format(self.last_euler_angle_x, y_rot, self.last_euler_angle.z))
-            z_rot = self.last_euler_angle_z
-            # x = atan(R21, R22) - z
-            x_rot_rad = math.atan2(self._rotation_mat[0,1], self._rotation_mat[1,1]) - z_rot
-            x_rot = math.degrees(x_rot_rad)
-        # i just need to take into account the special case
-        # when beta is 90 and cos(beta) is zero (which was simplified-divided
-        # for the calculation of alpha and gamma)
-        return pyrr.Vector3([x_rot, y_rot, z_rot])
+        # our rotation matrix follows pyrr's convention (the transposed of the math one).
+        # when y is +-90 degrees, x and z are not unique: z keeps the value we gave last time
+        angles = engine.math.euler_from_rotation_single(self._rotation_mat[:3, :3].T, self._last_euler_z)
+        self._last_euler_z = angles[2]
+        return pyrr.Vector3(angles)
 
     #     print("reading local euler angles. not implemented yet!")
     #     traceback.print_stack()
@@ -235,17 +340,36 @@ class Transform:
         # we are going to use the property to dirty the values appropiately
         self.local_position = local_pos
 
+    # local values are kept when changing the parent
+    # (unity's SetParent with worldPositionStays = false)
+    @parent.setter
+    def parent(self, value):
+        if self._parent is not None:
+            self._parent.children.remove(self)
+        self._parent = value
+        if value is not None:
+            value.children.append(self)
+
+        if self._store is not None:
+            self._store.set_parent(self._slot, value)
+
+        # the hierarchy panel shows the tree
+        if self.game_object is not None and self.game_object.scene is not None:
+            self.game_object.scene._hierarchy_changed()
+
+        # our local matrices are still right
+        # but the world ones need to be recalculated
+        self._invalidate_world()
+
     @local_position.setter
     def local_position(self, value):
-        self._local_position = value
+        if self._store is not None:
+            # we are just a handle. write into our slot
+            self._local_position[:] = value
+        else:
+            self._local_position = value
         self._translation_dirty = True
-        self._local_model_dirty = True
-        self._local_view_dirty = True
-
-        # we need to add an extra flag so the world space position can check for changes in this
-        # when it's going to be set to False?
-        # better to rename it to the purpose is going to fulfill
-        self._ws_position_needs_update = True
+        self._local_changed()
 
     # we were calling 'rotation' the euler angles
     # should we allow this setter?
@@ -258,11 +382,12 @@ class Transform:
         # this parent rotation is a quaternion
         parent_rotation = self.parent.rotation if self.parent is not None else [1, 0, 0, 0] # identity quaternion
         # we need to get the inverse rotation of the parent
+        # (the conjugate, quaternions are stored as w, x, y, z)
         parent_rotation_inverse = [
-            -parent_rotation[0],
+            parent_rotation[0],
             -parent_rotation[1],
             -parent_rotation[2],
-            parent_rotation[3]
+            -parent_rotation[3]
         ]
         local_rotation = Transform.quaternion_multiply(parent_rotation_inverse, value)
         # we are going to use the property to dirty the values appropiately
@@ -272,19 +397,16 @@ class Transform:
 
     @local_rotation.setter
     def local_rotation(self, value):
-        self._local_rotation = value
+        # our quaternion is always an array (or a view into the store)
+        self._local_rotation[:] = value
         self._rotation_dirty = True
-        self._local_model_dirty = True
-        self._local_view_dirty = True
+        self._local_changed()
 
     # add back the property decorator once we manage to read euler from quaternion
     @local_euler_angles.setter
     def local_euler_angles(self, value):
         # print("trying to set euler angles to {}".format(value))
-        self._local_rotation = Transform.quaternion_from_euler(value)
-        self._rotation_dirty = True
-        self._local_model_dirty = True
-        self._local_view_dirty = True
+        self.local_rotation = Transform.quaternion_from_euler(value)
 
     # local_euler_angles = property(None, local_euler_angles)
 
@@ -297,10 +419,12 @@ class Transform:
 
     @local_scale.setter
     def local_scale(self, value):
-        self._local_scale = value
+        if self._store is not None:
+            self._local_scale[:] = value
+        else:
+            self._local_scale = value
         self._scale_dirty = True
-        self._local_model_dirty = True
-        self._local_view_dirty = True
+        self._local_changed()
 
     # public api (getters)
     # @property
@@ -336,29 +460,44 @@ class Transform:
         # if (self._model_dirty): # <- this means that whenever we change the local transform, we need to dirty our children's model matrices
         #     self._update_model_matrix()
         # return
-        if self.model_dirty: # propery that checks for parent and local dirty flags
+        if self._store is not None:
+            # the store updates all dirty transforms at once
+            self._model_version = self._version
+            self._mark_fresh()
+            return self._store.model_mat(self._slot)
+        if self.model_dirty:
             # this is making sure we are obtaining the last version of the parent model matrix
             # by asking the parent for its model matrix, we are also making sure he updates its dirty flag
             parent_model_matrix = self.parent.model_mat if self.parent is not None else pyrr.matrix44.create_identity()
             # we are using the property to access the local model matrix also to make sure we are
             # getting the most up to date and that its dirty flag is set accordingly
             self._model_mat = pyrr.matrix44.multiply(self.local_model_mat, parent_model_matrix)
+            self._model_version = self._version
+            self._mark_fresh()
         return self._model_mat
 
-    # rather than having a _model_dirty flag, we are going to have a property
+    # rather than having a _model_dirty flag, we are going to have a property.
+    # changes in the parents are pushed down as version bumps, so we don't
+    # need to walk up the hierarchy anymore
     @property
     def model_dirty(self):
-        # model matrix is dirty when the parent is dirty or when the local model is dirty
-        parent_dirty = self.parent.model_dirty if self.parent is not None else False
-        return parent_dirty or self._local_model_dirty
+        return self._model_version != self._version
 
     # this is the final view matrix
     # final view matrix = parent_view * local_view
     @property
     def view_mat(self):
+        if self._store is not None:
+            self._view_version = self._version
+            self._mark_fresh()
+            return self._store.view_mat(self._slot)
         if self.view_dirty:
             parent_view_matrix = self.parent.view_mat if self.parent is not None else pyrr.matrix44.create_identity()
-            self._view_mat = pyrr.matrix44.multiply(self.local_view_mat, parent_view_matrix)
+            # view is the inverse of model = local_model * parent_model
+            # therefore view = parent_view * local_view
+            self._view_mat = pyrr.matrix44.multiply(parent_view_matrix, self.local_view_mat)
+            self._view_version = self._version
+            self._mark_fresh()
         # we use the property to access the local view matrix in case is dirty
         return self._view_mat
         # debugging
@@ -366,20 +505,22 @@ class Transform:
 
     @property
     def view_dirty(self):
-        # view matrix is dirty when the parent view is dirty or when the local view is dirty
-        parent_dirty = self.parent.view_dirty if self.parent is not None else False
-        return parent_dirty or self._local_view_dirty
+        return self._view_version != self._version
 
     @property
     def local_model_mat(self):
+        if self._store is not None:
+            return self._store.local_model_mat(self._slot)
         if (self._local_model_dirty):
-            self._update_local_model_matrix()
+            self._update_local_matrices()
         return self._local_model_mat
 
     @property
     def local_view_mat(self):
+        if self._store is not None:
+            return self._store.local_view_mat(self._slot)
         if (self._local_view_dirty):
-            self._update_local_view_matrix()
+            self._update_local_matrices()
         return self._local_view_mat
 
 
@@ -425,12 +566,10 @@ class Transform:
         # return self._right
         # right up and forward are direction! they dont have to be translated nor scaled
         # but the final vector needs to be in world space
-        np_vector = pyrr.matrix44.apply_to_vector(self.model_mat, pyrr.Vector4([1, 0, 0, 0]))
-        # print("np_vector = {}".format(np_vector))
-        result = pyrr.Vector3([np_vector[0], np_vector[1], np_vector[2]])
-        # print("result = {}".format(result))
-        # result = result.normalize()
-        return pyrr.vector.normalize(result)
+        # UPDATE: the 3 of them are calculated at once and cached until our version changes
+        if self._directions_dirty:
+            self._update_directions()
+        return self._right
 
     @property
     def up(self):
@@ -443,9 +582,9 @@ class Transform:
         # # and it's stored in numpy matrix as the second row (mat[1])
         # # return self.model_mat[1,:3]
         # return self._up
-        np_vector = pyrr.matrix44.apply_to_vector(self.model_mat, pyrr.Vector4([0, 1, 0, 0]))
-        result = pyrr.Vector3([np_vector[0], np_vector[1], np_vector[2]])
-        return pyrr.vector.normalize(result)
+        if self._directions_dirty:
+            self._update_directions()
+        return self._up
 
     @property
     def forward(self):
@@ -458,52 +597,122 @@ class Transform:
         # # and it's stored in numpy matrix as the third row (mat[2])
         # # return self.model_mat[2,:3]
         # return self._forward
-        np_vector = pyrr.matrix44.apply_to_vector(self.model_mat, pyrr.Vector4([0, 0, 1, 0]))
-        result = pyrr.Vector3([np_vector[0], np_vector[1], np_vector[2]])
-        return pyrr.vector.normalize(result)
+        if self._directions_dirty:
+            self._update_directions()
+        return self._forward
+
+    @property
+    def _directions_dirty(self):
+        return self._directions_version != self._version
 
     def rotate(self, euler_angles):
         """ rotate current transform by euler angles """
-        rotation = Transform.quaternion_from_euler(euler_angles)
-        # given rotation is applied on top of the current rotation
-        self.local_rotation = Transform.quaternion_multiply(self._local_rotation, rotation)
+        rotation = engine.math.quaternion_from_euler_single(euler_angles)
+        # given rotation is applied on top of the current rotation.
+        # this gets called every frame by components like Rotate,
+        # so we write the result in place rather than creating a new quaternion
+        engine.math.quaternion_multiply_single(self._local_rotation, rotation, out=self._local_rotation)
+        self._rotation_dirty = True
+        self._local_changed()
 
-    # utility to set the rotation matrix)
+    # rotates us (in world space) to look from eye_pos to the target.
+    # like cameras, we look along our -z: forward (local +z) ends up pointing from the target to eye_pos
     def look_at(self, eye_pos, target, up):
-        print("implement look at")
-        traceback.print_stack()
-        exit()
         # local positive z
-        forward = (eye_pos - target)
-        # forward = forward / np.sqrt(np.sum(forward**2))
-        forward = pyrr.vector.normalize(forward)
-        right = pyrr.vector3.cross(up, forward)
-        up = pyrr.vector3.cross(forward, right)
-        # this define us a rotation matrix
-        # but we need to update the internal eurler angles
-        # and then call _set_rotation_matrix
-        # setting the rotation matrix is easy, but getting the
-        # corresponding euler angles is not.
-
-        # trying what was said in stackoverflow
-        # the one citing wikipedia
-        # https://stackoverflow.com/questions/11514063/extract-yaw-pitch-and-roll-from-a-rotationmatrix
-        # roll : (rotation around z) phi
-        # pitch : (look up and down) thetha
-        # yaw: psi (rotation around up) (look left and right)
-
-        # stackoverflow
-        # phi (roll) = arctan2(A31, A32)
-        # theta (pitch) = arccos(A33)
-        # psi (yaw) = -arctan2(A13,A23)
-        yaw = np.arcsin(self._rotation_mat[2][0])   # sin(b) = A13
-        cos_beta = np.cos(yaw)
-        pitch = np.arccos(self._rotation_mat[2][2]/cos_beta)
-        roll = np.arccos(self._rotation_mat[0][0]/cos_beta)
+        forward = np.asarray(eye_pos, dtype=np.float64) - np.asarray(target, dtype=np.float64)
+        right = np.cross(up, forward)
+        forward_length = np.linalg.norm(forward)
+        right_length = np.linalg.norm(right)
+        if forward_length == 0 or right_length == 0:
+            raise Exception("look_at needs a target away from the eye and an up not parallel to the view direction")
+        forward = forward / forward_length
+        right = right / right_length
+        up = np.cross(forward, right)
+        # right, up and forward are the columns of the rotation matrix (math notation)
+        rotation = np.column_stack((right, up, forward))
+        self.rotation = engine.math.quaternion_from_rotation_single(rotation)
 
+    # private internal methods
 
+    # common bookkeeping after any of the local values changed
+    def _local_changed(self):
+        self._local_model_dirty = True
+        self._local_view_dirty = True
+        if self._store is not None:
+            self._store.mark_dirty(self._slot)
+        self._invalidate_world()
 
-    # private internal methods
+    # called by the TransformStore when our local rotation was written
+    # straight into its arrays (systems of the ecs world do that for many slots at once)
+    def _rotation_written(self):
+        self._rotation_dirty = True
+        self._local_model_dirty = True
+        self._local_view_dirty = True
+        self._invalidate_world()
+
+    # right, up and forward are the model matrix applied to (1,0,0,0), (0,1,0,0) and (0,0,1,0).
+    # that's just the first 3 rows of the matrix (pyrr's convention),
+    # so we take them all at once and normalize them to get rid of the scale
+    def _update_directions(self):
+        axes = np.array(self.model_mat[:3, :3], dtype=np.float64)
+        axes /= np.linalg.norm(axes, axis=1, keepdims=True)
+        self._right = pyrr.Vector3(axes[0])
+        self._up = pyrr.Vector3(axes[1])
+        self._forward = pyrr.Vector3(axes[2])
+        self._directions_version = self._version
+        self._mark_fresh()
+
+    # called after reading any of our world values.
+    # our parents were (or could have been) read to calculate them,
+    # so they are not stale anymore either.
+    def _mark_fresh(self):
+        transform = self
+        while transform is not None and transform._stale:
+            transform._stale = False
+            transform = transform._parent
+
+    # bump our version and the one of all our descendants.
+    # if a descendant is still stale (none of its world values was read since
+    # its last bump), its own descendants are stale too and we can stop there.
+    # this keeps the cost of an edit proportional to what was actually read since then.
+    def _invalidate_world(self):
+        self._version = self._version + 1
+        self._stale = True
+        changes = self._changes
+        if changes is not None:
+            changes._queue(self)
+        pending = list(self.children)
+        while len(pending) > 0:
+            transform = pending.pop()
+            # descendants in another scene are reported there
+            if transform._changes is not changes and transform._changes is not None:
+                transform._changes._queue(transform)
+            if transform._stale:
+                continue
+            transform._version = transform._version + 1
+            transform._stale = True
+            pending.extend(transform.children)
+
+    # called by the TransformStore when attaching us (or after growing its arrays).
+    # from now on our local data are views into the store arrays
+    def _bind_slot(self, store, slot):
+        self._store = store
+        self._slot = slot
+        self._local_position = store.positions[slot].view(pyrr.Vector3)
+        self._local_rotation = store.rotations[slot]
+        self._local_scale = store.scales[slot].view(pyrr.Vector3)
+
+    def _unbind_slot(self):
+        # take a copy of our data before losing the slot
+        self._local_position = pyrr.Vector3(self._local_position)
+        self._local_rotation = np.array(self._local_rotation, dtype=np.float64)
+        self._local_scale = pyrr.Vector3(self._local_scale)
+        self._store = None
+        self._slot = None
+        self._translation_dirty = True
+        self._rotation_dirty = True
+        self._scale_dirty = True
+        self._local_changed()
 
     # these _set_<>_matrix methods needs to be called when the internal data has changed
     def _update_translation_matrix(self):
@@ -552,7 +761,7 @@ class Transform:
         ############################################################################
         # END OLD EULER CODE
         ############################################################################
-        self._rotation_mat = Transform.matrix_from_quaternion(self._local_rotation)
+        self._rotation_mat = engine.math.matrix_from_quaternion_single(self._local_rotation)
         self._rotation_dirty = False
 
     def _update_scale_matrix(self):
@@ -576,51 +785,21 @@ class Transform:
     # for instance, direction vectors property getters should check for the "global" model matrix.
     # when do we use a 'local' model matrix?
     # a) we use the local model matrix when chaining model matrices in a hierarchy
-    def _update_local_model_matrix(self):
-        if (self._translation_dirty):
-            self._update_translation_matrix()
-        if (self._rotation_dirty):
-            self._update_rotation_matrix()
-        if (self._scale_dirty):
-            self._update_scale_matrix()
-        self._local_model_mat = pyrr.matrix44.multiply(
-                pyrr.matrix44.multiply(self._scale_mat, self._rotation_mat),
-                self._translation_mat)
-        self._local_model_dirty = False
-
-    def _update_local_view_matrix(self):
-        # do we need to check for the matrices dirty flag?
-        # it doesn't seem we are using the matrices at all but the internal raw values
-        # if (self._translation_dirty):
-        #     self._update_translation_matrix()
-        if (self._rotation_dirty):
-            self._update_rotation_matrix()
-        # if (self._scale_dirty):
-        #     self._update_scale_matrix()
-        inverse_translation = pyrr.matrix44.create_from_translation(-self._local_position)
-        # don't use inverse quaternions.
-        # q and -q encode the same rotation
-        # ref:
-        # https://towardsdatascience.com/better-rotation-representations-for-accurate-pose-estimation-e890a7e1317f
-        # check why this is the case
-        inverse_quaternion = [
-            -self._local_rotation[0],
-            -self._local_rotation[1],
-            -self._local_rotation[2],
-            self._local_rotation[3]
-        ]
-        # by using the quaternion to get the inverse of the rotation
-        # we are getting a transposed matrix
-        # inverse_rotation = Transform.matrix_from_quaternion(inverse_quaternion)
-        inverse_rotation = self._rotation_mat.T
-
-        inverse_scale = pyrr.matrix44.create_from_scale(np.reciprocal(self._local_scale))
-        # local view = inverse_scale * inverse_rotation * inverse_translation
-        self._local_view_mat = pyrr.matrix44.multiply(
-            pyrr.matrix44.multiply(inverse_translation, inverse_rotation),
-            inverse_scale
+    # UPDATE: both local matrices are built at once straight from position, quaternion and scale
+    # (no intermediate translation/rotation/scale matrices and no matrix products).
+    # the inverse is also analytic: inverse = T^-1 * R * S^-1
+    # (the transposed rotation undoes the rotation, no need of inverse quaternions).
+    # results are written into the same float32 buffers every time.
+    def _update_local_matrices(self):
+        engine.math.compose_trs_single(
+            self._local_position,
+            self._local_rotation,
+            self._local_scale,
+            self._local_model_mat,
+            self._local_view_mat
         )
-        self._local_view_mat_dirty = False
+        self._local_model_dirty = False
+        self._local_view_dirty = False
 
     # we might want a method to get the inverse but done
     # by knowing m = t * r * s
@@ -632,124 +811,38 @@ class Transform:
     # static method don't take class type as first parameter
     # they don't modify the class at all compared to class methods
     # which have access to class data.
+    # the actual implementations live in engine.math
+    # (together with batched versions working on many quaternions at once).
+    # these are kept here because they are part of the Transform api.
     @staticmethod
     def quaternion_from_euler(euler):
         # we need to create a rotation that is equivalent to rotate
-        # RxRyRz with values specified by euler in degrees
-        x_rad = math.radians(euler[0])
-        y_rad = math.radians(euler[1])
-        z_rad = math.radians(euler[2])
-
-        # we can create 3 quaternions representing this individual rotations.
-        # euler rotations are in world space so when constructing the quaternion,
-        # we also need to create them using as axis a world space axis
-        quaternion_x = Transform.versor_from_angle_axis(x_rad, [1, 0, 0])
-        quaternion_y = Transform.versor_from_angle_axis(y_rad, [0, 1, 0])
-        quaternion_z = Transform.versor_from_angle_axis(z_rad, [0, 0, 1])
-
-        # in what order we multiply them now?
-        # according to our book, to rotate by r first and them by q,
-        # we should calculate t = q * r
-        # i.e t = quaternion_multiply(q, r)
-        # the following works! Rx*Ry*Rz
-        rotation = Transform.quaternion_multiply(
-            quaternion_x,
-            Transform.quaternion_multiply(quaternion_y, quaternion_z)
-        )
+        # RxRyRz with values specified by euler in degrees.
+        # i.e quaternion_x * (quaternion_y * quaternion_z)
+        # where each of them is a rotation along a world space axis
+        return engine.math.quaternion_from_euler_single(euler)
+
 
-        # test:
-        # let's see if we can get the right euler using wikipedia formula
-        # if we use the specified order there: Ry*Rx*Rz (remember this is not pyrr!!)
-        # it didn't work
-        # rotation = Transform.quaternion_multiply(
-        #     quaternion_y,
-        #     Transform.quaternion_multiply(quaternion_x, quaternion_z)
-        # )
-        return rotation
-
-
-    # implementing wikipedia's version
-    # https://en.wikipedia.org/wiki/Conversion_between_quaternions_and_Euler_angles#Quaternion_to_Euler_angles_conversion
-    # we are going to return them in degrees.
-    # wikipedia formula was made for:
-    # yaw (body-z) turning onto the runway
-    # pitch (body-y) take off
-    # rolls (body-x) in the air
-    # but those seem to be local angles
-    # if they are local angles, it's because they were done in that order
-    # i.e product: Rv = Yaw * Pitch * Rolls * v
-    # which for those refer to:
-    # yaw -> Ry
-    # pitch -> Rx
-    # rolls -> Rz
-    # let's see if we get the right conversation back if we generate the quaternion following: Ry*Rx*Rz * v
-    # METHOD NOT COMPLETELY FNISHED AND NOT WORKING
+    # euler angles in degrees, the inverse of quaternion_from_euler (Rx * Ry * Rz)
     @staticmethod
     def euler_from_quaternion(quaternion):
-        q0 = quaternion[0]
-        q1 = quaternion[1]
-        q2 = quaternion[2]
-        q3 = quaternion[3]
-
-        # maybe we are forgetting normalize the quaternion
-        print("input quaternion: {}".format(quaternion))
-        length = math.sqrt(q0 * q0 + q1 * q1 + q2 * q2 + q3 * q3)
-        q0 = q0 / length
-        q1 = q1 / length
-        q2 = q2 / length
-        q3 = q3 / length
-        print("normalized quaternion: {}, {}, {}, {}".format(q0, q1, q2, q3))
-
-        a = np.arctan2(2 * (q0*q1 + q2*q3), 1 - 2 * (q1*q1 + q2*q2))
-        b = np.arcsin(2 * (q0*q2 - q3*q1))
-        c = np.arctan2(2 * (q0*q3 + q1*q2), 1 - 2 * (q2*q2 + q3*q3))
-
-        # trying using the formulas from here
-        # https://www.euclideanspace.com/maths/geometry/rotations/conversions/quaternionToEuler/
-        a = np.arctan2(2 * (q0*q2 - q1*q3), 1 - 2 * (q2*q2 + q3*q3))
-        b = np.arcsin(2 * (q1*q2 + q3*q0))
-        c = np.arctan2(2 * (q0*q1 - q2*q3), 1 - 2 * (q1*q1 + q3*q3))
-
-        a = math.degrees(a)
-        b = math.degrees(b)
-        c = math.degrees(c)
-
-        return [a, b, c]
+        quaternion = np.asarray(quaternion, dtype=np.float64)
+        rotation = engine.math.rotation_from_quaternion(quaternion / np.linalg.norm(quaternion))
+        return engine.math.euler_from_rotation_single(rotation)
 
 
 
     # axis must be already normalized
     @staticmethod
     def versor_from_angle_axis(angle, axis):
-        half_angle = angle/2.0
-        sin_half_angle = np.sin(half_angle)
-        q0 = np.cos(half_angle)
-        q1 = sin_half_angle * axis[0]
-        q2 = sin_half_angle * axis[1]
-        q3 = sin_half_angle * axis[2]
-        return (q0, q1, q2, q3)
+        return engine.math.versor_from_angle_axis_single(angle, axis)
 
     # quaterion multiplication
     @staticmethod
     def quaternion_multiply(q, r):
-        t = [0, 0, 0, 0]
-        t[0] = r[0] * q[0] - r[1] * q[1] - r[2] * q[2] - r[3] * q[3]
-        t[1] = r[0] * q[1] + r[1] * q[0] - r[2] * q[3] + r[3] * q[2]
-        t[2] = r[0] * q[2] + r[1] * q[3] + r[2] * q[0] - r[3] * q[1]
-        t[3] = r[0] * q[3] - r[1] * q[2] + r[2] * q[1] + r[3] * q[0]
-        return t
+        return engine.math.quaternion_multiply_single(q, r)
 
+    # the matrix is ready to be used as col major multiplication and storage
     @staticmethod
     def matrix_from_quaternion(q):
-        # i need to fill up a numpy matrix.
-        # we will make it so it's ready to be used as col major multiplication and storage
-        w = q[0]
-        x = q[1]
-        y = q[2]
-        z = q[3]
-        m = np.identity(4)
-        m[0] = [(1 - 2*y*y - 2*z*z), (2*x*y - 2*w*z), (2*x*z + 2*w*y), 0]
-        m[1] = [(2*x*y + 2*w*z), (1 - 2*x*x - 2*z*z), (2*y*z - 2*w*x), 0]
-        m[2] = [(2*x*z - 2*w*y), (2*y*z + 2*w*x), (1 - 2*x*x - 2*y*y), 0]
-        m[3] = [0, 0, 0, 1]
-        return m.T
+        return engine.math.matrix_from_quaternion_single(q)
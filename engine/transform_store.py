@@ -0,0 +1,299 @@
+import numpy as np
+
+import engine.math
+
+# structure of arrays (SoA) storage for transforms.
+# every Transform owns its own pyrr vectors and matrices and
+# computes its model matrix by asking its parent for its model matrix.
+# that is fine for a handful of objects, but with tens of thousands of them
+# most of the frame goes into python matrix multiplications.
+# this store keeps the local data (position, quaternion, scale) and the
+# resulting matrices of many transforms in contiguous numpy arrays
+# so we can update all the dirty world matrices in a single vectorized pass.
+
+# transforms keep working as before. once they get attached to a store,
+# they become a thin handle over their slot (their local data are views
+# into the store arrays), so clients reading model_mat, position, etc
+# don't need to know where the data lives.
+
+class TransformStore:
+
+    def __init__(self, capacity = 1024):
+        self.capacity = max(capacity, 1)
+        # nr of slots ever used (free slots are reused)
+        self.size = 0
+
+        self._allocate_arrays(self.capacity)
+
+        # slot -> transform handle (None for free slots)
+        self.transforms = [None] * self.capacity
+        self._free_slots = []
+
+        # list of arrays of slots, one per depth level.
+        # it's only rebuilt when the hierarchy changes
+        self._levels = None
+        self._any_dirty = False
+
+    ############################################################################
+    # public api
+    ############################################################################
+
+    def attach(self, transform):
+        """ move the local data of the transform into a slot of this store """
+        if transform._store is not None:
+            raise Exception("transform is already attached to a store")
+
+        # parents need to be in the store before their children,
+        # otherwise we can not tell their slot
+        parent_slot = -1
+        if transform.parent is not None:
+            parent_slot = self._slot_of(transform.parent)
+
+        slot = self._allocate_slot()
+        self.positions[slot] = transform._local_position
+        self.rotations[slot] = transform._local_rotation
+        self.scales[slot] = transform._local_scale
+        self.parents[slot] = parent_slot
+        self.alive[slot] = True
+        self.local_dirty[slot] = True
+        self.transforms[slot] = transform
+
+        transform._bind_slot(self, slot)
+
+        self._levels = None
+        self._any_dirty = True
+        return slot
+
+    def attach_many(self, transforms, positions, rotations, scales, parents):
+        """
+        attach several new transforms at once with their local data given as arrays.
+        parents are indices into transforms (-1 for roots), and parents come before their children.
+        the hierarchy links of the transforms themselves are not touched
+        """
+        count = len(transforms)
+        while self.size + count > self.capacity:
+            self._grow()
+        first = self.size
+        slots = slice(first, first + count)
+        self.size = self.size + count
+
+        self.positions[slots] = positions
+        self.rotations[slots] = rotations
+        self.scales[slots] = scales
+        parents = np.asarray(parents, dtype=np.int64)
+        self.parents[slots] = np.where(parents >= 0, parents + first, -1)
+        self.alive[slots] = True
+        self.local_dirty[slots] = True
+        self.transforms[slots] = transforms
+
+        for slot, transform in enumerate(transforms, first):
+            if transform._store is not None:
+                raise Exception("transform is already attached to a store")
+            transform._bind_slot(self, slot)
+
+        self._levels = None
+        self._any_dirty = True
+        return first
+
+    def detach(self, transform):
+        """ give the local data back to the transform and release its slot """
+        slot = self._slot_of(transform)
+        for child in transform.children:
+            if child._store is self:
+                raise Exception("detach the children of the transform first")
+
+        transform._unbind_slot()
+
+        self.alive[slot] = False
+        self.local_dirty[slot] = False
+        self.dirty[slot] = False
+        self.parents[slot] = -1
+        self.transforms[slot] = None
+        self._free_slots.append(slot)
+
+        self._levels = None
+
+    def set_parent(self, slot, parent):
+        """ called by the transform handles whenever they get re-parented """
+        self.parents[slot] = -1 if parent is None else self._slot_of(parent)
+        self.local_dirty[slot] = True
+        self._levels = None
+        self._any_dirty = True
+
+    def mark_dirty(self, slot):
+        """ called by the transform handles whenever their local data change """
+        self.local_dirty[slot] = True
+        self._any_dirty = True
+
+    def rotations_written(self, slots):
+        """ the rotations of these slots were written straight into the arrays """
+        self.local_dirty[slots] = True
+        self._any_dirty = True
+        transforms = self.transforms
+        for slot in slots.tolist():
+            transforms[slot]._rotation_written()
+
+    @property
+    def dirty_pending(self):
+        return self._any_dirty
+
+    def model_mat(self, slot):
+        if self._any_dirty:
+            self.update()
+        return self.world_matrices[slot]
+
+    def view_mat(self, slot):
+        if self._any_dirty:
+            self.update()
+        return self.world_inverse_matrices[slot]
+
+    def local_model_mat(self, slot):
+        if self._any_dirty:
+            self.update()
+        return self.local_matrices[slot]
+
+    def local_view_mat(self, slot):
+        if self._any_dirty:
+            self.update()
+        return self.local_inverse_matrices[slot]
+
+    def update(self):
+        """ recalculate every dirty world matrix, one hierarchy level at a time """
+        if not self._any_dirty:
+            return
+
+        if self._levels is None:
+            self._rebuild_levels()
+
+        n = self.size
+        local_dirty = self.local_dirty[:n]
+        dirty = self.dirty[:n]
+
+        # only the local matrices whose data changed need to be rebuilt
+        changed = np.flatnonzero(local_dirty)
+        if changed.size > 0:
+            model, inverse = engine.math.compose_trs(
+                self.positions[changed],
+                self.rotations[changed],
+                self.scales[changed]
+            )
+            self.local_matrices[changed] = model
+            self.local_inverse_matrices[changed] = inverse
+
+        # but world matrices are dirty also when any of their ancestors is dirty.
+        # levels are sorted by depth, so by the time we reach a level,
+        # its parents have already received the dirty flag from above
+        dirty |= local_dirty
+        for level in self._levels[1:]:
+            dirty[level] |= dirty[self.parents[level]]
+
+        for depth, level in enumerate(self._levels):
+            level = level[dirty[level]]
+            if level.size == 0:
+                continue
+            if depth == 0:
+                self.world_matrices[level] = self.local_matrices[level]
+                self.world_inverse_matrices[level] = self.local_inverse_matrices[level]
+            else:
+                parents = self.parents[level]
+                # model = local_model * parent_model
+                self.world_matrices[level] = np.matmul(
+                    self.local_matrices[level], self.world_matrices[parents])
+                # view = parent_view * local_view
+                self.world_inverse_matrices[level] = np.matmul(
+                    self.world_inverse_matrices[parents], self.local_inverse_matrices[level])
+
+        local_dirty[:] = False
+        dirty[:] = False
+        self._any_dirty = False
+
+    ############################################################################
+    # private methods
+    ############################################################################
+
+    def _allocate_arrays(self, capacity):
+        self.positions = np.zeros((capacity, 3), dtype=np.float32)
+        self.rotations = np.zeros((capacity, 4), dtype=np.float32)
+        self.rotations[:, 0] = 1    # identity quaternion (w, x, y, z)
+        self.scales = np.ones((capacity, 3), dtype=np.float32)
+
+        identities = np.broadcast_to(np.identity(4, dtype=np.float32), (capacity, 4, 4))
+        self.local_matrices = identities.copy()
+        self.local_inverse_matrices = identities.copy()
+        self.world_matrices = identities.copy()
+        self.world_inverse_matrices = identities.copy()
+
+        self.parents = np.full(capacity, -1, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        # local_dirty: the local data of this slot changed
+        # dirty: scratch flags used while propagating changes down the hierarchy
+        self.local_dirty = np.zeros(capacity, dtype=bool)
+        self.dirty = np.zeros(capacity, dtype=bool)
+
+    def _grow(self):
+        old_capacity = self.capacity
+        old_arrays = {
+            "positions" : self.positions,
+            "rotations" : self.rotations,
+            "scales" : self.scales,
+            "local_matrices" : self.local_matrices,
+            "local_inverse_matrices" : self.local_inverse_matrices,
+            "world_matrices" : self.world_matrices,
+            "world_inverse_matrices" : self.world_inverse_matrices,
+            "parents" : self.parents,
+            "alive" : self.alive,
+            "local_dirty" : self.local_dirty,
+            "dirty" : self.dirty,
+        }
+
+        self.capacity = old_capacity * 2
+        self._allocate_arrays(self.capacity)
+        for name, old_array in old_arrays.items():
+            getattr(self, name)[:old_capacity] = old_array
+
+        self.transforms.extend([None] * (self.capacity - old_capacity))
+
+        # handles hold views into the old arrays
+        for slot, transform in enumerate(self.transforms):
+            if transform is not None:
+                transform._bind_slot(self, slot)
+
+    def _allocate_slot(self):
+        if len(self._free_slots) > 0:
+            return self._free_slots.pop()
+        if self.size == self.capacity:
+            self._grow()
+        slot = self.size
+        self.size = self.size + 1
+        return slot
+
+    def _slot_of(self, transform):
+        if transform._store is not self:
+            raise Exception("transform is not attached to this store")
+        return transform._slot
+
+    def _rebuild_levels(self):
+        n = self.size
+        parents = self.parents[:n]
+        has_parent = parents >= 0
+
+        # every pass pushes the depth one level further down the tree.
+        # we stop once nothing changes (max depth + 1 passes)
+        depths = np.zeros(n, dtype=np.int64)
+        for _ in range(n):
+            new_depths = np.where(has_parent, depths[parents] + 1, 0)
+            if np.array_equal(new_depths, depths):
+                break
+            depths = new_depths
+
+        alive_slots = np.flatnonzero(self.alive[:n])
+        if alive_slots.size == 0:
+            self._levels = []
+            return
+
+        alive_depths = depths[alive_slots]
+        order = np.argsort(alive_depths, kind="stable")
+        sorted_slots = alive_slots[order]
+        sorted_depths = alive_depths[order]
+        boundaries = np.flatnonzero(np.diff(sorted_depths)) + 1
+        self._levels = np.split(sorted_slots, boundaries)
@@ -0,0 +1,245 @@
+# where the vertex attributes of a mesh are inside its vertex buffer.
+# there are two ways of laying them out:
+# - planar: one block per attribute
+#   pos pos pos ... uv uv uv ... normal normal normal ...
+# - interleaved: the attributes of each vertex next to each other
+#   pos uv normal pos uv normal ...
+# the gpu fetches all the attributes of a vertex together, so with interleaved data
+# they come from the same cache lines (better for big meshes).
+# planar data is handy to read or replace a single attribute.
+#
+# opengl gets the same description through glVertexAttribPointer:
+# offset (bytes from the start of the buffer to the first value of the attribute)
+# and stride (bytes from one vertex to the next one).
+#
+# every attribute also has a format (how each of its values is stored).
+# by default everything is float32, but compressed meshes use smaller ones:
+# - pos: float16 (the vertex fetch converts them back to floats, no need for
+#   a scale and offset per mesh as with normalized integers)
+# - uv: unorm16 (uint16 mapped to [0, 1]) if they are inside [0, 1], float32 otherwise
+# - normal: oct8, the unit normal mapped to an octahedron and stored as two snorm8 values.
+#   the shaders decode it (see shaders/include/vertex_decoding.glsl)
+# - color: unorm8
+# each value is padded to 4 bytes (opengl likes aligned attributes),
+# so a vertex with all the attributes takes 20 bytes instead of 44.
+
+import numpy as np
+
+# in the order they are stored
+ATTRIB_NAMES = ("pos", "uv", "normal", "color")
+
+# nr of components of every attribute
+ATTRIB_SIZES = {
+    "pos" : 3,
+    "uv" : 2,
+    "normal" : 3,
+    "color" : 3,
+}
+
+PLANAR = "planar"
+INTERLEAVED = "interleaved"
+
+FLOAT32 = "float32"
+FLOAT16 = "float16"
+UNORM16 = "unorm16"
+UNORM8 = "unorm8"
+OCT8 = "oct8"
+
+# numpy type of the stored values and whether opengl maps them to [0, 1] ([-1, 1] if signed)
+FORMAT_DTYPES = {
+    FLOAT32 : np.dtype(np.float32),
+    FLOAT16 : np.dtype(np.float16),
+    UNORM16 : np.dtype(np.uint16),
+    UNORM8 : np.dtype(np.uint8),
+    OCT8 : np.dtype(np.int8),
+}
+NORMALIZED_FORMATS = (UNORM16, UNORM8, OCT8)
+
+# positions go to float16 only if the rounding error stays below this fraction of the mesh size
+# (meshes far from their origin, like static batches in world space, keep float32)
+MAX_POSITION_ERROR = 1.0 / 1024.0
+
+# formats for a compressed mesh with the given data (name -> values of the attribute)
+def compressed_formats(data):
+    formats = {}
+    for name, values in data.items():
+        if values is None:
+            continue
+        values = np.asarray(values)
+        if name == "pos":
+            formats[name] = FLOAT16 if _positions_fit_float16(values) else FLOAT32
+        elif name == "uv":
+            # tiled uvs would lose too much precision as float16
+            if values.size == 0 or (values.min() >= 0.0 and values.max() <= 1.0):
+                formats[name] = UNORM16
+            else:
+                formats[name] = FLOAT32
+        elif name == "normal":
+            formats[name] = OCT8
+        elif name == "color":
+            formats[name] = UNORM8
+    return formats
+
+def _positions_fit_float16(values):
+    if values.size == 0:
+        return True
+    values = values.reshape(-1, 3)
+    largest = float(np.max(np.abs(values)))
+    if largest > 60000.0:
+        return False
+    extent = float(np.max(values.max(axis=0) - values.min(axis=0)))
+    # distance between consecutive float16 values around the largest one
+    spacing = float(np.spacing(np.float16(largest)))
+    return spacing <= max(extent, 1e-6) * MAX_POSITION_ERROR
+
+class VertexLayout:
+
+    def __init__(self, names, nr_vertices, mode = PLANAR, formats = None):
+        if mode not in (PLANAR, INTERLEAVED):
+            raise Exception("unknown vertex layout {}".format(mode))
+        self.mode = mode
+        # attributes present in the buffer
+        self.names = tuple(name for name in ATTRIB_NAMES if name in names)
+        self.nr_vertices = nr_vertices
+        self.formats = {name : FLOAT32 for name in self.names}
+        if formats is not None:
+            for name, format in formats.items():
+                if name not in self.formats:
+                    continue
+                if format not in FORMAT_DTYPES or (format == OCT8 and name != "normal"):
+                    raise Exception("format {} can not be used for {}".format(format, name))
+                self.formats[name] = format
+
+        # bytes of all the attributes of one vertex
+        self.vertex_size = sum(self.element_size(name) for name in self.names)
+        self.nbytes = self.vertex_size * nr_vertices
+
+        self.offsets = {}
+        self.strides = {}
+        offset = 0
+        for name in self.names:
+            size = self.element_size(name)
+            self.offsets[name] = offset
+            if mode == INTERLEAVED:
+                self.strides[name] = self.vertex_size
+                offset = offset + size
+            else:
+                self.strides[name] = size
+                offset = offset + size * nr_vertices
+
+    # layouts saved before attributes had formats were all float32
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if "formats" not in state:
+            self.formats = {name : FLOAT32 for name in self.names}
+
+    @property
+    def interleaved(self):
+        return self.mode == INTERLEAVED
+
+    @property
+    def compressed(self):
+        return any(format != FLOAT32 for format in self.formats.values())
+
+    # bytes of the same vertices with every attribute as float32
+    @property
+    def uncompressed_nbytes(self):
+        return sum(ATTRIB_SIZES[name] for name in self.names) * 4 * self.nr_vertices
+
+    def has(self, name):
+        return name in self.offsets
+
+    # nr of stored values of an attribute (octahedral normals have 2 instead of 3)
+    def components(self, name):
+        return 2 if self.formats[name] == OCT8 else ATTRIB_SIZES[name]
+
+    def dtype(self, name):
+        return FORMAT_DTYPES[self.formats[name]]
+
+    def normalized(self, name):
+        return self.formats[name] in NORMALIZED_FORMATS
+
+    # bytes of the attribute for one vertex (padded to 4)
+    def element_size(self, name):
+        size = self.components(name) * self.dtype(name).itemsize
+        return (size + 3) // 4 * 4
+
+    # the attribute of the mesh feeding an input of the vertex shader (None if there isn't any).
+    # octahedral normals go to 'normal_oct', the shaders decode them into 'normal'
+    def source(self, shader_attrib):
+        if shader_attrib == "normal_oct":
+            return "normal" if self.formats.get("normal") == OCT8 else None
+        if shader_attrib == "normal" and self.formats.get("normal") == OCT8:
+            return None
+        return shader_attrib if self.has(shader_attrib) else None
+
+    def view(self, buffer, name):
+        """ (nr vertices, components) view of the stored values of an attribute inside a buffer with this layout """
+        dtype = self.dtype(name)
+        return np.ndarray(
+            (self.nr_vertices, self.components(name)),
+            dtype=dtype,
+            buffer=buffer,
+            offset=self.offsets[name],
+            strides=(self.strides[name], dtype.itemsize)
+        )
+
+    def decode(self, buffer, name):
+        """ (nr vertices, size) float32 values of an attribute (the view itself if they are stored as float32) """
+        values = self.view(buffer, name)
+        format = self.formats[name]
+        if format == FLOAT32:
+            return values
+        if format == FLOAT16:
+            return values.astype(np.float32)
+        if format == UNORM16:
+            return values.astype(np.float32) / 65535.0
+        if format == UNORM8:
+            return values.astype(np.float32) / 255.0
+        return _decode_octahedral(values)
+
+    def pack(self, data):
+        """ buffer with this layout. data: name -> float values of the attribute (flat or one row per vertex) """
+        buffer = np.empty(self.nbytes, dtype=np.uint8)
+        for name in self.names:
+            values = np.reshape(data[name], (self.nr_vertices, ATTRIB_SIZES[name]))
+            self.view(buffer, name)[:] = _encode(values, self.formats[name])
+        return buffer
+
+    def repack(self, buffer, layout):
+        """ the data of a buffer with this layout in a new buffer with another layout (same formats) """
+        new_buffer = np.empty(layout.nbytes, dtype=np.uint8)
+        for name in self.names:
+            layout.view(new_buffer, name)[:] = self.view(buffer, name)
+        return new_buffer
+
+def _encode(values, format):
+    if format == FLOAT32 or format == FLOAT16:
+        return values
+    if format == UNORM16:
+        return np.round(np.clip(values, 0.0, 1.0) * 65535.0)
+    if format == UNORM8:
+        return np.round(np.clip(values, 0.0, 1.0) * 255.0)
+    return np.round(np.clip(_encode_octahedral(values), -1.0, 1.0) * 127.0)
+
+# unit vectors -> points in [-1, 1]^2.
+# the vector is projected onto the octahedron |x| + |y| + |z| = 1
+# and the lower half (z < 0) gets folded over the upper one
+def _encode_octahedral(normals):
+    normals = np.asarray(normals, dtype=np.float32)
+    lengths = np.sum(np.abs(normals), axis=1, keepdims=True)
+    n = normals / np.maximum(lengths, 1e-12)
+    xy = n[:, :2].copy()
+    lower = n[:, 2] < 0.0
+    signs = np.where(xy[lower] >= 0.0, 1.0, -1.0)
+    xy[lower] = (1.0 - np.abs(xy[lower][:, ::-1])) * signs
+    return xy
+
+def _decode_octahedral(values):
+    xy = values.astype(np.float32) / 127.0
+    n = np.empty((len(xy), 3), dtype=np.float32)
+    n[:, :2] = xy
+    n[:, 2] = 1.0 - np.abs(xy[:, 0]) - np.abs(xy[:, 1])
+    t = np.maximum(-n[:, 2], 0.0)
+    n[:, :2] = n[:, :2] + np.where(n[:, :2] >= 0.0, -t[:, np.newaxis], t[:, np.newaxis])
+    return n / np.maximum(np.linalg.norm(n, axis=1, keepdims=True), 1e-12)
@@ -32,6 +32,7 @@ from .base_mesh import BaseMesh, Triangle, Quad, Cube, Line, GizmoMesh
 # from .texture import Texture
 from .image import Image
 from .framebuffer import Framebuffer
+from .gpu_timer import GpuTimer
 from . import VertexAttrib # this was defined in __init__.py
 from .free_fly_camera import FreeFlyCamera
 from .transform import Transform
@@ -51,6 +52,7 @@ from .gui import CameraGUI
 from .gui import MaterialGUI
 
 import engine.time
+import engine.editor
 from engine import input_manager
 
 from .editor_window import RenderingInfoWindow, MaterialManagerWindow, SceneCameraWindow, OpenCVWebcamWindow
@@ -177,7 +179,10 @@ class Window:
         # src = what was already in the canvas
         gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
 
-        self.use_imgui = True
+        # without editor there is no gui to draw (see editor.py)
+        self.use_imgui = engine.editor.enabled
+        # the free fly camera only moves while the scene window is focused (always false without gui)
+        self.scene_imgui_window_focused = False
 
         # initialize singletone modules
         shader_manager.init()   # before material manager
@@ -244,7 +249,9 @@ class Window:
             # do not do the following
             # imgui.get_io().display_size = 100, 100
             # imgui.get_io().fonts.get_tex_data_as_rgba32() this is giving me error when calling imgui.render()
-            self.scene_imgui_window_focused = False
+
+        # gpu time of drawing the scene view (shown in the rendering info window)
+        self.scene_gpu_timer = GpuTimer()
 
         self.rendering_info_window = RenderingInfoWindow(self)
         self.material_manager_window = MaterialManagerWindow(self)
@@ -306,7 +313,10 @@ class Window:
         gl.glClearColor(*self.scene_camera.clear_color, 1)# light blue
         gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
 
-        self.scene.draw_scene(self.scene_camera)
+        self.scene_gpu_timer.begin()
+        # the grid and its settings are part of the editor
+        self.scene.draw_scene(self.scene_camera, self.use_imgui)
+        self.scene_gpu_timer.end()
 
         # draw overlays such as gizmos
         self.scene.draw_overlay(self.scene_camera)
@@ -560,6 +570,9 @@ class Window:
             ####################################################################
             # GAME LOGIC
             self.scene.update()
+            # camera independent part of drawing the frame,
+            # shared by all the views below (scene, game...)
+            self.scene.prepare_frame()
 
             ####################################################################
             gl.glViewport(0, 0,self.framebuffer_width, self.framebuffer_height)
@@ -587,6 +600,7 @@ class Window:
 
             self.previous_time = self.current_time
 
+        self.scene.close()
         if self.use_imgui:
             self.impl.shutdown()
         glfw.terminate()
@@ -0,0 +1,129 @@
+# checks the transform paths against each other:
+# - the closed form local matrices (engine.math.compose_trs_single) against the
+#   translation, rotation and scale matrices multiplied one by one (how they were built before)
+# - transforms living in a TransformStore against plain transforms,
+#   over random hierarchies, before and after editing them.
+#
+# run from the repository root with
+# python -m unittest discover tests
+
+import unittest
+
+import numpy as np
+import pyrr
+
+from engine.transform import Transform
+from engine.transform_store import TransformStore
+
+NR_TRANSFORMS = 200
+# the store keeps its data in float32 arrays
+TOLERANCE = 1e-4
+
+# random local data and parents (parents always come before their children)
+def random_hierarchy(rng, count):
+    positions = rng.uniform(-10, 10, (count, 3))
+    euler_angles = rng.uniform(-180, 180, (count, 3))
+    scales = rng.uniform(0.5, 2.0, (count, 3))
+    parents = np.full(count, -1)
+    for i in range(1, count):
+        # around a third are roots
+        if rng.random() > 0.3:
+            parents[i] = rng.integers(0, i)
+    return positions, euler_angles, scales, parents
+
+def build_transforms(hierarchy, store = None):
+    positions, euler_angles, scales, parents = hierarchy
+    transforms = []
+    for i in range(len(positions)):
+        transform = Transform(
+            pos=pyrr.Vector3(positions[i]),
+            euler_angles=pyrr.Vector3(euler_angles[i]),
+            scale=pyrr.Vector3(scales[i])
+        )
+        if parents[i] >= 0:
+            transform.parent = transforms[parents[i]]
+        if store is not None:
+            store.attach(transform)
+        transforms.append(transform)
+    return transforms
+
+# the local matrices as they were built before the closed form:
+# scale * rotation * translation and its inverse, one 4x4 matrix product at a time
+def multiplied_local_matrices(position, rotation, scale):
+    translation_mat = pyrr.matrix44.create_from_translation(position)
+    rotation_mat = np.asarray(Transform.matrix_from_quaternion(rotation))
+    scale_mat = pyrr.matrix44.create_from_scale(scale)
+    model = pyrr.matrix44.multiply(pyrr.matrix44.multiply(scale_mat, rotation_mat), translation_mat)
+    inverse_translation = pyrr.matrix44.create_from_translation(-np.asarray(position))
+    inverse_scale = pyrr.matrix44.create_from_scale(np.reciprocal(np.asarray(scale, dtype=np.float64)))
+    view = pyrr.matrix44.multiply(pyrr.matrix44.multiply(inverse_translation, rotation_mat.T), inverse_scale)
+    return model, view
+
+class TransformStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(5)
+        self.hierarchy = random_hierarchy(self.rng, NR_TRANSFORMS)
+        self.plain = build_transforms(self.hierarchy)
+        self.store = TransformStore(16)
+        self.stored = build_transforms(self.hierarchy, self.store)
+
+    def assert_close(self, actual, expected):
+        actual = np.asarray(actual, dtype=np.float64)
+        expected = np.asarray(expected, dtype=np.float64)
+        # relative to the size of the values (deep hierarchies get big translations)
+        scale = max(1.0, np.abs(expected).max())
+        np.testing.assert_allclose(actual, expected, rtol=0, atol=TOLERANCE * scale)
+
+    def assert_same_world(self):
+        for plain, stored in zip(self.plain, self.stored):
+            self.assert_close(stored.model_mat, plain.model_mat)
+            self.assert_close(stored.view_mat, plain.view_mat)
+            self.assert_close(stored.position, plain.position)
+            # q and -q are the same rotation
+            rotation = np.asarray(stored.rotation, dtype=np.float64)
+            expected = np.asarray(plain.rotation, dtype=np.float64)
+            if np.dot(rotation, expected) < 0:
+                rotation = -rotation
+            self.assert_close(rotation, expected)
+
+    def test_local_matrices_match_multiplied_matrices(self):
+        for transform in self.plain + self.stored:
+            model, view = multiplied_local_matrices(
+                transform.local_position, transform.local_rotation, transform.local_scale
+            )
+            self.assert_close(transform.local_model_mat, model)
+            self.assert_close(transform.local_view_mat, view)
+
+    def test_world_matrices_match_plain_transforms(self):
+        self.assert_same_world()
+
+    def test_view_is_inverse_of_model(self):
+        for transform in self.plain + self.stored:
+            product = np.asarray(transform.model_mat, dtype=np.float64) @ np.asarray(transform.view_mat, dtype=np.float64)
+            self.assert_close(product, np.identity(4))
+
+    def test_world_matrices_match_after_edits(self):
+        # read everything once so the edits below have cached values to invalidate
+        self.assert_same_world()
+        for i in self.rng.choice(NR_TRANSFORMS, 60, replace=False):
+            position = pyrr.Vector3(self.rng.uniform(-10, 10, 3))
+            euler_angles = self.rng.uniform(-30, 30, 3)
+            scale = pyrr.Vector3(self.rng.uniform(0.5, 2.0, 3))
+            for transforms in (self.plain, self.stored):
+                transforms[i].local_position = position
+                transforms[i].rotate(euler_angles)
+                transforms[i].local_scale = scale
+        self.assert_same_world()
+
+    def test_world_matrices_match_after_reparenting(self):
+        self.assert_same_world()
+        # new parents are picked among the earlier transforms so there are no cycles
+        for i in self.rng.choice(np.arange(1, NR_TRANSFORMS), 30, replace=False):
+            parent = int(self.rng.integers(0, i))
+            self.plain[i].parent = self.plain[parent]
+            self.stored[i].parent = self.stored[parent]
+        self.assert_same_world()
+
+if __name__ == "__main__":
+    unittest.main()